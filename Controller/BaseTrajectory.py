@@ -0,0 +1,205 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : BaseTrajectory.py
+# @Description:   : Time-parameterized trajectories for a differential drive base
+"""
+
+import math
+
+import numpy as np
+
+
+def time_parameterize(s, max_velocity, max_acceleration, dt):
+    """
+    Computes the fastest motion along a 1D path under velocity and acceleration limits.
+
+    Args:
+        s (np.ndarray): Increasing path positions (K,), from 0 to the path length.
+        max_velocity (np.ndarray): Velocity limit at each position (K,), the motion starts and stops at rest.
+        max_acceleration (float): Acceleration limit.
+        dt (float): Time step.
+
+    Returns:
+        np.ndarray: The path position at every time step, ending exactly at s[-1].
+    """
+    s = np.asarray(s, dtype=float)
+    if len(s) < 2 or s[-1] <= s[0]:
+        return np.empty(0)
+    v = np.asarray(max_velocity, dtype=float).copy()
+    if len(s) == 2:  # the motion needs a knot where it stops accelerating
+        s = np.array([s[0], (s[0] + s[1]) / 2, s[1]])
+        v = np.array([0.0, v.max(), 0.0])
+    v[0] = v[-1] = 0.0
+
+    # forward pass for the acceleration limit, backward pass for the deceleration limit
+    ds = np.diff(s)
+    for k in range(len(ds)):
+        v[k + 1] = min(v[k + 1], math.sqrt(v[k] ** 2 + 2 * max_acceleration * ds[k]))
+    for k in range(len(ds) - 1, -1, -1):
+        v[k] = min(v[k], math.sqrt(v[k + 1] ** 2 + 2 * max_acceleration * ds[k]))
+
+    # constant acceleration between knots: time = distance / mean velocity
+    t = np.concatenate([[0.0], np.cumsum(2 * ds / (v[:-1] + v[1:]))])
+    acceleration = (v[1:] ** 2 - v[:-1] ** 2) / (2 * ds)
+
+    # sample the motion at the time steps, the last step is shortened to end at rest
+    n_step = max(1, math.ceil(t[-1] / dt - 1e-9))
+    times = np.minimum(np.arange(1, n_step + 1) * dt, t[-1])
+    k = np.clip(np.searchsorted(t, times, side="right") - 1, 0, len(ds) - 1)
+    tau = times - t[k]
+    return np.minimum(s[k] + v[k] * tau + 0.5 * acceleration[k] * tau**2, s[-1])
+
+
+class BaseTrajectoryGenerator:
+    """
+    Turns a 2D path into one base pose (x, y, yaw) per simulation step.
+
+    The base turns on the spot at sharp corners and drives through gentle ones, with its
+    speed limited so that the yaw rate along the path stays below the angular velocity limit.
+    """
+
+    def __init__(
+        self,
+        max_linear_velocity=0.5,
+        max_linear_acceleration=0.5,
+        max_angular_velocity=1.0,
+        max_angular_acceleration=1.0,
+        corner_angle=0.35,
+        resolution=0.01,
+    ):
+        """
+        Initializes the generator.
+
+        Args:
+            max_linear_velocity (float, optional): Linear velocity limit in m/s. Defaults to 0.5.
+            max_linear_acceleration (float, optional): Linear acceleration limit in m/s^2. Defaults to 0.5.
+            max_angular_velocity (float, optional): Angular velocity limit in rad/s. Defaults to 1.0.
+            max_angular_acceleration (float, optional): Angular acceleration limit in rad/s^2. Defaults to 1.0.
+            corner_angle (float, optional): Heading changes (rad) above this stop the base and turn it
+                on the spot, smaller ones are driven through. Defaults to 0.35.
+            resolution (float, optional): Spacing (m or rad) of the velocity profile knots. Defaults to 0.01.
+        """
+        self.max_linear_velocity = max_linear_velocity
+        self.max_linear_acceleration = max_linear_acceleration
+        self.max_angular_velocity = max_angular_velocity
+        self.max_angular_acceleration = max_angular_acceleration
+        self.corner_angle = corner_angle
+        self.resolution = resolution
+
+    def rotate(self, position, from_yaw, to_yaw, dt):
+        """
+        Turns the base on the spot along the shortest direction.
+
+        Args:
+            position (np.ndarray): Position [x, y] of the base.
+            from_yaw (float): Start yaw in radians.
+            to_yaw (float): Target yaw in radians.
+            dt (float): Time step.
+
+        Returns:
+            np.ndarray: Poses (N, 3) as [x, y, yaw], one per time step.
+        """
+        angle = (to_yaw - from_yaw + math.pi) % (2 * math.pi) - math.pi
+        n_knot = math.ceil(abs(angle) / self.resolution) + 1
+        s = np.linspace(0.0, abs(angle), max(n_knot, 2))
+        yaw = from_yaw + math.copysign(1.0, angle) * time_parameterize(
+            s,
+            np.full(len(s), self.max_angular_velocity),
+            self.max_angular_acceleration,
+            dt,
+        )
+        return np.column_stack([np.broadcast_to(position, (len(yaw), 2)), yaw]).reshape(
+            -1, 3
+        )
+
+    def drive(self, points, from_yaw, dt):
+        """
+        Drives the base through a polyline whose corners are all gentle.
+
+        Args:
+            points (np.ndarray): Polyline (M, 2), with M >= 2 and no repeated points.
+            from_yaw (float): Yaw at the first point, the heading of the first segment.
+            dt (float): Time step.
+
+        Returns:
+            np.ndarray: Poses (N, 3) as [x, y, yaw], one per time step.
+        """
+        delta = np.diff(points, axis=0)
+        lengths = np.hypot(*delta.T)
+        headings = np.unwrap(np.arctan2(delta[:, 1], delta[:, 0]))
+        headings += from_yaw - headings[0]
+
+        # the yaw turns from one segment heading to the next around each corner,
+        # half of the turn is spread over each of the two segments
+        corner_yaw = np.concatenate(
+            [[headings[0]], (headings[:-1] + headings[1:]) / 2, [headings[-1]]]
+        )
+        turn = np.abs(np.diff(corner_yaw))
+        with np.errstate(divide="ignore"):
+            segment_velocity = np.minimum(
+                self.max_linear_velocity,
+                self.max_angular_velocity * lengths / turn,
+            )
+
+        # velocity profile knots, every segment is split at the profile resolution
+        cumulative = np.concatenate([[0.0], np.cumsum(lengths)])
+        s, v_max = [np.zeros(1)], [np.zeros(1)]
+        for i, length in enumerate(lengths):
+            n_knot = max(1, math.ceil(length / self.resolution))
+            s.append(cumulative[i] + np.linspace(0.0, length, n_knot + 1)[1:])
+            v_max.append(np.full(n_knot, segment_velocity[i]))
+            if i + 1 < len(
+                lengths
+            ):  # a corner is only passed as fast as both segments allow
+                v_max[-1][-1] = min(segment_velocity[i], segment_velocity[i + 1])
+        s, v_max = np.concatenate(s), np.concatenate(v_max)
+
+        s_t = time_parameterize(s, v_max, self.max_linear_acceleration, dt)
+        x = np.interp(s_t, cumulative, points[:, 0])
+        y = np.interp(s_t, cumulative, points[:, 1])
+        yaw = np.interp(s_t, cumulative, corner_yaw)
+        return np.column_stack([x, y, yaw])
+
+    def generate(self, start, path, goal_yaw=None, dt=1.0 / 240):
+        """
+        Generates the trajectory of the base along a path.
+
+        Args:
+            start (list): Current base pose [x, y, yaw].
+            path (list): Waypoints [x, y] to pass through, in order.
+            goal_yaw (float, optional): If given, the base finally turns to this yaw. Defaults to None.
+            dt (float, optional): Time step, the simulation time step. Defaults to 1 / 240.
+
+        Returns:
+            np.ndarray: Poses (N, 3) as [x, y, yaw], one per time step, ending at the last waypoint.
+        """
+        x, y, yaw = start
+        points = [np.array([x, y], dtype=float)]
+        for point in np.asarray(path, dtype=float).reshape(-1, 2):
+            if np.hypot(*(point - points[-1])) > 1e-6:
+                points.append(point)
+        points = np.asarray(points)
+
+        trajectory = [np.empty((0, 3))]
+        if len(points) >= 2:
+            delta = np.diff(points, axis=0)
+            headings = np.arctan2(delta[:, 1], delta[:, 0])
+            turns = (np.diff(headings) + math.pi) % (2 * math.pi) - math.pi
+
+            # split the path at the sharp corners, where the base turns on the spot
+            breaks = [0] + [
+                i + 1 for i in np.flatnonzero(np.abs(turns) > self.corner_angle)
+            ]
+            breaks.append(len(delta))
+            for begin, end in zip(breaks[:-1], breaks[1:]):
+                trajectory.append(self.rotate(points[begin], yaw, headings[begin], dt))
+                yaw = yaw + (headings[begin] - yaw + math.pi) % (2 * math.pi) - math.pi
+                trajectory.append(self.drive(points[begin : end + 1], yaw, dt))
+                yaw += np.sum(turns[begin : end - 1])
+
+        if goal_yaw is not None:
+            trajectory.append(self.rotate(points[-1], yaw, goal_yaw, dt))
+        trajectory = np.concatenate(trajectory)
+        trajectory[:, 2] = (trajectory[:, 2] + math.pi) % (2 * math.pi) - math.pi
+        return trajectory
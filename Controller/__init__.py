@@ -1,3 +1,4 @@
+from .BaseTrajectory import BaseTrajectoryGenerator
 from .PIDController import PIDController
 
-__all__ = ["PIDController"]
+__all__ = ["PIDController", "BaseTrajectoryGenerator"]
@@ -65,15 +65,29 @@ class Client:
         # p.setPhysicsEngineParameter(numSolverIterations=cfg.numSolverIterations)
         # p.setRealTimeSimulation(1)  # set up real-time simulation
 
+        # parameters
+        self.timestep = 1.0 / cfg.frequency
+        self.timeout = cfg.timeout  # maximum time for planning
+
         # pybullet recorder for blender show
         self.blender = cfg.blender
         if self.blender:
-            self.recorder = PyBulletRecorder()
+            if cfg.blender_fps > 0:
+                keyframe_interval = round(cfg.frequency / cfg.blender_fps)
+            else:
+                keyframe_interval = cfg.blender_keyframe_interval
+            self.recorder = PyBulletRecorder(keyframe_interval)
             self.mtl_recorder = {}  # record manually added materials
+            if cfg.blender_stream:
+                current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.recorder.start_stream(
+                    f"../Examples/record/{current_time}", cfg.blender_chunk_size
+                )
 
-        # parameters
-        self.timestep = 1.0 / cfg.frequency
-        self.timeout = cfg.timeout  # maximum time for planning
+        # stepping pace and achieved step rate statistics
+        self.set_real_time_factor(cfg.real_time_factor)
+        self.step_count = 0
+        self.step_wall_time = 0.0
 
         # Enable caching of graphic shapes when loading URDF files
         self.enable_cache = p.URDF_ENABLE_CACHED_GRAPHICS_SHAPES
@@ -113,6 +127,11 @@ class Client:
         """
         if self.blender:
             self.record_save(self.mtl_recorder)
+        print(
+            "[Client] \033[34mInfo\033[0m: {} simulation steps at {:.1f} steps/s".format(
+                self.step_count, self.get_step_rate()
+            )
+        )
         p.disconnect(physicsClientId=self.client_id)
 
     def wait(self, x):  # seconds
@@ -124,6 +143,56 @@ class Client:
         """
         time.sleep(x)
 
+    def set_real_time_factor(self, real_time_factor):
+        """
+        Set the pace at which simulation steps are executed.
+
+        Args:
+            real_time_factor (float): 1.0 steps in real time, N steps at N× real time,
+                0 (or a negative value) steps as fast as possible without sleeping.
+        """
+        self.real_time_factor = real_time_factor
+        if real_time_factor > 0:
+            self.step_interval = self.timestep / real_time_factor
+        else:
+            self.step_interval = 0.0
+        self.next_step_time = None
+
+    def get_step_rate(self):
+        """
+        Get the achieved simulation speed since the client was created.
+
+        Returns:
+            float: The number of simulation steps executed per wall-clock second.
+        """
+        if self.step_wall_time <= 0:
+            return 0.0
+        return self.step_count / self.step_wall_time
+
+    def step(self):
+        """
+        Step the simulation once, pacing it according to the real time factor.
+        """
+        start_time = time.perf_counter()
+        p.stepSimulation(physicsClientId=self.client_id)
+        if self.blender:
+            self.recorder.step()
+
+        if self.step_interval > 0:
+            # Sleep until the deadline of this step instead of a fixed timestep,
+            # so that the time spent in physics counts towards the pace.
+            if self.next_step_time is None:
+                self.next_step_time = start_time
+            self.next_step_time += self.step_interval
+            delay = self.next_step_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:  # fell behind, do not try to catch up with a burst of steps
+                self.next_step_time = time.perf_counter()
+
+        self.step_count += 1
+        self.step_wall_time += time.perf_counter() - start_time
+
     def run(self, x=1):  # steps
         """
         Step the simulation for a given number, robot=None of steps.
@@ -132,17 +201,14 @@ class Client:
             x (int): Number of simulation steps to run.
         """
         for _ in range(x):
-            p.stepSimulation(physicsClientId=self.client_id)
-            time.sleep(self.timestep)
-            if self.blender:
-                self.recorder.add_keyframe()
+            self.step()
 
     def keep_run(self):  # keep steps
+        """
+        Step the simulation forever.
+        """
         while True:
-            p.stepSimulation(physicsClientId=self.client_id)
-            time.sleep(self.timestep)
-            if self.blender:
-                self.recorder.add_keyframe()
+            self.step()
 
     # ----------------------------------------------------------------
     # Load scene
@@ -180,10 +246,7 @@ class Client:
                 object_orientation, physicsClientId=self.client_id
             )
 
-        if model_path.startswith("Asset"):
-            model_path = os.path.join("..", model_path)
-        else:
-            model_path = os.path.join(self.pybullet_data, model_path)
+        model_path = self.resolve_model_path(model_path)
 
         object_id = p.loadURDF(
             fileName=model_path,
@@ -204,6 +267,20 @@ class Client:
 
         return object_id
 
+    def resolve_model_path(self, model_path):
+        """
+        Resolve the path of a model file the way load_object does.
+
+        Args:
+            model_path (str): A path starting with 'Asset', or a path relative to the pybullet data directory.
+
+        Returns:
+            str: The path of the model file.
+        """
+        if model_path.startswith("Asset"):
+            return os.path.join("..", model_path)
+        return os.path.join(self.pybullet_data, model_path)
+
     def create_scene(self, scene_path):
         """
         Import the complete environment from the environment file based on the basic environment.
@@ -494,9 +571,13 @@ class Client:
     def record_save(self, mtl_recorder):
         """
         Save the current pybullet-blender recording to a file with a timestamped name.
+        When streaming, finish writing the streamed recording instead.
         """
+        if self.recorder.stream_path is not None:
+            self.recorder.stop_stream(mtl_recorder)
+            return
         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.recorder.save(f"../Examples/record/{current_time}.pkl", mtl_recorder)
+        self.recorder.save(f"../Examples/record/{current_time}.npz", mtl_recorder)
 
 
 if __name__ == "__main__":
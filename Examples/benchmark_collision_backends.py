@@ -0,0 +1,85 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : benchmark_collision_backends.py
+# @Description:   : A example to benchmark the pybullet and FCL collision backends
+"""
+
+
+import os
+import time
+
+import numpy as np
+
+from Config import load_config
+from Env import Client
+from Motion_Planning.Manipulation.Collision_Detection import Basic_Collision
+from Motion_Planning.Manipulation.Collision_Detection.FCL import FCL_Collision
+from Robotics_API import Bestman_sim_ur5e_vacuum_long
+from Visualization import Visualizer
+
+
+def main(filename, num_states=2000):
+
+    # Load config
+    config_path = "Config/benchmark_collision_backends.yaml"
+    cfg = load_config(config_path)
+    print(cfg)
+
+    # Init client and visualizer
+    client = Client(cfg.Client)
+    visualizer = Visualizer(client, cfg.Visualizer)
+
+    # Load scene
+    scene_path = "Asset/Scene/Scene/Kitchen.json"
+    client.create_scene(scene_path)
+
+    # Init robot
+    bestman = Bestman_sim_ur5e_vacuum_long(client, visualizer, cfg)
+
+    # Init collision backends
+    backends = {
+        "pybullet": Basic_Collision(
+            bestman, cfg.Planner.kinematic_validity, cfg.Planner.acm_samples
+        ),
+        "fcl": FCL_Collision(
+            bestman, cfg.Planner.kinematic_validity, cfg.Planner.acm_samples
+        ),
+    }
+
+    # Sample random arm states
+    rng = np.random.default_rng(0)
+    joint_bounds = np.array(bestman.sim_get_joint_bounds())
+    states = rng.uniform(
+        joint_bounds[:, 0], joint_bounds[:, 1], (num_states, len(joint_bounds))
+    )
+
+    # Check every state with every backend
+    results = {}
+    for name, collision in backends.items():
+        start_time = time.perf_counter()
+        results[name] = np.array([collision.is_state_valid(state) for state in states])
+        elapsed_time = time.perf_counter() - start_time
+        print(
+            f"[Benchmark] \033[34mInfo\033[0m: {name}: {num_states / elapsed_time:.0f} checks/s, "
+            f"{np.count_nonzero(~results[name])}/{num_states} states in collision"
+        )
+
+    agreement = np.mean(results["pybullet"] == results["fcl"])
+    print(
+        f"[Benchmark] \033[34mInfo\033[0m: backends agree on {agreement:.1%} of states"
+    )
+
+    # disconnect pybullet
+    client.disconnect()
+
+
+if __name__ == "__main__":
+
+    # set work dir to Examples
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # get current file name
+    filename = os.path.splitext(os.path.basename(__file__))[0]
+
+    main(filename)
@@ -59,6 +59,7 @@ def main(filename):
         obstacles_bounds=nav_obstacles_bounds,
         resolution=0.05,
         enable_plot=False,
+        simplify=True,
     )
     path = nav_planner.plan(bestman.sim_get_current_base_pose(), standing_pose)
     bestman.sim_navigate_base(standing_pose, path)
@@ -46,13 +46,13 @@ def control_robot_with_keyboard(client, realman):
 
         # Check for specific keys
         if p.B3G_UP_ARROW in keys and keys[p.B3G_UP_ARROW] & p.KEY_IS_DOWN:
-            realman.sim_move_base_forward(0.05)
+            realman.sim_move_base(0.05)
         elif p.B3G_DOWN_ARROW in keys and keys[p.B3G_DOWN_ARROW] & p.KEY_IS_DOWN:
-            realman.sim_move_base_backward(0.05)
+            realman.sim_move_base(-0.05)
         elif p.B3G_LEFT_ARROW in keys and keys[p.B3G_LEFT_ARROW] & p.KEY_IS_DOWN:
-            realman.sim_rotate_base(1, "counter-clockwise")
+            realman.sim_move_base(rotation=math.radians(1))
         elif p.B3G_RIGHT_ARROW in keys and keys[p.B3G_RIGHT_ARROW] & p.KEY_IS_DOWN:
-            realman.sim_rotate_base(1, "clockwise")
+            realman.sim_move_base(rotation=-math.radians(1))
         elif 27 in keys and keys[27] & p.KEY_IS_DOWN:  # ESC
             print("Exit control...")
             return
@@ -55,6 +55,7 @@ def main(filename):
         obstacles_bounds=nav_obstacles_bounds,
         resolution=0.05,
         enable_plot=False,
+        simplify=True,
     )
     # nav_planner = RRTPlanner(
     #     robot_size = bestman.get_robot_max_size(),
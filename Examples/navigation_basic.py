@@ -16,7 +16,7 @@ from Config import load_config
 from Env.Client import Client
 from Motion_Planning.Navigation import *
 from Robotics_API import Bestman_sim_ur5e_vacuum_long, Pose
-from SLAM import simple_slam
+from SLAM import OccupancyGridMapper, simple_slam
 from Visualization import Visualizer
 
 
@@ -76,6 +76,10 @@ def main(filename):
     # Simple SLAM
     nav_obstacles_bounds = simple_slam(client, bestman, True)
 
+    # Or map by laser scans from the base, then plan with costmap=grid_mapper.get_costmap()
+    # grid_mapper = OccupancyGridMapper(client, bestman)
+    # grid_mapper.update()
+
     # navigate algorithm
     goal_base_pose = Pose([3.3, 4.0, 0], [0.0, 0.0, 0])
     nav_planner = AStarPlanner(
@@ -83,6 +87,7 @@ def main(filename):
         obstacles_bounds=nav_obstacles_bounds,
         resolution=0.05,
         enable_plot=False,
+        simplify=True,
     )
 
     # nav_planner = RRTPlanner(
@@ -8,25 +8,37 @@
 # @Description:   : Collision detection module
 """
 
+import numpy as np
+
 from ..utils import *
 
 
 class Basic_Collision:
     """A class for handling collision detection."""
 
-    def __init__(self, robot):
+    def __init__(self, robot, kinematic=True, acm_samples=0):
         """
         Initializes the Collision class.
 
         Args:
             robot (Robot): The robot object.
+            kinematic (bool, optional): If True, states are checked by setting the arm joints
+                kinematically, without stepping physics. Otherwise the arm is reset and the
+                simulation is stepped before each check.
+            acm_samples (int, optional): If > 0, self-collision pairs that never or always
+                collide in this many random configurations are not checked.
         """
         self.robot = robot
+        self.kinematic = kinematic
+        self.acm_samples = acm_samples
         self.client = robot.client
         self.base_id = robot.sim_get_base_id()
         self.arm_id = robot.sim_get_arm_id()
         self.arm_controllable_joints = robot.sim_get_arm_controllable_joints()
-        self.obstacles = []
+
+        # obstacle registry: obstacle id -> (link ids, link AABBs), insertion ordered
+        self.obstacles = {}
+        self.obstacles_dirty = True  # the stacked broad-phase arrays need a rebuild
         self.setup()
 
     def add_obstacle(self, obstacle):
@@ -39,8 +51,13 @@ class Basic_Collision:
         """
         if obstacle is not None:
             obstacle_id = self.client.resolve_object_id(obstacle)
-            self.obstacles.append(obstacle_id)
-            self.setup()
+            if obstacle_id not in (self.arm_id, self.base_id):
+                links = get_all_links(obstacle_id)
+                self.obstacles[obstacle_id] = (
+                    links,
+                    get_link_aabbs(obstacle_id, links),
+                )
+                self.obstacles_dirty = True
 
     def remove_obstacle(self, obstacle):
         """
@@ -52,16 +69,37 @@ class Basic_Collision:
         """
         if obstacle is not None:
             obstacle_id = self.client.resolve_object_id(obstacle)
-            if obstacle_id in self.obstacles:
-                self.obstacles.remove(obstacle_id)
-                self.setup(self.obstacles)
+            if self.obstacles.pop(obstacle_id, None) is not None:
+                self.obstacles_dirty = True
+
+    def set_obstacles(self):
+        """
+        Use every body in the scene, except the robot itself, as an obstacle.
+        """
+        self.obstacles = {}
+        self.known_bodies = get_bodies()
+        for body_id in sorted(self.known_bodies):
+            self.add_obstacle(body_id)
+
+    def sync_obstacles(self):
+        """
+        Registers bodies added to the scene since the last sync, forgets removed bodies
+        and refreshes the AABBs of the others. Obstacles removed with remove_obstacle stay removed.
+        """
+        bodies = get_bodies()
+        for obstacle_id in [i for i in self.obstacles if i not in bodies]:
+            self.remove_obstacle(obstacle_id)
+        for body_id in sorted(bodies - self.known_bodies):
+            self.add_obstacle(body_id)
+        self.known_bodies = bodies
+        self.update_obstacle_aabbs()
 
     def get_obstacles_info(self):
         """
         Check obstacles in the scene and print them to the console.
         """
 
-        if self.obstacles == []:
+        if len(self.obstacles) == 0:
             print("[OMPL Planner] \033[33mwarning\033[0m: Obstacle list is empty")
         else:
             for obstacle_id in self.obstacles:
@@ -77,20 +115,71 @@ class Basic_Collision:
 
         Args:
             self_collisions (bool, optional): Whether to check for self-collisions. Defaults to True.
-            allow_collision_links (list, optional): Links that are allowed to collide. Defaults to [].
         """
         # set arm link pairs
         self.arm_link_pairs = (
-            get_arm_link_pairs(self.arm_id, self.arm_controllable_joints)
+            get_cached_arm_link_pairs(
+                self.arm_id, self.arm_controllable_joints, self.acm_samples
+            )
             if self_collisions
             else []
         )
 
-        # set arm obstacle pairs
-        self.obstacles = list(range(p.getNumBodies()))
-        self.obstacles.remove(self.arm_id)
-        self.obstacles.remove(self.base_id)
-        self.arm_obstacle_pairs = list(product([self.arm_id], self.obstacles))
+        # a base merged with the arm is checked below, not as a self-collision
+        arm_links = set(self.robot.sim_get_arm_links())
+        self.arm_link_pairs = [
+            pair
+            for pair in self.arm_link_pairs
+            if pair[0] in arm_links and pair[1] in arm_links
+        ]
+
+        # arm and base links, the base does not move while the arm is being planned
+        self.arm_links = self.robot.sim_get_arm_links()
+        self.arm_base_check_rows = [
+            self.arm_links.index(link) for link in self.arm_controllable_joints[1:]
+        ]
+        self.base_links = self.robot.sim_get_base_links()
+        self.base_aabbs = get_link_aabbs(self.base_id, self.base_links)
+
+        # set obstacles
+        self.set_obstacles()
+
+    def update_obstacle_aabbs(self, obstacles=None):
+        """
+        Refreshes the cached world AABBs of obstacles that may have moved.
+
+        Obstacles do not move while the arm is being planned, so their AABBs only need
+        to be refreshed when the scene changes, e.g. once before each planning query.
+
+        Args:
+            obstacles (list, optional): IDs or names of the obstacles to refresh. Defaults to all obstacles.
+        """
+        if obstacles is None:
+            obstacles = list(self.obstacles)
+        for obstacle in obstacles:
+            obstacle_id = self.client.resolve_object_id(obstacle)
+            if obstacle_id in self.obstacles:
+                links = self.obstacles[obstacle_id][0]
+                self.obstacles[obstacle_id] = (
+                    links,
+                    get_link_aabbs(obstacle_id, links),
+                )
+        self.base_aabbs = get_link_aabbs(self.base_id, self.base_links)
+        self.obstacles_dirty = True
+
+    def build_broad_phase(self):
+        """
+        Stacks the cached obstacle link AABBs into the arrays used by the broad phase.
+        """
+        self.obstacle_links = [
+            (obstacle_id, link)
+            for obstacle_id, (links, _) in self.obstacles.items()
+            for link in links
+        ]
+        self.obstacle_aabbs = np.concatenate(
+            [np.zeros((0, 2, 3))] + [aabbs for _, aabbs in self.obstacles.values()]
+        )
+        self.obstacles_dirty = False
 
     def is_state_valid(self, state):
         """
@@ -102,8 +191,27 @@ class Basic_Collision:
         Returns:
             bool: True if the state is valid, False otherwise.
         """
-        self.robot.sim_reset_arm_to_joint_values(state)
+        if not self.kinematic:
+            self.robot.sim_reset_arm_to_joint_values(state)
+            return self.check_state_collision_free()
+
+        # set the state kinematically and restore the arm afterwards
+        joint_values, joint_velocities = self.robot.sim_get_joint_states()
+        self.robot.sim_set_joint_states(state)
+        try:
+            return self.check_state_collision_free()
+        finally:
+            self.robot.sim_set_joint_states(
+                joint_values, joint_velocities=joint_velocities
+            )
 
+    def check_state_collision_free(self):
+        """
+        Checks the current arm state for collisions.
+
+        Returns:
+            bool: True if the arm neither collides with itself nor with obstacles.
+        """
         # check arm self-collision
         if self.check_arm_self_collision():
             return False
@@ -151,20 +259,30 @@ class Basic_Collision:
             True if the bodies are in collision or within the distance threshold, otherwise False.
         """
 
-        # check collision between arm and obstacle + arm and base(Does not include the arm and the base directly adjacent link)
-        return any(
-            len(p.getClosestPoints(bodyA=arm, bodyB=obstacle, distance=max_distance))
-            != 0
-            for arm, obstacle in self.arm_obstacle_pairs
-        ) or any(
-            len(
-                p.getClosestPoints(
-                    bodyA=self.arm_id,
-                    bodyB=self.base_id,
-                    distance=max_distance,
-                    linkIndexA=link,
-                )
-            )
-            != 0
-            for link in self.arm_controllable_joints[1:]
+        # broad phase: only keep (arm link, obstacle link) pairs whose AABBs overlap
+        if self.obstacles_dirty:
+            self.build_broad_phase()
+        arm_aabbs = get_link_aabbs(self.arm_id, self.arm_links)
+        overlaps = aabbs_overlap(arm_aabbs, self.obstacle_aabbs, max_distance)
+        for i, j in zip(*np.nonzero(overlaps)):
+            obstacle_id, obstacle_link = self.obstacle_links[j]
+            if pairwise_link_collision(
+                self.arm_id, self.arm_links[i], obstacle_id, obstacle_link, max_distance
+            ):
+                return True
+
+        # check collision between arm and base (Does not include the arm and the base directly adjacent link)
+        overlaps = aabbs_overlap(
+            arm_aabbs[self.arm_base_check_rows], self.base_aabbs, max_distance
         )
+        for i, j in zip(*np.nonzero(overlaps)):
+            if pairwise_link_collision(
+                self.arm_id,
+                self.arm_links[self.arm_base_check_rows[i]],
+                self.base_id,
+                self.base_links[j],
+                max_distance,
+            ):
+                return True
+
+        return False
@@ -8,6 +8,7 @@
 # @Description:   : Collision detection module
 """
 
+import fcl
 import pybullet as p
 
 from ..utils import *
@@ -15,21 +16,31 @@ from .utils import *
 
 
 class FCL_Collision:
-    """A class for handling collision detection."""
+    """A class for handling collision detection with FCL, interchangeable with Basic_Collision."""
 
-    def __init__(self, robot):
+    def __init__(self, robot, kinematic=True, acm_samples=0):
         """
         Initializes the Collision class.
 
         Args:
             robot (Robot): The robot object.
+            kinematic (bool, optional): If True, states are checked by setting the arm joints
+                kinematically, without stepping physics. Otherwise the arm is reset and the
+                simulation is stepped before each check.
+            acm_samples (int, optional): If > 0, self-collision pairs that never or always
+                collide in this many random configurations are not checked.
         """
         self.robot = robot
+        self.kinematic = kinematic
+        self.acm_samples = acm_samples
         self.client = robot.client
         self.arm_id = robot.sim_get_arm_id()
         self.base_id = robot.sim_get_base_id()
         self.arm_controllable_joints = robot.sim_get_arm_controllable_joints()
-        self.obstacles = []
+
+        # obstacle registry: obstacle id -> {link id: collision objects}, insertion ordered
+        self.obstacles = {}
+        self.obstacles_dirty = True  # the obstacle broad-phase manager needs a rebuild
         self.setup()
 
     def add_obstacle(self, obstacle):
@@ -42,8 +53,14 @@ class FCL_Collision:
         """
         if obstacle is not None:
             obstacle_id = self.client.resolve_object_id(obstacle)
-            self.obstacles.append(obstacle_id)
-            self.setup()
+            if obstacle_id not in (self.arm_id, self.base_id):
+                link_objects = {
+                    link: create_link_collision_objects(obstacle_id, link)
+                    for link in get_all_links(obstacle_id)
+                }
+                set_collision_object_poses(obstacle_id, link_objects)
+                self.obstacles[obstacle_id] = link_objects
+                self.obstacles_dirty = True
 
     def remove_obstacle(self, obstacle):
         """
@@ -55,16 +72,37 @@ class FCL_Collision:
         """
         if obstacle is not None:
             obstacle_id = self.client.resolve_object_id(obstacle)
-            if obstacle_id in self.obstacles:
-                self.obstacles.remove(obstacle_id)
-                self.setup(self.obstacles)
+            if self.obstacles.pop(obstacle_id, None) is not None:
+                self.obstacles_dirty = True
+
+    def set_obstacles(self):
+        """
+        Use every body in the scene, except the robot itself, as an obstacle.
+        """
+        self.obstacles = {}
+        self.known_bodies = get_bodies()
+        for body_id in sorted(self.known_bodies):
+            self.add_obstacle(body_id)
+
+    def sync_obstacles(self):
+        """
+        Registers bodies added to the scene since the last sync, forgets removed bodies
+        and refreshes the poses of the others. Obstacles removed with remove_obstacle stay removed.
+        """
+        bodies = get_bodies()
+        for obstacle_id in [i for i in self.obstacles if i not in bodies]:
+            self.remove_obstacle(obstacle_id)
+        for body_id in sorted(bodies - self.known_bodies):
+            self.add_obstacle(body_id)
+        self.known_bodies = bodies
+        self.update_obstacle_poses()
 
     def get_obstacles_info(self):
         """
         Check obstacles in the scene and print them to the console.
         """
 
-        if self.obstacles == []:
+        if len(self.obstacles) == 0:
             print("[OMPL Planner] \033[33mwarning\033[0m: Obstacle list is empty")
         else:
             for obstacle_id in self.obstacles:
@@ -74,32 +112,102 @@ class FCL_Collision:
                     f"[OMPL Planner] \033[34mInfo\033[0m: Obstacle Name: {item_name}, ID: {obstacle_id}"
                 )
 
-    def setup(self, self_collisions=True, allow_collision_links=[]):
+    def setup(self, self_collisions=True):
         """
         Sets up collision detection.
 
         Args:
             self_collisions (bool, optional): Whether to check for self-collisions. Defaults to True.
-            allow_collision_links (list, optional): Links that are allowed to collide. Defaults to [].
         """
         # set arm link pairs
         self.arm_link_pairs = (
-            get_arm_link_pairs(self.arm_id, self.arm_controllable_joints)
+            get_cached_arm_link_pairs(
+                self.arm_id, self.arm_controllable_joints, self.acm_samples
+            )
             if self_collisions
             else []
         )
 
-        # set arm obstacle pairs
-        self.obstacles = list(range(p.getNumBodies()))
-        self.obstacles.remove(self.arm_id)
-        self.obstacles.remove(self.base_id)
-        self.arm_obstacle_pairs = list(product([self.arm_id], self.obstacles))
-        self.link_models = {}
-        for body_id in p.getNumBodies():
-            for link_id in get_all_links(body_id):
-                self.link_models[f"{body_id}{link_id}"] = create_fcl_bvh_from_bullet(
-                    body_id, link_id
-                )
+        # a base merged with the arm is checked below, not as a self-collision
+        arm_links = set(self.robot.sim_get_arm_links())
+        self.arm_link_pairs = [
+            pair
+            for pair in self.arm_link_pairs
+            if pair[0] in arm_links and pair[1] in arm_links
+        ]
+
+        # arm collision objects, moved before every check
+        self.arm_objects = {
+            link: create_link_collision_objects(self.arm_id, link)
+            for link in self.robot.sim_get_arm_links()
+        }
+        self.arm_manager = fcl.DynamicAABBTreeCollisionManager()
+        self.arm_manager.registerObjects(
+            [obj for objects in self.arm_objects.values() for obj, _, _ in objects]
+        )
+        self.arm_manager.setup()
+
+        # arm links checked against the base (Does not include the arm and the base directly adjacent link)
+        self.arm_base_manager = fcl.DynamicAABBTreeCollisionManager()
+        self.arm_base_manager.registerObjects(
+            [
+                obj
+                for link in self.arm_controllable_joints[1:]
+                for obj, _, _ in self.arm_objects[link]
+            ]
+        )
+        self.arm_base_manager.setup()
+
+        # base collision objects, the base does not move while the arm is being planned
+        self.base_objects = {
+            link: create_link_collision_objects(self.base_id, link)
+            for link in self.robot.sim_get_base_links()
+        }
+        set_collision_object_poses(self.base_id, self.base_objects)
+        self.base_manager = fcl.DynamicAABBTreeCollisionManager()
+        self.base_manager.registerObjects(
+            [obj for objects in self.base_objects.values() for obj, _, _ in objects]
+        )
+        self.base_manager.setup()
+
+        # set obstacles
+        self.set_obstacles()
+
+    def update_obstacle_poses(self, obstacles=None):
+        """
+        Moves the collision objects of obstacles that may have moved to their current poses.
+
+        Obstacles do not move while the arm is being planned, so their poses only need
+        to be refreshed when the scene changes, e.g. once before each planning query.
+
+        Args:
+            obstacles (list, optional): IDs or names of the obstacles to refresh. Defaults to all obstacles.
+        """
+        if obstacles is None:
+            obstacles = list(self.obstacles)
+        for obstacle in obstacles:
+            obstacle_id = self.client.resolve_object_id(obstacle)
+            if obstacle_id in self.obstacles:
+                set_collision_object_poses(obstacle_id, self.obstacles[obstacle_id])
+        set_collision_object_poses(self.base_id, self.base_objects)
+        self.base_manager.update()
+        self.obstacles_dirty = True
+
+    def build_broad_phase(self):
+        """
+        Registers the collision objects of all obstacles in the obstacle broad-phase manager.
+        """
+        self.obstacle_manager = fcl.DynamicAABBTreeCollisionManager()
+        self.obstacle_manager.registerObjects(
+            [
+                obj
+                for link_objects in self.obstacles.values()
+                for objects in link_objects.values()
+                for obj, _, _ in objects
+            ]
+        )
+        self.obstacle_manager.setup()
+        self.obstacles_dirty = False
 
     def is_state_valid(self, state):
         """
@@ -111,6 +219,30 @@ class FCL_Collision:
         Returns:
             bool: True if the state is valid, False otherwise.
         """
+        if not self.kinematic:
+            self.robot.sim_reset_arm_to_joint_values(state)
+            return self.check_state_collision_free()
+
+        # set the state kinematically and restore the arm afterwards
+        joint_values, joint_velocities = self.robot.sim_get_joint_states()
+        self.robot.sim_set_joint_states(state)
+        try:
+            return self.check_state_collision_free()
+        finally:
+            self.robot.sim_set_joint_states(
+                joint_values, joint_velocities=joint_velocities
+            )
+
+    def check_state_collision_free(self):
+        """
+        Checks the current arm state for collisions.
+
+        Returns:
+            bool: True if the arm neither collides with itself nor with obstacles.
+        """
+        # move the arm collision objects with a single batched link state query
+        set_collision_object_poses(self.arm_id, self.arm_objects)
+
         # check arm self-collision
         if self.check_arm_self_collision():
             return False
@@ -123,40 +255,46 @@ class FCL_Collision:
 
     def check_arm_self_collision(self):
         """
-        Checks if two specific links from two different bodies are within a specified distance.
-        Args:
-            body1: ID of the first body.
-            link1: Link index of the first body.
-            body2: ID of the second body.
-            link2: Link index of the second body (default is BASE_LINK).
-            max_distance: Maximum allowed distance to consider collision (default is MAX_DISTANCE).
-        Returns:
-            True if the links are in collision or within the distance threshold, otherwise False.
-        """
-        link1 = link_models[f"{body1}{link1}"]
-        link_state1 = p.getLinkState(body1, link1)
-        transform1 = fcl.Transform(link_state1[4], link_state1[5])
-        link1.setTransform(transform1)
+        Checks if any pair of arm links that may collide is in collision.
 
-        link2 = link_models[f"{body2}{link2}"]
-        link_state2 = p.getLinkState(body2, link2)
-        transform2 = fcl.Transform(link_state2[4], link_state2[5])
-        link2.setTransform(transform2)
+        The arm collision objects must already be at the current arm state.
 
-        request = fcl.CollisionRequest()
-        result = fcl.CollisionResult()
+        Returns:
+            True if any arm link pair is in collision, otherwise False.
+        """
+        return any(
+            check_link_objects_collision(
+                self.arm_objects[link1], self.arm_objects[link2]
+            )
+            for link1, link2 in self.arm_link_pairs
+        )
 
-        collision = fcl.collide(link1, link2, request, result)
+    def check_arm_obstacle_collision(self):
+        """
+        Checks if the arm is in collision with any obstacle or with the base.
 
-        return collision
+        The arm collision objects must already be at the current arm state. FCL only
+        reports contacts, so unlike Basic_Collision no distance threshold is applied.
 
-    def check_arm_obstacle_collision(self, max_distance=MAX_DISTANCE):
-        """
-        Checks if two bodies are in collision or within a certain distance.
-        Args:
-            body1: ID of the first body.
-            body2: ID of the second body.
-            max_distance: Maximum allowed distance to consider collision.
         Returns:
-            True if the bodies are in collision or within the distance threshold, otherwise False.
+            True if the arm is in collision with an obstacle or the base, otherwise False.
         """
+        if self.obstacles_dirty:
+            self.build_broad_phase()
+
+        # arm against obstacles
+        self.arm_manager.update()
+        collision_data = fcl.CollisionData()
+        self.arm_manager.collide(
+            self.obstacle_manager, collision_data, fcl.defaultCollisionCallback
+        )
+        if collision_data.result.is_collision:
+            return True
+
+        # arm against base
+        self.arm_base_manager.update()
+        collision_data = fcl.CollisionData()
+        self.arm_base_manager.collide(
+            self.base_manager, collision_data, fcl.defaultCollisionCallback
+        )
+        return collision_data.result.is_collision
@@ -0,0 +1,3 @@
+from .FCL_Collision import FCL_Collision
+
+__all__ = ["FCL_Collision"]
@@ -8,46 +8,178 @@
 # @Description:   : Adopted from https://github.com/StanfordVL/iGibson/blob/master/igibson/external/pybullet_tools/utils.py
 """
 
-
-from itertools import product
+import hashlib
+import os
 
 import fcl
+import numpy as np
 import pybullet as p
 import trimesh
 
 from ..utils import *
 
+MESH_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bestman", "meshes")
+
+# in-process cache of the FCL geometries, keyed by (mesh file, scale)
+bvh_cache = {}
+
+
+def load_mesh_arrays(mesh_file_path, cache_dir=MESH_CACHE_DIR):
+    """
+    Loads the vertices and faces of a mesh file, through an on-disk cache.
+    Args:
+        mesh_file_path: Path to the mesh file.
+        cache_dir: Directory of the on-disk cache, None to always parse the mesh file.
+    Returns:
+        The vertices (V, 3) and faces (F, 3) arrays.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        stat = os.stat(mesh_file_path)
+        key = "{}_{}_{}".format(
+            os.path.abspath(mesh_file_path), stat.st_size, stat.st_mtime_ns
+        )
+        cache_path = os.path.join(
+            cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npz"
+        )
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as mesh:
+                return mesh["vertices"], mesh["faces"]
+
+    mesh = trimesh.load(mesh_file_path, force="mesh")
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    faces = np.asarray(mesh.faces, dtype=np.int32)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, vertices=vertices, faces=faces)
+        os.replace(tmp_path, cache_path)
+    return vertices, faces
 
-def create_fcl_bvh_from_bullet(robot_id, link_index):
-    collision_shape_data = p.getCollisionShapeData(robot_id, link_index)[0]
-    mesh_file_path = collision_shape_data[4].decode("utf-8")
-    mesh = trimesh.load(mesh_file_path)
-    bvh_model = fcl.BVHModel()
-    vertices = mesh.vertices
-    faces = mesh.faces
-    bvh_model.beginModel(len(vertices), len(faces))
-    bvh_model.addSubModel(vertices, faces)
-    bvh_model.endModel()
-    return fcl.CollisionObject(bvh_model)
+
+def get_mesh_bvh(mesh_file_path, scale):
+    """
+    Gets the FCL BVH model of a mesh file, built once per file and scale.
+    Args:
+        mesh_file_path: Path to the mesh file.
+        scale: Scale of the mesh along x, y and z.
+    Returns:
+        A fcl.BVHModel shared by every collision object using this mesh.
+    """
+    key = (mesh_file_path, tuple(scale))
+    if key not in bvh_cache:
+        vertices, faces = load_mesh_arrays(mesh_file_path)
+        vertices = vertices * np.asarray(scale, dtype=np.float64)
+        bvh_model = fcl.BVHModel()
+        bvh_model.beginModel(len(vertices), len(faces))
+        bvh_model.addSubModel(vertices, faces)
+        bvh_model.endModel()
+        bvh_cache[key] = bvh_model
+    return bvh_cache[key]
 
 
-def check_body_collision(body1, body2, links1=None, links2=None):
+def create_fcl_geometry(shape_data):
     """
-    Checks collision between any link pair from two different bodies.
+    Creates the FCL geometry of a pybullet collision shape.
     Args:
-        body1: ID of the first body.
-        links1: List of link indices for the first body.
-        body2: ID of the second body.
-        links2: List of link indices for the second body (default is all links).
+        shape_data: One entry of p.getCollisionShapeData.
     Returns:
-        True if any link from body1 collides with any link from body2, otherwise False.
-    """
-    if links1 is None:
-        links1 = get_all_links(body1)
-    if links2 is None:
-        links2 = get_all_links(body2)
-    return any(
-        check_link_collision(body1, body2, link1, link2)
-        for link1, link2 in product(links1, links2)
-        if not (body1 == body2 and link1 == link2)
-    )
+        A fcl.CollisionGeometry, or None if the shape type is not supported.
+    """
+    geometry_type, dimensions, file_name = shape_data[2], shape_data[3], shape_data[4]
+    if geometry_type == p.GEOM_SPHERE:
+        return fcl.Sphere(dimensions[0])
+    if geometry_type == p.GEOM_BOX:
+        return fcl.Box(*dimensions)
+    if geometry_type == p.GEOM_CYLINDER:
+        return fcl.Cylinder(dimensions[1], dimensions[0])
+    if geometry_type == p.GEOM_CAPSULE:
+        return fcl.Capsule(dimensions[1], dimensions[0])
+    if geometry_type == p.GEOM_PLANE:
+        return fcl.Plane(np.array([0.0, 0.0, 1.0]), 0.0)
+    if geometry_type == p.GEOM_MESH:
+        mesh_file_path = file_name.decode("utf-8")
+        if os.path.exists(mesh_file_path):
+            return get_mesh_bvh(mesh_file_path, dimensions)
+    return None
+
+
+def create_link_collision_objects(body, link):
+    """
+    Creates the FCL collision objects of a link, one per collision shape.
+    Args:
+        body: The body ID.
+        link: The link index.
+    Returns:
+        A list of (fcl.CollisionObject, local position, local orientation), where the local
+        pose is relative to the link's center of mass frame.
+    """
+    collision_objects = []
+    for shape_data in p.getCollisionShapeData(body, link):
+        geometry = create_fcl_geometry(shape_data)
+        if geometry is not None:
+            collision_objects.append(
+                (fcl.CollisionObject(geometry), shape_data[5], shape_data[6])
+            )
+    return collision_objects
+
+
+def get_link_com_poses(body, links):
+    """
+    Reads the world pose of the center of mass frame of several links, with one batched query.
+    Args:
+        body: The body ID.
+        links: List of link indices, may include BASE_LINK.
+    Returns:
+        A dict of link index to (position, orientation).
+    """
+    poses = {}
+    joint_links = [link for link in links if link != BASE_LINK]
+    if len(joint_links) != len(links):
+        poses[BASE_LINK] = p.getBasePositionAndOrientation(body)
+    if joint_links:
+        link_states = p.getLinkStates(body, joint_links, computeForwardKinematics=True)
+        for link, link_state in zip(joint_links, link_states):
+            poses[link] = (link_state[0], link_state[1])
+    return poses
+
+
+def set_collision_object_poses(body, link_objects):
+    """
+    Moves the FCL collision objects of a body to the current pybullet link poses.
+    Args:
+        body: The body ID.
+        link_objects: A dict of link index to the list returned by create_link_collision_objects.
+    """
+    poses = get_link_com_poses(body, list(link_objects))
+    for link, collision_objects in link_objects.items():
+        link_position, link_orientation = poses[link]
+        for collision_object, local_position, local_orientation in collision_objects:
+            position, orientation = p.multiplyTransforms(
+                link_position, link_orientation, local_position, local_orientation
+            )
+            x, y, z, w = orientation
+            collision_object.setTransform(
+                fcl.Transform(np.array([w, x, y, z]), np.array(position))
+            )
+
+
+def check_link_objects_collision(collision_objects1, collision_objects2):
+    """
+    Checks collision between the collision objects of two links.
+    Args:
+        collision_objects1: The list returned by create_link_collision_objects for the first link.
+        collision_objects2: The list returned by create_link_collision_objects for the second link.
+    Returns:
+        True if any shape of the first link collides with any shape of the second link, otherwise False.
+    """
+    request = fcl.CollisionRequest()
+    for collision_object1, _, _ in collision_objects1:
+        for collision_object2, _, _ in collision_objects2:
+            if fcl.collide(
+                collision_object1, collision_object2, request, fcl.CollisionResult()
+            ):
+                return True
+    return False
@@ -8,13 +8,24 @@
 # @Description:   : Adopted from https://github.com/StanfordVL/iGibson/blob/master/igibson/external/pybullet_tools/utils.py
 """
 
+import hashlib
+import json
+import math
+import os
 from collections import namedtuple
 from itertools import combinations, product
 
+import numpy as np
 import pybullet as p
 
 BASE_LINK = -1
 MAX_DISTANCE = 0
+LINK_PAIRS_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "bestman", "link_pairs"
+)
+
+# in-process cache of the link pair tables, keyed like the files in LINK_PAIRS_CACHE_DIR
+link_pairs_cache = {}
 
 
 def get_moving_links(body, joints):
@@ -82,6 +93,124 @@ def get_arm_link_pairs(body, joints, disabled_collisions=set(), only_moving=True
     return check_link_pairs
 
 
+def get_model_hash(body):
+    """
+    Gets a hash of the kinematic and collision model of a body.
+    Bodies loaded from the same URDF with the same scaling share the same hash.
+    Args:
+        body: The body ID.
+    Returns:
+        A hex digest string.
+    """
+
+    def fmt(value):
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, (list, tuple)):
+            return [fmt(v) for v in value]
+        return value
+
+    model = []
+    for link in get_all_links(body):
+        if link != BASE_LINK:
+            model.append(fmt(p.getJointInfo(body, link)))
+        # drop the body unique id of each collision shape
+        model.append([fmt(shape[1:]) for shape in p.getCollisionShapeData(body, link)])
+    return hashlib.sha1(json.dumps(model).encode("utf-8")).hexdigest()
+
+
+def learn_disabled_collisions(body, joints, link_pairs, num_samples=1000, seed=0):
+    """
+    Learns the link pairs that never or always collide by sampling random configurations,
+    like an allowed collision matrix. The body joints are restored afterwards.
+    Args:
+        body: The body ID.
+        joints: List of joint indices to sample.
+        link_pairs: The link pairs to test.
+        num_samples: Number of random configurations.
+        seed: Seed of the random generator.
+    Returns:
+        A list of link pairs that never or always collided in the samples.
+    """
+    limits = []
+    for joint in joints:
+        info = get_joint_info(body, joint)
+        lower, upper = info.jointLowerLimit, info.jointUpperLimit
+        if lower > upper:  # continuous joint
+            lower, upper = -math.pi, math.pi
+        limits.append((lower, upper))
+    limits = np.array(limits)
+
+    saved_states = p.getJointStates(body, joints)
+    rng = np.random.default_rng(seed)
+    collision_counts = np.zeros(len(link_pairs), dtype=int)
+    for _ in range(num_samples):
+        values = rng.uniform(limits[:, 0], limits[:, 1])
+        p.resetJointStatesMultiDof(body, joints, [[value] for value in values])
+        for i, (link1, link2) in enumerate(link_pairs):
+            collision_counts[i] += pairwise_link_collision(body, link1, body, link2)
+    p.resetJointStatesMultiDof(
+        body,
+        joints,
+        [[state[0]] for state in saved_states],
+        [[state[1]] for state in saved_states],
+    )
+
+    return [
+        pair
+        for pair, count in zip(link_pairs, collision_counts)
+        if count == 0 or count == num_samples
+    ]
+
+
+def get_cached_arm_link_pairs(
+    body, joints, acm_samples=0, cache_dir=LINK_PAIRS_CACHE_DIR
+):
+    """
+    Gets the self-collision link pairs of a body, computed once per robot model.
+    The table is kept in memory and on disk, keyed by the model hash and the joints.
+    Args:
+        body: The body ID.
+        joints: List of joint indices of the body.
+        acm_samples: If > 0, also learn (once) the pairs that never or always collide
+            with this many random configurations, and leave them out.
+        cache_dir: Directory of the on-disk cache, None to only cache in memory.
+    Returns:
+        A list of link pairs that should be checked for collisions.
+    """
+    key = "{}_{}".format(get_model_hash(body), "-".join(map(str, joints)))
+    cache_path = os.path.join(cache_dir, key + ".json") if cache_dir else None
+
+    entry = link_pairs_cache.get(key)
+    if entry is None and cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            entry = json.load(f)
+    dirty = entry is None
+    if entry is None:
+        entry = {
+            "pairs": get_arm_link_pairs(body, joints),
+            "disabled": [],
+            "acm_samples": 0,
+        }
+    if acm_samples > entry["acm_samples"]:
+        entry["disabled"] = learn_disabled_collisions(
+            body, joints, [tuple(pair) for pair in entry["pairs"]], acm_samples
+        )
+        entry["acm_samples"] = acm_samples
+        dirty = True
+
+    link_pairs_cache[key] = entry
+    if dirty and cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(entry, f)
+
+    disabled = set(tuple(pair) for pair in entry["disabled"])
+    return [tuple(pair) for pair in entry["pairs"] if tuple(pair) not in disabled]
+
+
 #####################################
 
 # Named tuple for joint information
@@ -109,6 +238,10 @@ JointInfo = namedtuple(
 )
 
 
+def get_bodies():
+    return {p.getBodyUniqueId(i) for i in range(p.getNumBodies())}
+
+
 def get_joint_info(body, joint):
     return JointInfo(*p.getJointInfo(body, joint))
 
@@ -185,3 +318,58 @@ def are_links_adjacent(body, link1, link2):
     return (get_link_parent(body, link1) == link2) or (
         get_link_parent(body, link2) == link1
     )
+
+
+def pairwise_link_collision(body1, link1, body2, link2, max_distance=MAX_DISTANCE):
+    """
+    Checks if two specific links are in collision or within a certain distance.
+    Args:
+        body1: ID of the first body.
+        link1: Link index of the first body.
+        body2: ID of the second body.
+        link2: Link index of the second body.
+        max_distance: Maximum allowed distance to consider collision.
+    Returns:
+        True if the links are in collision or within the distance threshold, otherwise False.
+    """
+    return (
+        len(
+            p.getClosestPoints(
+                bodyA=body1,
+                bodyB=body2,
+                distance=max_distance,
+                linkIndexA=link1,
+                linkIndexB=link2,
+            )
+        )
+        != 0
+    )
+
+
+def get_link_aabbs(body, links):
+    """
+    Gets the world axis-aligned bounding boxes of the given links.
+    Args:
+        body: The body ID.
+        links: List of link indices.
+    Returns:
+        An array of shape (len(links), 2, 3) holding the lower and upper corner of each AABB.
+    """
+    return np.array([p.getAABB(body, link) for link in links], dtype=float).reshape(
+        -1, 2, 3
+    )
+
+
+def aabbs_overlap(aabbs1, aabbs2, margin=0.0):
+    """
+    Tests every AABB of the first set against every AABB of the second set.
+    Args:
+        aabbs1: Array of shape (N, 2, 3).
+        aabbs2: Array of shape (M, 2, 3).
+        margin: Distance by which the boxes are grown before testing.
+    Returns:
+        A boolean array of shape (N, M), True where the (grown) boxes overlap.
+    """
+    lower1, upper1 = aabbs1[:, None, 0] - margin, aabbs1[:, None, 1] + margin
+    lower2, upper2 = aabbs2[None, :, 0], aabbs2[None, :, 1]
+    return np.all((lower1 <= upper2) & (lower2 <= upper1), axis=-1)
@@ -44,7 +44,16 @@ class OMPL_Planner:
 
         # obstacles
         self.target_id = None
-        self.collision = Basic_Collision(robot)
+        if Planner_cfg.collision_backend == "fcl":
+            from ..Collision_Detection.FCL import FCL_Collision
+
+            self.collision = FCL_Collision(
+                robot, Planner_cfg.kinematic_validity, Planner_cfg.acm_samples
+            )
+        else:
+            self.collision = Basic_Collision(
+                robot, Planner_cfg.kinematic_validity, Planner_cfg.acm_samples
+            )
 
         # preparation for OMPL planning
         self.space = ob.RealVectorStateSpace(self.DOF)  # construct the state space
@@ -203,7 +212,8 @@ class OMPL_Planner:
 
         print("[OMPL Planner] \033[34mInfo\033[0m: Start planning...")
 
-        # remove target object
+        # pick up scene changes since the last query, remove target object
+        self.collision.sync_obstacles()
         self.remove_obstacle(self.target_id)
 
         # set the start and goal states
@@ -223,11 +233,12 @@ class OMPL_Planner:
             )  # Linear interpolation, Generate more intermediate states to make the path smoother and more refined
             sol_path_states = sol_path_geometric.getStates()
             path = [self.state_to_list(state) for state in sol_path_states]
-            self.add_obstacle(self.target_id)
             print("[OMPL Planner] \033[34mInfo\033[0m: End planning!")
             return path
         except RuntimeError as _:
             print("[OMPL Planner] \033[31merror\033[0m: No solution found!")
+        finally:
+            self.add_obstacle(self.target_id)
 
     # ----------------------------------------------------------------
     # Utils
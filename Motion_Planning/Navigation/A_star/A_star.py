@@ -9,11 +9,108 @@
 """
 
 
+import heapq
+import math
+
 import matplotlib.pyplot as plt
-import networkx as nwx
 import numpy as np
 
-from ..utils import AreaBounds, plot_rectangle
+from ..costmap import get_costmap
+from ..utils import AreaBounds, plot_rectangle, simplify_path
+
+
+def astar_grid_search(occupancy, start, goal, connectivity=8):
+    """
+    A* search on a 2D occupancy grid with a binary heap.
+
+    Diagonal moves are only allowed when both adjacent orthogonal cells are free,
+    so paths never cut obstacle corners.
+
+    Args:
+        occupancy (np.ndarray): 2D grid, non-zero cells are obstacles.
+        start (tuple): Start cell (i, j).
+        goal (tuple): Goal cell (i, j).
+        connectivity (int, optional): 4 for Manhattan moves, 8 for octile moves. Defaults to 8.
+
+    Returns:
+        list: The path as a list of cells (i, j) from start to goal, or None if the goal is unreachable.
+    """
+    # pad the grid with an obstacle border, so that neighbours never leave the grid
+    width = occupancy.shape[1] + 2
+    blocked = np.pad(occupancy != 0, 1, constant_values=True).ravel().tolist()
+    start_index = (start[0] + 1) * width + start[1] + 1
+    goal_index = (goal[0] + 1) * width + goal[1] + 1
+    goal_row, goal_col = divmod(goal_index, width)
+
+    # (offset, step cost, offsets of the two cells a diagonal move passes between)
+    moves = [(-width, 1.0, None), (width, 1.0, None), (-1, 1.0, None), (1, 1.0, None)]
+    if connectivity == 8:
+        diagonal_cost = math.sqrt(2.0)
+        moves += [
+            (-width - 1, diagonal_cost, (-width, -1)),
+            (-width + 1, diagonal_cost, (-width, 1)),
+            (width - 1, diagonal_cost, (width, -1)),
+            (width + 1, diagonal_cost, (width, 1)),
+        ]
+        diagonal_gain = diagonal_cost - 2.0
+    else:
+        diagonal_gain = 0.0
+
+    def heuristic(index):
+        row, col = divmod(index, width)
+        d_row = abs(row - goal_row)
+        d_col = abs(col - goal_col)
+        return d_row + d_col + diagonal_gain * min(d_row, d_col)
+
+    cost = [math.inf] * len(blocked)
+    parent = [-1] * len(blocked)
+    closed = bytearray(len(blocked))
+    cost[start_index] = 0.0
+    # ties on f are broken towards the goal (smaller h), which keeps the open set small
+    start_heuristic = heuristic(start_index)
+    open_heap = [(start_heuristic, start_heuristic, start_index)]
+    while open_heap:
+        _, _, index = heapq.heappop(open_heap)
+        if index == goal_index:
+            break
+        if closed[index]:
+            continue
+        closed[index] = 1
+        index_cost = cost[index]
+
+        for offset, step, sides in moves:
+            neighbour = index + offset
+            if blocked[neighbour] or closed[neighbour]:
+                continue
+            if sides is not None and (
+                blocked[index + sides[0]] or blocked[index + sides[1]]
+            ):
+                continue
+            neighbour_cost = index_cost + step
+            if neighbour_cost < cost[neighbour]:
+                cost[neighbour] = neighbour_cost
+                parent[neighbour] = index
+                neighbour_heuristic = heuristic(neighbour)
+                heapq.heappush(
+                    open_heap,
+                    (
+                        neighbour_cost + neighbour_heuristic,
+                        neighbour_heuristic,
+                        neighbour,
+                    ),
+                )
+    else:
+        return None
+
+    # backtrack from the goal, removing the padding offset
+    path = []
+    index = goal_index
+    while index != -1:
+        row, col = divmod(index, width)
+        path.append((row - 1, col - 1))
+        index = parent[index]
+    path.reverse()
+    return path
 
 
 class AStarPlanner:
@@ -27,6 +124,10 @@ class AStarPlanner:
         x_max=10,
         y_max=10,
         enable_plot=False,
+        connectivity=8,
+        costmap=None,
+        simplify=False,
+        turning_radius=None,
     ):
         self.robot_size = robot_size
         self.obstacles_bounds = obstacles_bounds
@@ -34,8 +135,23 @@ class AStarPlanner:
         self.x_max = x_max
         self.y_max = y_max
         self.enable_plot = enable_plot
-
-    # use A* algorithm to find a Manhattan path
+        self.connectivity = connectivity  # 4 (Manhattan moves) or 8 (octile moves)
+
+        # post-process the grid path into a few waypoints, optionally with rounded corners
+        self.simplify = simplify
+        self.turning_radius = turning_radius
+
+        # the costmap is shared with every planner of the same obstacle set
+        if costmap is None:
+            bounds = (
+                None
+                if x_max is None or y_max is None
+                else [-x_max, -y_max, x_max, y_max]
+            )
+            costmap = get_costmap(obstacles_bounds, robot_size, resolution, bounds)
+        self.costmap = costmap
+
+    # use A* algorithm to find a grid path
     def plan(self, start_pose, goal_pose):
         """Find a path from a specified initial position to a goal position in a 2D grid representation
 
@@ -48,9 +164,8 @@ class AStarPlanner:
             Each waypoint is a list [x, y] representing a position in the world coordinates.
 
         Note:
-            A* for path searching in map: 10 meter * 10 meter
-            resolution is 0.1 meter
-            a 2D grid: 1 for obstacles
+            A* searches the inflated occupancy grid of the costmap, which covers
+            [-x_max, x_max] * [-y_max, y_max] (or the obstacles plus a margin if they are None).
         """
 
         self.path = None
@@ -63,62 +178,12 @@ class AStarPlanner:
             self.start_position, self.goal_position, self.obstacles_bounds
         )
 
-        # grid to world coords
-        def to_grid_coordinates(point, resolution):
-            return [
-                int(round((coordinate + max_val) / resolution))
-                for coordinate, max_val in zip(point, [self.x_max, self.y_max])
-            ]
-
-        # world to grid coords
-        def to_world_coordinates(point, resolution):
-            return [
-                (coordinate * resolution) - max_val
-                for coordinate, max_val in zip(point, [self.x_max, self.y_max])
-            ]
-
-        # Defining the environment size (in meters) and resolution
-        size_x = 2 * self.x_max
-        size_y = 2 * self.y_max
-        n_points_x = int(size_x / self.resolution)
-        n_points_y = int(size_y / self.resolution)
-
-        # Create a 2D grid representing the environment
-        self.static_map = np.zeros((n_points_x, n_points_y))
-
-        # Compute the number of grid cells to inflate around each obstacle
-        inflate_cells = int(round(self.robot_size / 2 / self.resolution))
-
-        # get occupancy map
-        for obstacle_bound in self.obstacles_bounds:
-            for i in range(
-                max(
-                    0,
-                    int((obstacle_bound[0] + self.x_max) / self.resolution)
-                    - inflate_cells,
-                ),
-                min(
-                    n_points_x,
-                    int((obstacle_bound[2] + self.x_max) / self.resolution)
-                    + inflate_cells,
-                ),
-            ):
-                for j in range(
-                    max(
-                        0,
-                        int((obstacle_bound[1] + self.y_max) / self.resolution)
-                        - inflate_cells,
-                    ),
-                    min(
-                        n_points_y,
-                        int((obstacle_bound[3] + self.y_max) / self.resolution)
-                        + inflate_cells,
-                    ),
-                ):
-                    self.static_map[i][j] = 1
+        # inflated occupancy grid: 1 for obstacles
+        self.static_map = self.costmap.inflated
+        n_points_x, n_points_y = self.static_map.shape
 
-        start_grid = to_grid_coordinates(self.start_position, self.resolution)
-        goal_grid = to_grid_coordinates(self.goal_position, self.resolution)
+        start_grid = self.costmap.to_grid(self.start_position)
+        goal_grid = self.costmap.to_grid(self.goal_position)
 
         # Make sure the positions are within the environment and not on the table
         assert (
@@ -134,24 +199,24 @@ class AStarPlanner:
             self.static_map[goal_grid[0], goal_grid[1]] != 1
         ), "Goal base position is in an obstacle!"
 
-        # Convert the numpy grid map to NetworkX graph
-        graph = nwx.grid_2d_graph(n_points_x, n_points_y)
-        for i in range(n_points_x):
-            for j in range(n_points_y):
-                if self.static_map[i, j] == 1:
-                    graph.remove_node((i, j))
-
-        # A* star algorithm
-        self.path = nwx.astar_path(graph, tuple(start_grid), tuple(goal_grid))
-
-        # print("path:{}".format(path))
+        # A* star algorithm on the occupancy grid
+        self.path = astar_grid_search(
+            self.static_map, tuple(start_grid), tuple(goal_grid), self.connectivity
+        )
+        assert self.path is not None, "No path found to the goal base position!"
 
         # Convert grid coordinates back to world coordinates
-        self.path = [
-            to_world_coordinates(point, self.resolution) for point in self.path
-        ]
+        self.path = self.costmap.to_world(self.path).tolist()
         # print('raw path:{}'.format(path))
 
+        if self.simplify:
+            self.path = simplify_path(
+                self.path,
+                self.costmap,
+                turning_radius=self.turning_radius,
+                resolution=self.resolution,
+            )
+
         if self.enable_plot:
             self.visual()
 
@@ -8,7 +8,10 @@
 # @Description:   : PRM navigation algorithm
 """
 
+import hashlib
+import heapq
 import math
+import os
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -21,13 +24,66 @@ from Robotics_API import Pose
 # parameter
 N_SAMPLE = 2000  # number of sample_points
 N_KNN = 10  # number of edge from one sampled point
+N_CANDIDATE = 50  # number of nearest samples tried when connecting a point
 MAX_EDGE_LEN = 30.0  # [m] Maximum edge length
 
 
+class RoadMap:
+    """Road map adjacency in CSR form, plus extra edges for the start and goal of a query"""
+
+    def __init__(self, indptr, indices, n_extra=0):
+        """
+        Initializes the road map.
+
+        Args:
+            indptr (list): CSR row pointers, the edges of node i are indices[indptr[i]:indptr[i + 1]].
+            indices (list): CSR column indices, the end node of every edge.
+            n_extra (int, optional): Number of nodes appended after the CSR nodes. Defaults to 0.
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.n_node = len(indptr) - 1
+        self.n_extra = n_extra
+        self.extra_edges = {}
+
+    def add_edge(self, i, j):
+        """
+        Adds an edge from node i to node j.
+
+        Args:
+            i (int): Index of the start node.
+            j (int): Index of the end node.
+        """
+        self.extra_edges.setdefault(i, []).append(j)
+
+    def __len__(self):
+        return self.n_node + self.n_extra
+
+    def __getitem__(self, i):
+        edge_id = (
+            self.indices[self.indptr[i] : self.indptr[i + 1]] if i < self.n_node else []
+        )
+        if i in self.extra_edges:
+            edge_id = edge_id + self.extra_edges[i]
+        return edge_id
+
+
 class PRMPlanner:
     """Class for PRM planning"""
 
-    def __init__(self, robot_size, obstacles_bounds, enable_plot=True):
+    def __init__(
+        self,
+        robot_size,
+        obstacles_bounds,
+        enable_plot=True,
+        costmap=None,
+        multi_query=False,
+        road_map_path=None,
+        use_astar=False,
+        n_sample=N_SAMPLE,
+        simplify=False,
+        turning_radius=None,
+    ):
         """
         Initializes the PRM planner.
 
@@ -35,6 +91,19 @@ class PRMPlanner:
             robot_size (float): The size of the robot.
             obstacles_bounds (list): List of obstacle boundaries.
             enable_plot (bool, optional): Flag to enable or disable plotting. Defaults to True.
+            costmap (Costmap, optional): If given, collisions are checked against this costmap
+                instead of the obstacle boundaries. Defaults to None.
+            multi_query (bool, optional): If True, the road map is built once and reused by every
+                query, only the start and goal are connected to it. Defaults to False.
+            road_map_path (str, optional): File the multi-query road map is loaded from if it matches
+                this scene, and saved to after it is built. Defaults to None.
+            use_astar (bool, optional): If True, the road map is searched with A* (euclidean heuristic)
+                instead of Dijkstra. Both return a shortest path. Defaults to False.
+            n_sample (int, optional): Number of sampled points. Defaults to N_SAMPLE.
+            simplify (bool, optional): If True, the path is shortcut and its collinear points
+                are removed before it is returned. Defaults to False.
+            turning_radius (float, optional): If given with simplify, the corners of the path are
+                rounded with arcs of this radius. Defaults to None.
         """
         self.robot_size = robot_size
         self.obstacles_bounds = obstacles_bounds
@@ -42,36 +111,21 @@ class PRMPlanner:
         self.idx = index.Index()
         for id, obstacle_bounds in enumerate(self.obstacles_bounds):
             self.idx.insert(id, obstacle_bounds)
+        self.obstacles_array = np.asarray(obstacles_bounds, dtype=float).reshape(-1, 4)
+        self.costmap = costmap
         self.enable_plot = enable_plot
-
-    class Node:
-        """Node class for Dijkstra search"""
-
-        def __init__(self, x, y, cost, parent_index):
-            """
-            Initializes the Node class.
-
-            Args:
-                x (float): X-coordinate of the node.
-                y (float): Y-coordinate of the node.
-                cost (float): Cost to reach this node.
-                parent_index (int): Index of the parent node.
-            """
-            self.x = x
-            self.y = y
-            self.cost = cost
-            self.parent_index = parent_index
-
-        def __str__(self):
-            return (
-                str(self.x)
-                + ","
-                + str(self.y)
-                + ","
-                + str(self.cost)
-                + ","
-                + str(self.parent_index)
-            )
+        self.use_astar = use_astar
+        self.n_sample = n_sample
+        self.simplify = simplify
+        self.turning_radius = turning_radius
+
+        # multi-query road map: node positions (N, 2) and CSR adjacency arrays
+        self.multi_query = multi_query
+        self.road_map_path = road_map_path
+        self.road_map_nodes = None
+        self.road_map_indptr = None
+        self.road_map_indices = None
+        self.road_map_kd_tree = None
 
     def plan(self, start_pose, goal_pose):
         """Finds a path from a specified initial position to a goal position.
@@ -88,15 +142,28 @@ class PRMPlanner:
         self.start_position = start_position
         self.goal_position = goal_position
         self.area = AreaBounds(
-            self.start_position, self.goal_position, self.obstacles_bounds
-        )
-        sample_x, sample_y = self.sample_points(
-            start_pose.get_position()[0],
-            start_pose.get_position()[1],
-            goal_position[0],
-            goal_position[1],
+            self.start_position,
+            self.goal_position,
+            self.obstacles_bounds,
+            self.costmap,
         )
-        road_map = self.generate_road_map(sample_x, sample_y)
+        if self.multi_query:
+            if self.road_map_nodes is None:
+                self.build_road_map()
+            sample_x, sample_y, road_map = self.connect_query(
+                start_position[0],
+                start_position[1],
+                goal_position[0],
+                goal_position[1],
+            )
+        else:
+            sample_x, sample_y = self.sample_points(
+                start_pose.get_position()[0],
+                start_pose.get_position()[1],
+                goal_position[0],
+                goal_position[1],
+            )
+            road_map = self.generate_road_map(sample_x, sample_y)
         self.rx, self.ry = self.dijkstra_planning(
             start_pose.get_position()[0],
             start_pose.get_position()[1],
@@ -107,12 +174,21 @@ class PRMPlanner:
             sample_y,
         )
 
+        self.path = [(x, y) for x, y in zip(self.rx, self.ry)]
+        self.path.reverse()
+        if self.simplify and self.path:
+            self.path = simplify_path(
+                self.path,
+                self.costmap,
+                self.obstacles_array,
+                self.robot_radius,
+                turning_radius=self.turning_radius,
+            )
+
         # Draw final path
         if self.enable_plot:
             self.visual()
 
-        self.path = [(x, y) for x, y in zip(self.rx, self.ry)]
-        self.path.reverse()
         return self.path
 
     def visual(self):
@@ -121,7 +197,7 @@ class PRMPlanner:
             plot_rectangle(x_min, y_min, x_max, y_max)
         plt.plot(self.start_position[0], self.start_position[1], "^r")
         plt.plot(self.goal_position[0], self.goal_position[1], "^c")
-        plt.plot(self.rx, self.ry, "-r")
+        plt.plot([x for (x, _) in self.path], [y for (_, y) in self.path], "-r")
         plt.pause(0.001)
         plt.grid(True)
         plt.axis("equal")
@@ -141,44 +217,40 @@ class PRMPlanner:
         Returns:
             bool: True if there is a collision, False otherwise.
         """
-        x = sx
-        y = sy
-        dx = gx - sx
-        dy = gy - sy
-        yaw = math.atan2(gy - sy, gx - sx)
-        d = math.hypot(dx, dy)
-
-        if d >= MAX_EDGE_LEN:
+        if math.hypot(gx - sx, gy - sy) >= MAX_EDGE_LEN:
             return True
 
-        D = self.robot_size
-        n_step = round(d / D)
+        # sweep the robot footprint along the whole edge
+        return not check_segments_free(
+            [sx, sy],
+            [gx, gy],
+            costmap=self.costmap,
+            obstacles_bounds=self.obstacles_array,
+            robot_radius=self.robot_radius,
+        )[0]
 
-        for i in range(n_step):
-            query_area = [
-                x - self.robot_radius,
-                y - self.robot_radius,
-                x + self.robot_radius,
-                y + self.robot_radius,
-            ]
-            intersected_ids = list(self.idx.intersection(query_area))
-            if len(intersected_ids) > 0:
-                return True  # collision
-            x += D * math.cos(yaw)
-            y += D * math.sin(yaw)
-
-        # goal point check
-        query_area = [
-            gx - self.robot_radius,
-            gy - self.robot_radius,
-            gx + self.robot_radius,
-            gy + self.robot_radius,
-        ]
-        intersected_ids = list(self.idx.intersection(query_area))
-        if len(intersected_ids) > 0:
-            return True  # collision
-
-        return False  # OK
+    def check_edges_collision(self, starts, ends):
+        """
+        Checks many edges for collision at once.
+
+        Args:
+            starts (np.ndarray): Edge start points (N, 2).
+            ends (np.ndarray): Edge end points (N, 2).
+
+        Returns:
+            np.ndarray: Boolean array (N,) which is True for edges in collision.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        collision = np.linalg.norm(ends - starts, axis=1) >= MAX_EDGE_LEN
+        collision |= ~check_segments_free(
+            starts,
+            ends,
+            costmap=self.costmap,
+            obstacles_bounds=self.obstacles_array,
+            robot_radius=self.robot_radius,
+        )
+        return collision
 
     def generate_road_map(self, sample_x, sample_y):
         """
@@ -192,39 +264,228 @@ class PRMPlanner:
             list: The road map as a list of edges.
         """
 
-        road_map = []
         n_sample = len(sample_x)
-        sample_kd_tree = KDTree(np.vstack((sample_x, sample_y)).T)
+        points = np.column_stack([sample_x, sample_y])
+        sample_kd_tree = KDTree(points)
+
+        # only the N_CANDIDATE nearest samples within MAX_EDGE_LEN are tried, missing neighbours have index n_sample
+        k = min(N_CANDIDATE + 1, n_sample)
+        _, indexes = sample_kd_tree.query(
+            points, k=k, distance_upper_bound=MAX_EDGE_LEN
+        )
+        indexes = np.reshape(indexes, (n_sample, k))
+
+        # check all candidate edges in one batch
+        candidate = (indexes != n_sample) & (indexes != np.arange(n_sample)[:, None])
+        rows, cols = np.nonzero(candidate)
+        free = np.zeros_like(candidate)
+        free[rows, cols] = ~self.check_edges_collision(
+            points[rows], points[indexes[rows, cols]]
+        )
+
+        # keep the N_KNN nearest collision-free neighbours of each sample
+        keep = free & (np.cumsum(free, axis=1) <= N_KNN)
+        road_map = [row[mask].tolist() for row, mask in zip(indexes, keep)]
+
+        return road_map
+
+    def get_scene_area(self):
+        """
+        Gets the region the multi-query road map covers, it does not depend on the queries.
+
+        Returns:
+            AreaBounds: The costmap bounds, else the obstacles plus a margin, else the area of the current query.
+        """
+        area = AreaBounds(
+            self.start_position, self.goal_position, self.obstacles_bounds
+        )
+        if self.costmap is not None:
+            area.x_min, area.y_min, area.x_max, area.y_max = self.costmap.bounds
+        elif len(self.obstacles_array) > 0:
+            area.x_min, area.y_min = self.obstacles_array[:, :2].min(axis=0) - 2
+            area.x_max, area.y_max = self.obstacles_array[:, 2:].max(axis=0) + 2
+        return area
+
+    def get_scene_key(self):
+        """
+        Gets a key identifying the scene a road map was built for.
+
+        Returns:
+            str: Hash of the obstacles, the costmap, the sampled region, the robot size and the road map parameters.
+        """
+        area = self.get_scene_area()
+        key = hashlib.sha1(
+            np.asarray(self.obstacles_bounds, dtype=float).tobytes()
+            + np.asarray(
+                [area.x_min, area.y_min, area.x_max, area.y_max], dtype=float
+            ).tobytes()
+            + np.asarray(
+                [self.robot_size, self.n_sample, N_KNN, MAX_EDGE_LEN], dtype=float
+            ).tobytes()
+        )
+        if self.costmap is not None:
+            key.update(np.ascontiguousarray(self.costmap.occupancy).tobytes())
+            key.update(
+                np.asarray(
+                    [
+                        *self.costmap.bounds,
+                        self.costmap.resolution,
+                        self.costmap.robot_radius,
+                    ],
+                    dtype=float,
+                ).tobytes()
+            )
+        return key.hexdigest()
+
+    def build_road_map(self):
+        """
+        Builds the multi-query road map over the scene region, or loads it from road_map_path if it was saved for this scene.
+        """
+        if self.road_map_path is not None and self.load_road_map(self.road_map_path):
+            return
+
+        # the last two samples are the start and goal of the current query, they are not kept
+        sample_x, sample_y = self.sample_points(
+            self.start_position[0],
+            self.start_position[1],
+            self.goal_position[0],
+            self.goal_position[1],
+            self.get_scene_area(),
+        )
+        sample_x, sample_y = sample_x[:-2], sample_y[:-2]
+        road_map = self.generate_road_map(sample_x, sample_y)
 
-        for i, ix, iy in zip(range(n_sample), sample_x, sample_y):
+        self.set_road_map(
+            np.column_stack([sample_x, sample_y]),
+            np.cumsum([0] + [len(edge_id) for edge_id in road_map]),
+            np.array([i for edge_id in road_map for i in edge_id], dtype=int),
+        )
+        if self.road_map_path is not None:
+            self.save_road_map(self.road_map_path)
 
-            dists, indexes = sample_kd_tree.query([ix, iy], k=n_sample)
-            edge_id = []
+    def set_road_map(self, nodes, indptr, indices):
+        """
+        Sets the multi-query road map.
 
-            for ii in range(1, len(indexes)):
-                nx = sample_x[indexes[ii]]
-                ny = sample_y[indexes[ii]]
+        Args:
+            nodes (np.ndarray): Node positions (N, 2).
+            indptr (np.ndarray): CSR row pointers (N + 1), the edges of node i are indices[indptr[i]:indptr[i + 1]].
+            indices (np.ndarray): CSR column indices, the end node of every edge.
+        """
+        self.road_map_nodes = np.asarray(nodes, dtype=float)
+        self.road_map_indptr = np.asarray(indptr, dtype=int)
+        self.road_map_indices = np.asarray(indices, dtype=int)
+        self.road_map_kd_tree = KDTree(self.road_map_nodes)
+
+        # plain lists are much faster than arrays for the per-node lookups of the search
+        self.road_map_indptr_list = self.road_map_indptr.tolist()
+        self.road_map_indices_list = self.road_map_indices.tolist()
+
+    def save_road_map(self, path):
+        """
+        Saves the multi-query road map to a .npz file.
 
-                if not self.is_collision(ix, iy, nx, ny):
-                    edge_id.append(indexes[ii])
+        Args:
+            path (str): The file path.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                nodes=self.road_map_nodes,
+                indptr=self.road_map_indptr,
+                indices=self.road_map_indices,
+                scene_key=np.array(self.get_scene_key()),
+            )
+        print(f"[PRM Planner] \033[34mInfo\033[0m: road map saved to {path}")
 
-                if len(edge_id) >= N_KNN:
-                    break
+    def load_road_map(self, path):
+        """
+        Loads a multi-query road map saved by save_road_map.
 
-            road_map.append(edge_id)
+        Args:
+            path (str): The file path.
 
-        return road_map
+        Returns:
+            bool: True if the road map was loaded, False if the file does not exist or was saved for another scene.
+        """
+        if not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as road_map:
+            if str(road_map["scene_key"]) != self.get_scene_key():
+                print(
+                    f"[PRM Planner] \033[33mwarning\033[0m: road map {path} was built for another scene, rebuilding it"
+                )
+                return False
+            self.set_road_map(
+                road_map["nodes"], road_map["indptr"], road_map["indices"]
+            )
+        return True
+
+    def connect_node(self, x, y, n_candidates=N_CANDIDATE):
+        """
+        Finds the road map nodes a new point can be connected to.
+
+        Args:
+            x (float): X-coordinate of the point.
+            y (float): Y-coordinate of the point.
+            n_candidates (int, optional): Number of nearest nodes tried. Defaults to N_CANDIDATE.
+
+        Returns:
+            list: Up to N_KNN node indices reachable from the point without collision.
+        """
+        n_node = len(self.road_map_nodes)
+        _, indexes = self.road_map_kd_tree.query(
+            [x, y], k=min(n_candidates, n_node), distance_upper_bound=MAX_EDGE_LEN
+        )
+        indexes = np.atleast_1d(indexes)
+        indexes = indexes[indexes != n_node]
+        free = ~self.check_edges_collision(
+            np.tile([x, y], (len(indexes), 1)), self.road_map_nodes[indexes]
+        )
+        edge_id = indexes[free][:N_KNN].tolist()
+        return edge_id
+
+    def connect_query(self, sx, sy, gx, gy):
+        """
+        Connects a start and a goal to the multi-query road map.
+
+        Args:
+            sx (float): Start x-coordinate.
+            sy (float): Start y-coordinate.
+            gx (float): Goal x-coordinate.
+            gy (float): Goal y-coordinate.
+
+        Returns:
+            tuple: The sample x and y positions and the RoadMap, with the start and the goal as the last two nodes.
+        """
+        n_node = len(self.road_map_nodes)
+        sample_x = self.road_map_nodes[:, 0].tolist() + [sx, gx]
+        sample_y = self.road_map_nodes[:, 1].tolist() + [sy, gy]
+        road_map = RoadMap(
+            self.road_map_indptr_list, self.road_map_indices_list, n_extra=2
+        )
+
+        # edges leave the start and enter the goal
+        for i in self.connect_node(sx, sy):
+            road_map.add_edge(n_node, i)
+        if not self.is_collision(sx, sy, gx, gy):
+            road_map.add_edge(n_node, n_node + 1)
+        for i in self.connect_node(gx, gy):
+            road_map.add_edge(i, n_node + 1)
+
+        return sample_x, sample_y, road_map
 
     def dijkstra_planning(self, sx, sy, gx, gy, road_map, sample_x, sample_y):
         """
-        Performs Dijkstra's algorithm to find the shortest path.
+        Performs Dijkstra's algorithm (or A* if use_astar) with a binary heap to find the shortest path.
 
         Args:
             sx (float): Start x-coordinate.
             sy (float): Start y-coordinate.
             gx (float): Goal x-coordinate.
             gy (float): Goal y-coordinate.
-            road_map (list): The road map.
+            road_map (list): The road map, the start and goal are its last two nodes.
             sample_x (list): X positions of sampled points.
             sample_y (list): Y positions of sampled points.
 
@@ -232,67 +493,62 @@ class PRMPlanner:
             tuple: Two lists of path coordinates ([x1, x2, ...], [y1, y2, ...]).
         """
 
-        start_node = self.Node(sx, sy, 0.0, -1)
-        goal_node = self.Node(gx, gy, 0.0, -1)
+        n_node = len(road_map)
+        start_id, goal_id = n_node - 2, n_node - 1
 
-        open_set, closed_set = dict(), dict()
-        open_set[len(road_map) - 2] = start_node
+        def heuristic(i):
+            if self.use_astar:
+                return math.hypot(sample_x[i] - gx, sample_y[i] - gy)
+            return 0.0
 
-        path_found = True
+        # array-backed search state, the heap holds (priority, node index)
+        cost = [math.inf] * n_node
+        parent_index = [-1] * n_node
+        closed = bytearray(n_node)
+        cost[start_id] = 0.0
+        open_heap = [(heuristic(start_id), start_id)]
 
-        while True:
-            if not open_set:
-                print("[PRM Planner] \033[31merror\033[0m: Cannot find path")
-                path_found = False
-                break
-
-            c_id = min(open_set, key=lambda o: open_set[o].cost)
-            current = open_set[c_id]
+        path_found = False
+        while open_heap:
+            _, c_id = heapq.heappop(open_heap)
 
-            if c_id == (len(road_map) - 1):
+            if c_id == goal_id:
                 print("[PRM Planner] \033[34mInfo\033[0m: goal is found!")
-                goal_node.parent_index = current.parent_index
-                goal_node.cost = current.cost
+                path_found = True
                 break
 
-            # Remove the item from the open set
-            del open_set[c_id]
-            # Add it to the closed set
-            closed_set[c_id] = current
+            if closed[c_id]:
+                continue
+            closed[c_id] = 1
 
             # expand search grid based on motion model
-            for i in range(len(road_map[c_id])):
-                n_id = road_map[c_id][i]
-                dx = sample_x[n_id] - current.x
-                dy = sample_y[n_id] - current.y
-                d = math.hypot(dx, dy)
-                node = self.Node(sample_x[n_id], sample_y[n_id], current.cost + d, c_id)
-
-                if n_id in closed_set:
+            cx, cy = sample_x[c_id], sample_y[c_id]
+            for n_id in road_map[c_id]:
+                if closed[n_id]:
                     continue
-                # Otherwise if it is already in the open set
-                if n_id in open_set:
-                    if open_set[n_id].cost > node.cost:
-                        open_set[n_id].cost = node.cost
-                        open_set[n_id].parent_index = c_id
-                else:
-                    open_set[n_id] = node
+                n_cost = cost[c_id] + math.hypot(
+                    sample_x[n_id] - cx, sample_y[n_id] - cy
+                )
+                if n_cost < cost[n_id]:
+                    cost[n_id] = n_cost
+                    parent_index[n_id] = c_id
+                    heapq.heappush(open_heap, (n_cost + heuristic(n_id), n_id))
 
         if path_found is False:
+            print("[PRM Planner] \033[31merror\033[0m: Cannot find path")
             return [], []
 
         # generate final course
-        rx, ry = [goal_node.x], [goal_node.y]
-        parent_index = goal_node.parent_index
-        while parent_index != -1:
-            n = closed_set[parent_index]
-            rx.append(n.x)
-            ry.append(n.y)
-            parent_index = n.parent_index
+        rx, ry = [gx], [gy]
+        p_id = parent_index[goal_id]
+        while p_id != -1:
+            rx.append(sample_x[p_id])
+            ry.append(sample_y[p_id])
+            p_id = parent_index[p_id]
 
         return rx, ry
 
-    def sample_points(self, sx, sy, gx, gy):
+    def sample_points(self, sx, sy, gx, gy, area=None):
         """
         Samples random points in the environment.
 
@@ -301,23 +557,32 @@ class PRMPlanner:
             sy (float): Start y-coordinate.
             gx (float): Goal x-coordinate.
             gy (float): Goal y-coordinate.
+            area (AreaBounds, optional): The sampled region. Defaults to the area of the current query.
 
         Returns:
             tuple: Two lists of sampled x and y coordinates.
         """
-        max_x = self.area.x_max
-        max_y = self.area.y_max
-        min_x = self.area.x_min
-        min_y = self.area.y_min
+        if area is None:
+            area = self.area
+        max_x = area.x_max
+        max_y = area.y_max
+        min_x = area.x_min
+        min_y = area.y_min
 
         sample_x, sample_y = [], []
 
         rng = np.random.default_rng()
 
-        while len(sample_x) <= N_SAMPLE:
+        while len(sample_x) <= self.n_sample:
             tx = (rng.random() * (max_x - min_x)) + min_x
             ty = (rng.random() * (max_y - min_y)) + min_y
 
+            if self.costmap is not None:
+                if self.costmap.is_free([tx, ty]):
+                    sample_x.append(tx)
+                    sample_y.append(ty)
+                continue
+
             query_area = [
                 tx - self.robot_radius,
                 ty - self.robot_radius,
@@ -12,32 +12,124 @@ import math
 import random
 
 import matplotlib.pyplot as plt
-from rtree import index
+import numpy as np
+from scipy.spatial import KDTree
 
 # from ..utils import AreaBounds, plot_rectangle
 from Motion_Planning.Navigation.utils import *  # test in this script
 from Robotics_API import Pose
 
 
-class RRTPlanner:
-    """Class for RRT planning"""
+class NodeTree:
+    """Array-backed tree of 2D nodes with incremental nearest neighbour search"""
+
+    def __init__(self, root, capacity=1024, rebuild_size=64):
+        """
+        Initializes the tree with its root node.
+
+        Args:
+            root (list): Position [x, y] of the root node.
+            capacity (int, optional): Initial number of preallocated nodes. Defaults to 1024.
+            rebuild_size (int, optional): Minimum number of nodes added before the KD-tree is rebuilt. Defaults to 64.
+        """
+        self.positions = np.empty((capacity, 2))
+        self.parents = np.full(capacity, -1, dtype=int)
+        self.costs = np.zeros(capacity)
+        self.positions[0] = root
+        self.size = 1
+
+        # nodes [0, n_indexed) are in the KD-tree, newer nodes are searched by brute force
+        self.rebuild_size = rebuild_size
+        self.kd_tree = None
+        self.n_indexed = 0
+
+    def add(self, position, parent, cost=0.0):
+        """
+        Adds a node to the tree.
+
+        Args:
+            position (list): Position [x, y] of the node.
+            parent (int): Index of the parent node.
+            cost (float, optional): Cost to reach the node from the root. Defaults to 0.0.
 
-    class Node:
-        """RRT Node"""
+        Returns:
+            int: The index of the new node.
+        """
+        if self.size == len(self.positions):
+            self.positions = np.resize(self.positions, (2 * self.size, 2))
+            self.parents = np.resize(self.parents, 2 * self.size)
+            self.costs = np.resize(self.costs, 2 * self.size)
+        index = self.size
+        self.positions[index] = position
+        self.parents[index] = parent
+        self.costs[index] = cost
+        self.size += 1
+
+        # rebuild geometrically, so the brute force tail stays small and rebuilds stay rare
+        if self.size - self.n_indexed >= max(self.rebuild_size, self.n_indexed // 4):
+            self.kd_tree = KDTree(self.positions[: self.size])
+            self.n_indexed = self.size
+        return index
+
+    def nearest(self, point):
+        """
+        Finds the node nearest to a point.
+
+        Args:
+            point (list): Position [x, y].
 
-        def __init__(self, x, y):
-            """
-            Initializes the RRT node.
+        Returns:
+            int: The index of the nearest node.
+        """
+        best_dist, best_index = math.inf, -1
+        if self.kd_tree is not None:
+            best_dist, best_index = self.kd_tree.query(point)
+        if self.n_indexed < self.size:
+            dists = np.hypot(*(self.positions[self.n_indexed : self.size] - point).T)
+            i = int(np.argmin(dists))
+            if dists[i] < best_dist:
+                best_dist, best_index = dists[i], self.n_indexed + i
+        return int(best_index)
+
+    def near(self, point, radius):
+        """
+        Finds the nodes within a radius of a point.
 
-            Args:
-                x (float): X-coordinate of the node.
-                y (float): Y-coordinate of the node.
-            """
-            self.x = x
-            self.y = y
-            self.path_x = []
-            self.path_y = []
-            self.parent = None
+        Args:
+            point (list): Position [x, y].
+            radius (float): The search radius.
+
+        Returns:
+            list: The indices of the nodes within the radius.
+        """
+        indexes = (
+            self.kd_tree.query_ball_point(point, radius)
+            if self.kd_tree is not None
+            else []
+        )
+        dists = np.hypot(*(self.positions[self.n_indexed : self.size] - point).T)
+        return indexes + (self.n_indexed + np.flatnonzero(dists <= radius)).tolist()
+
+    def get_path(self, index):
+        """
+        Gets the path from the root to a node.
+
+        Args:
+            index (int): The index of the node.
+
+        Returns:
+            list: The path as a list of points [x, y], from the root to the node.
+        """
+        path = []
+        while index != -1:
+            path.append(self.positions[index].tolist())
+            index = self.parents[index]
+        path.reverse()
+        return path
+
+
+class RRTPlanner:
+    """Class for RRT planning"""
 
     def __init__(
         self,
@@ -48,6 +140,9 @@ class RRTPlanner:
         goal_sample_rate=5,
         max_iter=500,
         enable_plot=True,
+        costmap=None,
+        simplify=False,
+        turning_radius=None,
     ):
         """
         Initializes the RRT planner.
@@ -60,18 +155,23 @@ class RRTPlanner:
             goal_sample_rate (int, optional): The goal sampling rate. Defaults to 5.
             max_iter (int, optional): The maximum number of iterations. Defaults to 500.
             enable_plot (bool, optional): Flag to enable or disable plotting. Defaults to True.
+            costmap (Costmap, optional): If given, collisions are checked against this costmap
+                instead of the obstacle boundaries. Defaults to None.
+            simplify (bool, optional): If True, the path is shortcut and its collinear points
+                are removed before it is returned. Defaults to False.
+            turning_radius (float, optional): If given with simplify, the corners of the path are
+                rounded with arcs of this radius. Defaults to None.
         """
         self.obstacles_bounds = obstacles_bounds
-        self.idx = index.Index()
-        for id, obstacle_bounds in enumerate(self.obstacles_bounds):
-            self.idx.insert(id, obstacle_bounds)
+        self.obstacles_array = np.asarray(obstacles_bounds, dtype=float).reshape(-1, 4)
         self.robot_radius = robot_size / 2
-        self.play_area = None
         self.expand_dis = expand_dis
         self.path_resolution = path_resolution
         self.goal_sample_rate = goal_sample_rate
         self.max_iter = max_iter
-        self.node_list = []
+        self.costmap = costmap
+        self.simplify = simplify
+        self.turning_radius = turning_radius
         self.enable_plot = enable_plot
 
     def plan(self, start_pose, goal_pose):
@@ -83,52 +183,65 @@ class RRTPlanner:
             goal_pose (Pose): The goal pose of the robot.
 
         Returns:
-            list: The planned path as a list of points.
+            list: The planned path as a list of points, empty if no path is found.
         """
 
         # only care about x, y
-        start_position = start_pose.get_position()[0:2]
-        goal_position = goal_pose.get_position()[0:2]
+        self.start = np.array(start_pose.get_position()[0:2], dtype=float)
+        self.goal = np.array(goal_pose.get_position()[0:2], dtype=float)
 
-        self.area = AreaBounds(start_position, goal_position, self.obstacles_bounds)
+        self.area = AreaBounds(
+            self.start, self.goal, self.obstacles_bounds, self.costmap
+        )
 
-        self.start = self.Node(start_position[0], start_position[1])
-        self.goal = self.Node(goal_position[0], goal_position[1])
-
-        self.node_list = [self.start]
-        self.path = None
-        for i in range(self.max_iter):
-            rnd_node = self.get_random_node()
-            nearest_ind = self.get_nearest_node_index(self.node_list, rnd_node)
-            nearest_node = self.node_list[nearest_ind]
-
-            new_node = self.steer(nearest_node, rnd_node, self.expand_dis)
-
-            if self.check_if_outside_play_area(
-                new_node, self.play_area
-            ) and self.check_collision(new_node):
-                self.node_list.append(new_node)
-
-            if (
-                self.calc_dist_to_goal(self.node_list[-1].x, self.node_list[-1].y)
-                <= self.expand_dis
-            ):
-                final_node = self.steer(self.node_list[-1], self.goal, self.expand_dis)
-                if self.check_collision(final_node):
-                    self.path = self.generate_final_course(len(self.node_list) - 1)
-                    break
+        self.path = self.search()
 
         if self.path is None:
             print("[RRT Planner] \033[31merror\033[0m: Cannot find path")
+            self.path = []
         else:
             print("[RRT Planner] \033[34mInfo\033[0m: found path!")
 
+            if self.simplify:
+                self.path = simplify_path(
+                    self.path,
+                    self.costmap,
+                    self.obstacles_array,
+                    self.robot_radius,
+                    turning_radius=self.turning_radius,
+                    resolution=self.path_resolution,
+                )
+
             # Draw final path
             if self.enable_plot:
                 self.visual()
 
-        self.path.reverse()
-        return self.path  # cannot find path
+        return self.path
+
+    def search(self):
+        """
+        Grows a tree from the start until it reaches the goal.
+
+        Returns:
+            list: The path from start to goal as a list of points, or None if no path is found.
+        """
+        self.tree = NodeTree(self.start)
+        for i in range(self.max_iter):
+            rnd = self.get_random_point()
+            nearest_ind = self.tree.nearest(rnd)
+            nearest = self.tree.positions[nearest_ind]
+
+            new = self.steer(nearest, rnd, self.expand_dis)
+            if not self.check_motion(nearest, new):
+                continue
+            new_ind = self.tree.add(new, nearest_ind)
+
+            if self.calc_dist_to_goal(new) <= self.expand_dis:
+                final = self.steer(new, self.goal, self.expand_dis)
+                if np.array_equal(final, self.goal) and self.check_motion(new, final):
+                    return self.tree.get_path(new_ind) + [self.goal.tolist()]
+
+        return None
 
     def visual(self):
         """Visualization of routes generated by RTT navigation algorithm."""
@@ -139,8 +252,8 @@ class RRTPlanner:
         for x_min, y_min, x_max, y_max in self.obstacles_bounds:
             plot_rectangle(x_min, y_min, x_max, y_max)
 
-        plt.plot(self.start.x, self.start.y, "og")
-        plt.plot(self.goal.x, self.goal.y, "xr")
+        plt.plot(self.start[0], self.start[1], "og")
+        plt.plot(self.goal[0], self.goal[1], "xr")
 
         plt.plot([x for (x, _) in self.path], [y for (_, y) in self.path], "-r")
 
@@ -151,184 +264,90 @@ class RRTPlanner:
         plt.pause(0.01)
         plt.show()
 
-    def steer(self, from_node, to_node, extend_length=float("inf")):
+    def steer(self, from_point, to_point, extend_length=float("inf")):
         """
-        Steers from one node towards another node.
+        Steers from one point towards another point, in steps of path_resolution.
 
         Args:
-            from_node (Node): The starting node.
-            to_node (Node): The target node.
-            extend_length (float, optional): The distance to extend towards the target node. Defaults to infinity.
+            from_point (np.ndarray): The starting point [x, y].
+            to_point (np.ndarray): The target point [x, y].
+            extend_length (float, optional): The distance to extend towards the target point. Defaults to infinity.
 
         Returns:
-            Node: The new node after steering.
+            np.ndarray: The new point [x, y], snapped to the target if it is within path_resolution.
         """
-        new_node = self.Node(from_node.x, from_node.y)
-        d, theta = self.calc_distance_and_angle(new_node, to_node)
-
-        new_node.path_x = [new_node.x]
-        new_node.path_y = [new_node.y]
-
-        if extend_length > d:
-            extend_length = d
-
-        n_expand = math.floor(extend_length / self.path_resolution)
-
-        for _ in range(n_expand):
-            new_node.x += self.path_resolution * math.cos(theta)
-            new_node.y += self.path_resolution * math.sin(theta)
-            new_node.path_x.append(new_node.x)
-            new_node.path_y.append(new_node.y)
-
-        d, _ = self.calc_distance_and_angle(new_node, to_node)
+        delta = to_point - from_point
+        d = math.hypot(*delta)
         if d <= self.path_resolution:
-            new_node.path_x.append(to_node.x)
-            new_node.path_y.append(to_node.y)
-            new_node.x = to_node.x
-            new_node.y = to_node.y
-
-        new_node.parent = from_node
-
-        return new_node
-
-    def generate_final_course(self, goal_ind):
-        """
-        Generates the final course from start to goal.
-
-        Args:
-            goal_ind (int): The index of the goal node.
-
-        Returns:
-            list: The final path as a list of points.
-        """
-        path = [[self.goal.x, self.goal.y]]
-        node = self.node_list[goal_ind]
-        while node.parent is not None:
-            path.append([node.x, node.y])
-            node = node.parent
-        path.append([node.x, node.y])
+            return to_point.copy()
 
-        return path
+        n_expand = math.floor(min(extend_length, d) / self.path_resolution)
+        new_point = from_point + delta * (n_expand * self.path_resolution / d)
+        if math.hypot(*(to_point - new_point)) <= self.path_resolution:
+            return to_point.copy()
+        return new_point
 
-    def calc_dist_to_goal(self, x, y):
+    def calc_dist_to_goal(self, point):
         """
         Calculates the distance to the goal.
 
         Args:
-            x (float): The x-coordinate.
-            y (float): The y-coordinate.
+            point (np.ndarray): The point [x, y].
 
         Returns:
             float: The distance to the goal.
         """
-        dx = x - self.goal.x
-        dy = y - self.goal.y
-        return math.hypot(dx, dy)
+        return math.hypot(*(point - self.goal))
 
-    def get_random_node(self):
+    def get_random_point(self):
         """
-        Gets a random node.
+        Gets a random point.
 
         Returns:
-            Node: The random node.
+            np.ndarray: The random point [x, y].
         """
         if random.randint(0, 100) > self.goal_sample_rate:
-            rnd = self.Node(
-                random.uniform(self.area.x_min, self.area.x_max),
-                random.uniform(self.area.y_min, self.area.y_max),
+            return np.array(
+                [
+                    random.uniform(self.area.x_min, self.area.x_max),
+                    random.uniform(self.area.y_min, self.area.y_max),
+                ]
             )
-        else:  # goal point sampling
-            rnd = self.Node(self.goal.x, self.goal.y)
-        return rnd
+        return self.goal.copy()  # goal point sampling
 
-    @staticmethod
-    def get_nearest_node_index(node_list, rnd_node):
+    def check_motion(self, from_point, to_point):
         """
-        Gets the index of the nearest node.
+        Checks if the straight motion between two points is collision-free.
 
         Args:
-            node_list (list): The list of nodes.
-            rnd_node (Node): The random node.
+            from_point (np.ndarray): The starting point [x, y].
+            to_point (np.ndarray): The end point [x, y].
 
         Returns:
-            int: The index of the nearest node.
-        """
-        dlist = [
-            (node.x - rnd_node.x) ** 2 + (node.y - rnd_node.y) ** 2
-            for node in node_list
-        ]
-        minind = dlist.index(min(dlist))
-
-        return minind
-
-    @staticmethod
-    def check_if_outside_play_area(node, play_area):
+            bool: True if the motion is not in collision, False otherwise.
         """
-        Checks if a node is outside the play area.
+        return bool(self.check_motions(from_point, to_point)[0])
 
-        Args:
-            node (Node): The node to check.
-            play_area (AreaBounds): The play area.
-
-        Returns:
-            bool: True if the node is inside the play area, False otherwise.
-        """
-        if play_area is None:
-            return True  # no play_area was defined, every pos should be ok
-
-        if (
-            node.x < play_area.xmin
-            or node.x > play_area.xmax
-            or node.y < play_area.ymin
-            or node.y > play_area.ymax
-        ):
-            return False  # outside - bad
-        else:
-            return True  # inside - ok
-
-    def check_collision(self, node):
-        """
-        Checks if a node is in collision.
-
-        Args:
-            node (Node): The node to check.
-
-        Returns:
-            bool: True if the node is not in collision, False otherwise.
-        """
-        if node is None:
-            return False
-
-        for x, y in zip(node.path_x, node.path_y):
-            query_area = [
-                x - self.robot_radius,
-                y - self.robot_radius,
-                x + self.robot_radius,
-                y + self.robot_radius,
-            ]
-            intersected_ids = list(self.idx.intersection(query_area))
-            if len(intersected_ids) != 0:
-                return False
-
-        return True  # safe
-
-    @staticmethod
-    def calc_distance_and_angle(from_node, to_node):
+    def check_motions(self, from_points, to_points):
         """
-        Calculates the distance and angle between two nodes.
+        Checks many straight motions for collision at once.
 
         Args:
-            from_node (Node): The starting node.
-            to_node (Node): The target node.
+            from_points (np.ndarray): The starting points (N, 2).
+            to_points (np.ndarray): The end points (N, 2).
 
         Returns:
-            tuple: The distance and angle between the nodes.
+            np.ndarray: Boolean array (N,) which is True for motions that are not in collision.
         """
-        dx = to_node.x - from_node.x
-        dy = to_node.y - from_node.y
-        d = math.hypot(dx, dy)
-        theta = math.atan2(dy, dx)
-        return d, theta
+        from_points = np.asarray(from_points, dtype=float).reshape(-1, 2)
+        to_points = np.asarray(to_points, dtype=float).reshape(-1, 2)
+        return check_segments_free(
+            from_points,
+            to_points,
+            costmap=self.costmap,
+            obstacles_bounds=self.obstacles_array,
+            robot_radius=self.robot_radius,
+        )
 
 
 def main():
@@ -0,0 +1,80 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : rrt_connect.py
+# @Description:   : RRT-Connect navigation algorithm
+"""
+
+from .rrt import NodeTree, RRTPlanner
+
+
+class RRTConnectPlanner(RRTPlanner):
+    """Class for bidirectional RRT-Connect planning"""
+
+    def search(self):
+        """
+        Grows one tree from the start and one from the goal, and greedily connects them.
+
+        Returns:
+            list: The path from start to goal as a list of points, or None if no path is found.
+        """
+        start_tree = NodeTree(self.start)
+        goal_tree = NodeTree(self.goal)
+        self.tree = start_tree
+
+        tree_a, tree_b = start_tree, goal_tree
+        for i in range(self.max_iter):
+            new_ind = self.extend(tree_a, self.get_random_point())
+            if new_ind is not None:
+                connect_ind = self.connect(tree_b, tree_a.positions[new_ind])
+                if connect_ind is not None:
+                    path_a = tree_a.get_path(new_ind)
+                    path_b = tree_b.get_path(connect_ind)
+
+                    # both paths end at the connection point
+                    if tree_a is start_tree:
+                        return path_a + path_b[-2::-1]
+                    return path_b + path_a[-2::-1]
+
+            tree_a, tree_b = tree_b, tree_a
+
+        return None
+
+    def extend(self, tree, target):
+        """
+        Extends a tree by one step towards a target point.
+
+        Args:
+            tree (NodeTree): The tree to extend.
+            target (np.ndarray): The target point [x, y].
+
+        Returns:
+            int: The index of the new node, or None if the step is in collision.
+        """
+        nearest_ind = tree.nearest(target)
+        nearest = tree.positions[nearest_ind]
+        new = self.steer(nearest, target, self.expand_dis)
+        if not self.check_motion(nearest, new):
+            return None
+        return tree.add(new, nearest_ind)
+
+    def connect(self, tree, target):
+        """
+        Extends a tree towards a target point until it reaches it or hits an obstacle.
+
+        Args:
+            tree (NodeTree): The tree to extend.
+            target (np.ndarray): The target point [x, y].
+
+        Returns:
+            int: The index of the node at the target, or None if the target is not reached.
+        """
+        index = tree.nearest(target)
+        while True:
+            position = tree.positions[index]
+            new = self.steer(position, target, self.expand_dis)
+            if not self.check_motion(position, new):
+                return None
+            index = tree.add(new, index)
+            if (new == target).all():
+                return index
@@ -0,0 +1,169 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : rrt_star.py
+# @Description:   : Anytime RRT* navigation algorithm
+"""
+
+import math
+import time
+
+import numpy as np
+
+from .rrt import NodeTree, RRTPlanner
+
+
+class RRTStarPlanner(RRTPlanner):
+    """Class for anytime RRT* planning"""
+
+    def __init__(
+        self,
+        robot_size,
+        obstacles_bounds,
+        expand_dis=0.2,
+        path_resolution=0.05,
+        goal_sample_rate=5,
+        max_iter=500,
+        enable_plot=True,
+        costmap=None,
+        simplify=False,
+        turning_radius=None,
+        connect_circle_dist=50.0,
+        time_limit=None,
+    ):
+        """
+        Initializes the RRT* planner.
+
+        Args:
+            robot_size (float): The size of the robot.
+            obstacles_bounds (list): List of obstacle boundaries.
+            expand_dis (float, optional): The distance to expand the tree. Defaults to 0.2.
+            path_resolution (float, optional): The resolution of the path. Defaults to 0.05.
+            goal_sample_rate (int, optional): The goal sampling rate. Defaults to 5.
+            max_iter (int, optional): The maximum number of iterations. Defaults to 500.
+            enable_plot (bool, optional): Flag to enable or disable plotting. Defaults to True.
+            costmap (Costmap, optional): If given, collisions are checked against this costmap
+                instead of the obstacle boundaries. Defaults to None.
+            simplify (bool, optional): If True, the path is shortcut and its collinear points
+                are removed before it is returned. Defaults to False.
+            turning_radius (float, optional): If given with simplify, the corners of the path are
+                rounded with arcs of this radius. Defaults to None.
+            connect_circle_dist (float, optional): Scale of the shrinking rewiring radius. Defaults to 50.0.
+            time_limit (float, optional): If given, the search stops after this many seconds once a path
+                is found, and returns the best path so far. Defaults to None.
+        """
+        super().__init__(
+            robot_size,
+            obstacles_bounds,
+            expand_dis,
+            path_resolution,
+            goal_sample_rate,
+            max_iter,
+            enable_plot,
+            costmap,
+            simplify,
+            turning_radius,
+        )
+        self.connect_circle_dist = connect_circle_dist
+        self.time_limit = time_limit
+
+    def search(self):
+        """
+        Grows a tree from the start, choosing the cheapest parent for each node and rewiring its
+        neighbours, and keeps improving the path to the goal until max_iter or time_limit.
+
+        Returns:
+            list: The shortest path found from start to goal as a list of points, or None if no path is found.
+        """
+        tree = NodeTree(self.start)
+        self.tree = tree
+        children = [[]]
+        goal_inds = []
+
+        start_time = time.time()
+        for i in range(self.max_iter):
+            if (
+                self.time_limit is not None
+                and goal_inds
+                and time.time() - start_time > self.time_limit
+            ):
+                break
+
+            rnd = self.get_random_point()
+            nearest_ind = tree.nearest(rnd)
+            new = self.steer(tree.positions[nearest_ind], rnd, self.expand_dis)
+
+            # choose the cheapest collision-free parent among the near nodes
+            n_node = tree.size + 1
+            radius = min(
+                self.connect_circle_dist * math.sqrt(math.log(n_node) / n_node),
+                self.expand_dis,
+            )
+            near_inds = np.array(
+                sorted(set(tree.near(new, radius)) | {nearest_ind}), dtype=int
+            )
+            near_dists = np.hypot(*(tree.positions[near_inds] - new).T)
+            near_costs = tree.costs[near_inds] + near_dists
+            order = np.argsort(near_costs)
+            free = self.check_motions(
+                tree.positions[near_inds[order]], np.tile(new, (len(order), 1))
+            )
+            if not free.any():
+                continue
+            parent_ind = near_inds[order[np.argmax(free)]]
+            new_cost = near_costs[order[np.argmax(free)]]
+            new_ind = tree.add(new, parent_ind, new_cost)
+            children.append([])
+            children[parent_ind].append(new_ind)
+
+            # rewire the near nodes through the new node if that is cheaper
+            rewire = (new_cost + near_dists < tree.costs[near_inds]) & (
+                near_inds != parent_ind
+            )
+            if rewire.any():
+                rewire_inds = near_inds[rewire]
+                rewire_free = self.check_motions(
+                    np.tile(new, (len(rewire_inds), 1)), tree.positions[rewire_inds]
+                )
+                for j, dist in zip(
+                    rewire_inds[rewire_free], near_dists[rewire][rewire_free]
+                ):
+                    children[tree.parents[j]].remove(j)
+                    tree.parents[j] = new_ind
+                    children[new_ind].append(j)
+                    self.propagate_cost(
+                        tree, children, j, new_cost + dist - tree.costs[j]
+                    )
+
+            if self.calc_dist_to_goal(new) <= self.expand_dis:
+                final = self.steer(new, self.goal, self.expand_dis)
+                if np.array_equal(final, self.goal) and self.check_motion(new, final):
+                    goal_inds.append(new_ind)
+
+        if not goal_inds:
+            return None
+
+        # costs may have dropped through rewiring, so pick the best goal connection at the end
+        goal_inds = np.array(goal_inds)
+        goal_costs = tree.costs[goal_inds] + np.hypot(
+            *(tree.positions[goal_inds] - self.goal).T
+        )
+        best_ind = goal_inds[np.argmin(goal_costs)]
+        return tree.get_path(best_ind) + [self.goal.tolist()]
+
+    @staticmethod
+    def propagate_cost(tree, children, index, delta):
+        """
+        Adds a cost change to a node and all of its descendants.
+
+        Args:
+            tree (NodeTree): The tree.
+            children (list): The children indices of every node.
+            index (int): The index of the node whose cost changed.
+            delta (float): The cost change.
+        """
+        stack = [index]
+        while stack:
+            i = stack.pop()
+            tree.costs[i] += delta
+            stack.extend(children[i])
@@ -1,5 +1,18 @@
 from .A_star.A_star import AStarPlanner
+from .costmap import Costmap, get_costmap
 from .PRM.probabilistic_road_map import PRMPlanner
 from .RRT.rrt import RRTPlanner
+from .RRT.rrt_connect import RRTConnectPlanner
+from .RRT.rrt_star import RRTStarPlanner
+from .utils import simplify_path
 
-__all__ = ["AStarPlanner", "PRMPlanner", "RRTPlanner"]
+__all__ = [
+    "AStarPlanner",
+    "PRMPlanner",
+    "RRTPlanner",
+    "RRTConnectPlanner",
+    "RRTStarPlanner",
+    "Costmap",
+    "get_costmap",
+    "simplify_path",
+]
@@ -0,0 +1,182 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : costmap.py
+# @Description:   : Occupancy costmap shared by the navigation planners
+"""
+
+import hashlib
+
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+# costmaps built so far, keyed by a hash of the obstacle set and the map parameters
+costmap_cache = {}
+COSTMAP_CACHE_SIZE = 8
+
+
+class Costmap:
+    """2D occupancy grid of the obstacles, inflated by the robot footprint with a distance transform"""
+
+    def __init__(
+        self,
+        obstacles_bounds,
+        robot_size,
+        resolution=0.05,
+        bounds=None,
+        margin=2.0,
+        occupancy=None,
+    ):
+        """
+        Builds the costmap.
+
+        Args:
+            obstacles_bounds (list): List of obstacle boundaries [x_min, y_min, x_max, y_max].
+            robot_size (float): The size of the robot.
+            resolution (float, optional): The size of a grid cell in meters. Defaults to 0.05.
+            bounds (list, optional): The map region [x_min, y_min, x_max, y_max]. Defaults to the
+                bounding box of the obstacles, extended by margin.
+            margin (float, optional): Free space kept around the obstacles when bounds is None. Defaults to 2.0.
+            occupancy (np.ndarray, optional): A grid of the map region with nonzero obstacle cells, e.g. from
+                a scan map, used instead of rasterizing the obstacles. Its first cell is at the lower corner
+                of bounds. Defaults to None.
+        """
+        self.obstacles_bounds = np.asarray(obstacles_bounds, dtype=float).reshape(-1, 4)
+        self.robot_size = robot_size
+        self.robot_radius = robot_size / 2
+        self.resolution = resolution
+
+        if bounds is None:
+            if len(self.obstacles_bounds) == 0:
+                bounds = [-margin, -margin, margin, margin]
+            else:
+                bounds = [
+                    *(self.obstacles_bounds[:, :2].min(axis=0) - margin),
+                    *(self.obstacles_bounds[:, 2:].max(axis=0) + margin),
+                ]
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.origin = self.bounds[:2]
+        if occupancy is not None:
+            self.occupancy = (np.asarray(occupancy) != 0).astype(np.uint8)
+            self.shape = self.occupancy.shape
+        else:
+            self.shape = tuple(
+                int(np.ceil(size / resolution)) + 1
+                for size in self.bounds[2:] - self.bounds[:2]
+            )
+            self.occupancy = np.zeros(self.shape, dtype=np.uint8)
+
+        # rasterize the obstacles, one slice assignment per obstacle
+        lower = np.floor((self.obstacles_bounds[:, :2] - self.origin) / resolution)
+        upper = np.ceil((self.obstacles_bounds[:, 2:] - self.origin) / resolution)
+        cells = np.hstack([lower, upper]).astype(int)
+        cells = np.clip(cells, 0, [*self.shape, *self.shape])
+        for i_min, j_min, i_max, j_max in cells:
+            self.occupancy[i_min:i_max, j_min:j_max] = 1
+
+        # distance (m) from each cell to the nearest obstacle cell, then inflate by the robot radius
+        if self.occupancy.any():
+            self.distance = (
+                distance_transform_edt(self.occupancy == 0) * resolution
+            ).astype(np.float32)
+        else:
+            self.distance = np.full(self.shape, np.inf, dtype=np.float32)
+        self.inflated = (self.distance < self.robot_radius).astype(np.uint8)
+
+    def to_grid(self, points):
+        """
+        Converts world coordinates to grid cells.
+
+        Args:
+            points (np.ndarray): Points (..., 2) in world coordinates.
+
+        Returns:
+            np.ndarray: Cells (..., 2) as integer indices, which may lie outside the grid.
+        """
+        return np.round(
+            (np.asarray(points, dtype=float) - self.origin) / self.resolution
+        ).astype(int)
+
+    def to_world(self, cells):
+        """
+        Converts grid cells to world coordinates.
+
+        Args:
+            cells (np.ndarray): Cells (..., 2) as integer indices.
+
+        Returns:
+            np.ndarray: Points (..., 2) in world coordinates.
+        """
+        return np.asarray(cells) * self.resolution + self.origin
+
+    def in_bounds(self, cells):
+        """
+        Checks whether grid cells lie inside the grid.
+
+        Args:
+            cells (np.ndarray): Cells (..., 2) as integer indices.
+
+        Returns:
+            np.ndarray: Boolean array (...) which is True for cells inside the grid.
+        """
+        cells = np.asarray(cells)
+        return np.all((cells >= 0) & (cells < self.shape), axis=-1)
+
+    def get_clearance(self, points):
+        """
+        Gets the distance from points to the nearest obstacle.
+
+        Args:
+            points (np.ndarray): Points (..., 2) in world coordinates.
+
+        Returns:
+            np.ndarray: Distances (...) in meters, inf for points outside the grid.
+        """
+        cells = self.to_grid(points)
+        inside = self.in_bounds(cells)
+        clearance = np.full(inside.shape, np.inf, dtype=np.float32)
+        clearance[inside] = self.distance[cells[inside][:, 0], cells[inside][:, 1]]
+        return clearance
+
+    def is_free(self, points):
+        """
+        Checks whether the robot can stand at points without touching an obstacle.
+
+        Args:
+            points (np.ndarray): Points (..., 2) in world coordinates.
+
+        Returns:
+            np.ndarray: Boolean array (...) which is True for free points.
+        """
+        return self.get_clearance(points) >= self.robot_radius
+
+
+def get_costmap(obstacles_bounds, robot_size, resolution=0.05, bounds=None, margin=2.0):
+    """
+    Gets the costmap of an obstacle set, built once and reused while the obstacles do not change.
+
+    Args:
+        obstacles_bounds (list): List of obstacle boundaries [x_min, y_min, x_max, y_max].
+        robot_size (float): The size of the robot.
+        resolution (float, optional): The size of a grid cell in meters. Defaults to 0.05.
+        bounds (list, optional): The map region [x_min, y_min, x_max, y_max]. Defaults to the
+            bounding box of the obstacles, extended by margin.
+        margin (float, optional): Free space kept around the obstacles when bounds is None. Defaults to 2.0.
+
+    Returns:
+        Costmap: The costmap of the obstacle set.
+    """
+    key = hashlib.sha1(
+        np.asarray(obstacles_bounds, dtype=float).tobytes()
+        + np.asarray(
+            [robot_size, resolution, margin] + ([] if bounds is None else list(bounds)),
+            dtype=float,
+        ).tobytes()
+    ).hexdigest()
+    if key not in costmap_cache:
+        if len(costmap_cache) >= COSTMAP_CACHE_SIZE:
+            costmap_cache.pop(next(iter(costmap_cache)))
+        costmap_cache[key] = Costmap(
+            obstacles_bounds, robot_size, resolution, bounds, margin
+        )
+    return costmap_cache[key]
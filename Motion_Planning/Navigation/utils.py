@@ -1,3 +1,5 @@
+import math
+
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Rectangle
@@ -5,7 +7,7 @@ from matplotlib.patches import Rectangle
 
 class AreaBounds:
 
-    def __init__(self, start, goal, obstacles_bounds):
+    def __init__(self, start, goal, obstacles_bounds, costmap=None):
         obstacles_bounds_arr = np.array(obstacles_bounds)
         if obstacles_bounds_arr.size == 0:
             self.x_min = min([start[0], goal[0]]) - 2
@@ -20,6 +22,74 @@ class AreaBounds:
             self.x_max = max([self.x_max, start[0], goal[0]]) + 2
             self.y_max = max([self.y_max, start[1], goal[1]]) + 2
 
+        # the costmap already covers its obstacles, the area spans the whole map
+        if costmap is not None:
+            self.x_min = min(self.x_min, costmap.bounds[0])
+            self.y_min = min(self.y_min, costmap.bounds[1])
+            self.x_max = max(self.x_max, costmap.bounds[2])
+            self.y_max = max(self.y_max, costmap.bounds[3])
+
+
+def check_segments_collision(
+    starts, ends, obstacles_bounds, margin=0.0, chunk_size=4096
+):
+    """
+    Checks many segments against axis-aligned obstacle boxes at once with a slab test.
+
+    Sweeping a square robot of half size margin along a segment hits a box exactly when
+    the segment hits the box inflated by margin, so the whole segment is checked, not
+    only points sampled along it.
+
+    Args:
+        starts (np.ndarray): Segment start points (N, 2).
+        ends (np.ndarray): Segment end points (N, 2).
+        obstacles_bounds (np.ndarray): Obstacle boxes (M, 4) as [x_min, y_min, x_max, y_max].
+        margin (float, optional): Inflation of the boxes, e.g. the robot radius. Defaults to 0.0.
+        chunk_size (int, optional): Number of segments tested per batch, bounds the memory to chunk_size * M. Defaults to 4096.
+
+    Returns:
+        np.ndarray: Boolean array (N,) which is True for segments touching an obstacle.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    boxes = np.asarray(obstacles_bounds, dtype=float).reshape(-1, 4)
+    lower = boxes[:, :2] - margin
+    upper = boxes[:, 2:] + margin
+
+    collision = np.zeros(len(starts), dtype=bool)
+    if len(boxes) == 0:
+        return collision
+
+    for begin in range(0, len(starts), chunk_size):
+        start = starts[begin : begin + chunk_size]
+        end = ends[begin : begin + chunk_size]
+
+        # broad phase: only pairs whose bounding boxes overlap can collide
+        seg_lower = np.minimum(start, end)[:, None, :]
+        seg_upper = np.maximum(start, end)[:, None, :]
+        overlap = np.all((seg_lower <= upper) & (seg_upper >= lower), axis=2)
+        seg_id, box_id = np.nonzero(overlap)
+        if len(seg_id) == 0:
+            continue
+
+        # slab test on the remaining pairs: parameters where the segment crosses the slab planes
+        pair_start = start[seg_id]
+        delta = end[seg_id] - pair_start
+        pair_lower = lower[box_id]
+        pair_upper = upper[box_id]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1 = (pair_lower - pair_start) / delta
+            t2 = (pair_upper - pair_start) / delta
+
+        # the bounding boxes overlap, so a segment parallel to a slab always lies inside it
+        parallel = delta == 0
+        t_enter = np.where(parallel, -np.inf, np.minimum(t1, t2)).max(axis=1)
+        t_exit = np.where(parallel, np.inf, np.maximum(t1, t2)).min(axis=1)
+        hit = np.maximum(t_enter, 0.0) <= np.minimum(t_exit, 1.0)
+        collision[begin + seg_id[hit]] = True
+
+    return collision
+
 
 def plot_rectangle(x_min, y_min, x_max, y_max):  # pragma: no cover
     width = x_max - x_min
@@ -28,3 +98,213 @@ def plot_rectangle(x_min, y_min, x_max, y_max):  # pragma: no cover
         (x_min, y_min), width, height, edgecolor="black", facecolor="black"
     )
     plt.gca().add_patch(rect)
+
+
+def check_segments_free(
+    starts, ends, costmap=None, obstacles_bounds=None, robot_radius=0.0
+):
+    """
+    Checks many straight robot motions for collision at once.
+
+    Args:
+        starts (np.ndarray): Segment start points (N, 2).
+        ends (np.ndarray): Segment end points (N, 2).
+        costmap (Costmap, optional): If given, the segments are sampled at the costmap
+            resolution and checked against it. Defaults to None.
+        obstacles_bounds (list, optional): Obstacle boxes checked with the swept test when
+            no costmap is given. Defaults to None.
+        robot_radius (float, optional): Half size of the robot, only used with obstacles_bounds. Defaults to 0.0.
+
+    Returns:
+        np.ndarray: Boolean array (N,) which is True for segments that are not in collision.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    if costmap is None:
+        if obstacles_bounds is None:
+            return np.ones(len(starts), dtype=bool)
+        return ~check_segments_collision(starts, ends, obstacles_bounds, robot_radius)
+
+    # sample every segment, all samples are looked up in the costmap at once
+    delta = ends - starts
+    n_steps = np.ceil(np.hypot(*delta.T) / costmap.resolution).astype(int) + 1
+    offsets = np.concatenate([[0], np.cumsum(n_steps)[:-1]])
+    seg_id = np.repeat(np.arange(len(starts)), n_steps)
+    t = (np.arange(len(seg_id)) - offsets[seg_id]) / np.maximum(n_steps[seg_id] - 1, 1)
+    points = starts[seg_id] + t[:, None] * delta[seg_id]
+    if len(points) == 0:
+        return np.ones(0, dtype=bool)
+    return np.logical_and.reduceat(costmap.is_free(points), offsets)
+
+
+def remove_collinear_points(path, tolerance=1e-3):
+    """
+    Removes the waypoints lying on the straight line between their neighbours.
+
+    Args:
+        path (list): The path as a list of points [x, y].
+        tolerance (float, optional): Largest distance (m) of a removed point to the line. Defaults to 1e-3.
+
+    Returns:
+        list: The path without collinear and duplicated points, with the same start and end.
+    """
+    points = np.asarray(path, dtype=float).reshape(-1, 2)
+    if len(points) < 3:
+        return points.tolist()
+
+    kept = [points[0]]
+    for point, next_point in zip(points[1:-1], points[2:]):
+        line = next_point - kept[-1]
+        length = math.hypot(*line)
+        offset = point - kept[-1]
+        if length == 0:
+            distance = math.hypot(*offset)
+        else:
+            distance = abs(line[0] * offset[1] - line[1] * offset[0]) / length
+        # a point outside the segment is a turn back, not a collinear point
+        projection = np.dot(offset, line)
+        if distance > tolerance or not 0 <= projection <= length**2:
+            kept.append(point)
+    kept.append(points[-1])
+    return np.asarray(kept).tolist()
+
+
+def shortcut_path(path, is_segments_free):
+    """
+    Shortcuts a path by line of sight: from each kept waypoint, jumps to the farthest
+    later waypoint that can be reached in a straight line.
+
+    Args:
+        path (list): The path as a list of points [x, y], every segment of it must be free.
+        is_segments_free (callable): Checks segments (starts (N, 2), ends (N, 2)) and returns
+            a boolean array (N,) which is True for free segments.
+
+    Returns:
+        list: The shortcut path, with the same start and end.
+    """
+    points = np.asarray(path, dtype=float).reshape(-1, 2)
+    if len(points) < 3:
+        return points.tolist()
+
+    kept = [0]
+    i = 0
+    while i < len(points) - 1:
+        # check the lines of sight to all later waypoints at once, the next one is always free
+        free = is_segments_free(
+            np.broadcast_to(points[i], (len(points) - i - 2, 2)), points[i + 2 :]
+        )
+        visible = np.flatnonzero(free)
+        i = i + 2 + int(visible[-1]) if len(visible) else i + 1
+        kept.append(i)
+    return points[kept].tolist()
+
+
+def round_path_corners(path, turning_radius, resolution, is_segments_free=None):
+    """
+    Replaces the corners of a path by circular arcs, so that the curvature stays below
+    1 / turning_radius. The result is a line-arc spline tangent at every joint.
+
+    A corner is kept sharp, to be turned on the spot, if its arc does not fit between
+    the neighbouring corners or if the arc is not collision free.
+
+    Args:
+        path (list): The path as a list of points [x, y].
+        turning_radius (float): Radius (m) of the arcs.
+        resolution (float): Distance (m) between the points sampled along an arc.
+        is_segments_free (callable, optional): Checks segments (starts (N, 2), ends (N, 2)) and
+            returns a boolean array (N,) which is True for free segments. Defaults to None.
+
+    Returns:
+        list: The smoothed path as a list of points [x, y], with the same start and end.
+    """
+    points = np.asarray(path, dtype=float).reshape(-1, 2)
+    if len(points) < 3:
+        return points.tolist()
+
+    smoothed = [points[0]]
+    for k in range(1, len(points) - 1):
+        prev_point, corner, next_point = points[k - 1], points[k], points[k + 1]
+        d_in, d_out = corner - prev_point, next_point - corner
+        len_in, len_out = math.hypot(*d_in), math.hypot(*d_out)
+        if len_in == 0 or len_out == 0:
+            continue
+        u_in, u_out = d_in / len_in, d_out / len_out
+        turn = math.atan2(u_in[0] * u_out[1] - u_in[1] * u_out[0], np.dot(u_in, u_out))
+
+        # the segments shared with other corners are split between them
+        tangent = turning_radius * math.tan(abs(turn) / 2)
+        max_in = len_in if k == 1 else len_in / 2
+        max_out = len_out if k == len(points) - 2 else len_out / 2
+        if (
+            abs(turn) < 1e-6
+            or abs(turn) > math.pi - 1e-3
+            or tangent > min(max_in, max_out)
+        ):
+            smoothed.append(corner)
+            continue
+
+        # sample the arc from the entry tangent point to the exit tangent point
+        entry = corner - u_in * tangent
+        normal = np.array([-u_in[1], u_in[0]]) * math.copysign(1.0, turn)
+        center = entry + normal * turning_radius
+        n_arc = max(2, math.ceil(turning_radius * abs(turn) / resolution))
+        angles = math.atan2(*(entry - center)[::-1]) + np.linspace(0.0, turn, n_arc + 1)
+        arc = center + turning_radius * np.column_stack(
+            [np.cos(angles), np.sin(angles)]
+        )
+
+        if (
+            is_segments_free is not None
+            and not is_segments_free(
+                np.vstack([smoothed[-1], arc[:-1]]), np.vstack([arc[0], arc[1:]])
+            ).all()
+        ):
+            smoothed.append(corner)
+            continue
+        smoothed.extend(arc)
+    smoothed.append(points[-1])
+    return np.asarray(smoothed).tolist()
+
+
+def simplify_path(
+    path,
+    costmap=None,
+    obstacles_bounds=None,
+    robot_radius=0.0,
+    tolerance=1e-3,
+    turning_radius=None,
+    resolution=0.05,
+):
+    """
+    Post-processes a planned path before it is executed: removes collinear points,
+    shortcuts by line of sight and optionally rounds the corners.
+
+    Args:
+        path (list): The path as a list of points [x, y].
+        costmap (Costmap, optional): Costmap the shortcuts are checked against. Defaults to None.
+        obstacles_bounds (list, optional): Obstacle boxes the shortcuts are checked against when
+            no costmap is given. Defaults to None.
+        robot_radius (float, optional): Half size of the robot, only used with obstacles_bounds. Defaults to 0.0.
+        tolerance (float, optional): Largest distance (m) of a removed collinear point to the line. Defaults to 1e-3.
+        turning_radius (float, optional): If given, corners are rounded with arcs of this radius. Defaults to None.
+        resolution (float, optional): Distance (m) between the points sampled along an arc. Defaults to 0.05.
+
+    Returns:
+        list: The simplified path as a list of points [x, y], with the same start and end.
+    """
+    if costmap is None and obstacles_bounds is None:
+        print(
+            "[Navigation] \033[33mwarning\033[0m: No costmap or obstacles given, the path is not shortcut"
+        )
+
+    def is_segments_free(starts, ends):
+        return check_segments_free(
+            starts, ends, costmap, obstacles_bounds, robot_radius
+        )
+
+    path = remove_collinear_points(path, tolerance)
+    if costmap is not None or obstacles_bounds is not None:
+        path = shortcut_path(path, is_segments_free)
+    if turning_radius is not None:
+        path = round_path_corners(path, turning_radius, resolution, is_segments_free)
+    return path
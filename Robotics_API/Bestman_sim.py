@@ -9,6 +9,7 @@
 """
 
 import math
+import os
 import time
 from abc import ABC, abstractmethod
 from collections import namedtuple
@@ -16,10 +17,11 @@ from collections import namedtuple
 import numpy as np
 import pybullet as p
 
-from Controller import PIDController
+from Controller import BaseTrajectoryGenerator, PIDController
 from Sensor import Camera
 
 from .Pose import Pose
+from .utils import MERGED_BASE_PREFIX, get_root_inertial_frame, merge_base_arm_urdf
 
 
 class Bestman_sim(ABC):
@@ -74,17 +76,30 @@ class Bestman_sim(ABC):
             setpoint=self.target_distance,
         )
 
+        # Init base trajectory generator
+        self.base_trajectory_generator = BaseTrajectoryGenerator(
+            max_linear_velocity=self.controller_cfg.max_linear_velocity,
+            max_linear_acceleration=self.controller_cfg.max_linear_acceleration,
+            max_angular_velocity=self.controller_cfg.max_angular_velocity,
+            max_angular_acceleration=self.controller_cfg.max_angular_acceleration,
+            corner_angle=self.controller_cfg.corner_angle,
+        )
+        self.base_control_rate = self.controller_cfg.base_control_rate
+
         # Init base
         self.base_init_pose = Pose(
             self.robot_cfg.base_init_pose[:3], self.robot_cfg.base_init_pose[3:]
         )
-        self.base_id = self.client.load_object(
-            obj_name="base",
-            model_path=self.robot_cfg.base_urdf_path,
-            object_position=self.base_init_pose.get_position(),
-            object_orientation=self.base_init_pose.get_orientation(),
-            fixed_base=True,
-        )
+        # the base is a separate body until the merged model is loaded
+        self.merge_base_arm = False
+        if not self.robot_cfg.merge_base_arm:
+            self.base_id = self.client.load_object(
+                obj_name="base",
+                model_path=self.robot_cfg.base_urdf_path,
+                object_position=self.base_init_pose.get_position(),
+                object_orientation=self.base_init_pose.get_orientation(),
+                fixed_base=True,
+            )
         self.base_rotated = False
         self.current_base_yaw = self.base_init_pose.get_orientation("euler")[2]
 
@@ -96,32 +111,37 @@ class Bestman_sim(ABC):
         self.tcp_height = self.robot_cfg.tcp_height
         self.arm_reset_jointValues = self.robot_cfg.arm_reset_jointValues
 
-        arm_pose = self.sim_get_sync_arm_pose()
-        self.base_init_pose = Pose(
-            self.robot_cfg.base_init_pose[:3], self.robot_cfg.base_init_pose[3:]
-        )
-        self.arm_id = self.client.load_object(
-            obj_name="arm",
-            model_path=self.robot_cfg.arm_urdf_path,
-            object_position=arm_pose.get_position(),
-            object_orientation=arm_pose.get_orientation(),
-            fixed_base=True,
-        )
-        self.arm_joint_info = self.sim_get_arm_jointInfo()
-
-        # Add constraint between base and arm
-        p.createConstraint(
-            parentBodyUniqueId=self.base_id,
-            parentLinkIndex=-1,
-            childBodyUniqueId=self.arm_id,
-            childLinkIndex=-1,
-            jointType=p.JOINT_FIXED,
-            jointAxis=[0, 0, 0],
-            parentFramePosition=[0, 0, 0],
-            childFramePosition=[0, 0, 0],
-            physicsClientId=self.client_id,
-        )
-        self.sim_sync_arm_pose()
+        if self.robot_cfg.merge_base_arm:
+            # base and arm in one body, moving the base moves the arm
+            self.sim_load_merged_base_arm()
+            self.arm_joint_info = self.sim_get_arm_jointInfo()
+        else:
+            arm_pose = self.sim_get_sync_arm_pose()
+            self.base_init_pose = Pose(
+                self.robot_cfg.base_init_pose[:3], self.robot_cfg.base_init_pose[3:]
+            )
+            self.arm_id = self.client.load_object(
+                obj_name="arm",
+                model_path=self.robot_cfg.arm_urdf_path,
+                object_position=arm_pose.get_position(),
+                object_orientation=arm_pose.get_orientation(),
+                fixed_base=True,
+            )
+            self.arm_joint_info = self.sim_get_arm_jointInfo()
+
+            # Add constraint between base and arm
+            p.createConstraint(
+                parentBodyUniqueId=self.base_id,
+                parentLinkIndex=-1,
+                childBodyUniqueId=self.arm_id,
+                childLinkIndex=-1,
+                jointType=p.JOINT_FIXED,
+                jointAxis=[0, 0, 0],
+                parentFramePosition=[0, 0, 0],
+                childFramePosition=[0, 0, 0],
+                physicsClientId=self.client_id,
+            )
+            self.sim_sync_arm_pose()
 
         # Init arm joint angle
         self.sim_reset_arm_to_joint_values(self.arm_reset_jointValues)
@@ -131,7 +151,13 @@ class Bestman_sim(ABC):
 
         # Init camera
         self.Camera_cfg = cfg.Camera
-        self.camera = Camera(self.Camera_cfg, self.base_id, self.arm_place_height)
+        self.camera = Camera(
+            self.Camera_cfg,
+            self.client,
+            self.base_id,
+            self.arm_place_height,
+            self.base_link if self.merge_base_arm else -1,
+        )
 
         # Parameters for interactivate control
         self.interact_params = {}
@@ -140,6 +166,69 @@ class Bestman_sim(ABC):
     # functions for base
     # ----------------------------------------------------------------
 
+    def sim_load_merged_base_arm(self):
+        """
+        Loads the base and the arm as a single body, from a URDF generated with the base mounted
+        under the arm like sim_sync_arm_pose places them. The arm keeps its joint and link indices,
+        the base links come after them.
+        """
+        base_urdf_path = self.client.resolve_model_path(self.robot_cfg.base_urdf_path)
+        arm_urdf_path = self.client.resolve_model_path(self.robot_cfg.arm_urdf_path)
+
+        # load the base alone, to find where the arm is mounted on it
+        self.base_id = p.loadURDF(
+            base_urdf_path,
+            self.base_init_pose.get_position(),
+            self.base_init_pose.get_orientation(),
+            useFixedBase=True,
+            physicsClientId=self.client_id,
+        )
+        arm_pose = self.sim_get_sync_arm_pose()
+        base_position, base_orientation = p.getBasePositionAndOrientation(
+            self.base_id, physicsClientId=self.client_id
+        )
+        base_inertial = p.getDynamicsInfo(
+            self.base_id, -1, physicsClientId=self.client_id
+        )[3:5]
+        p.removeBody(self.base_id, physicsClientId=self.client_id)
+
+        # pybullet poses are center of mass frames, the URDF joint is between link frames
+        base_frame = p.multiplyTransforms(
+            base_position, base_orientation, *p.invertTransform(*base_inertial)
+        )
+        arm_frame = p.multiplyTransforms(
+            arm_pose.get_position(),
+            arm_pose.get_orientation(),
+            *p.invertTransform(*get_root_inertial_frame(arm_urdf_path)),
+        )
+        mount = p.multiplyTransforms(*p.invertTransform(*arm_frame), *base_frame)
+        merged_urdf_path = merge_base_arm_urdf(base_urdf_path, arm_urdf_path, *mount)
+
+        self.arm_id = self.client.load_object(
+            obj_name="robot",
+            model_path=os.path.abspath(merged_urdf_path),
+            object_position=arm_frame[0],
+            object_orientation=arm_frame[1],
+            fixed_base=True,
+        )
+        self.base_id = self.arm_id
+        self.merge_base_arm = True
+        self.base_link = next(
+            i
+            for i in range(p.getNumJoints(self.arm_id, physicsClientId=self.client_id))
+            if p.getJointInfo(self.arm_id, i, physicsClientId=self.client_id)[1].decode(
+                "utf-8"
+            )
+            == MERGED_BASE_PREFIX + "mount_joint"
+        )
+
+        # pose of the arm center of mass in the base center of mass frame
+        self.arm_mount = p.multiplyTransforms(
+            *p.invertTransform(base_position, base_orientation),
+            arm_pose.get_position(),
+            arm_pose.get_orientation(),
+        )
+
     def sim_get_base_id(self):
         """
         Retrieves the ID of the robot base.
@@ -149,6 +238,57 @@ class Bestman_sim(ABC):
         """
         return self.base_id
 
+    def sim_get_base_links(self):
+        """
+        Retrieves the link indices of the robot base.
+
+        Returns:
+            list: The link indices of the base body, or of the base links of the merged body.
+        """
+        num_joints = p.getNumJoints(self.base_id, physicsClientId=self.client_id)
+        if self.merge_base_arm:
+            return list(range(self.base_link, num_joints))
+        return [-1] + list(range(num_joints))
+
+    def sim_get_base_position_and_orientation(self):
+        """
+        Retrieves the current position and orientation of the robot base without building a Pose.
+
+        Returns:
+            tuple: The position [x, y, z] and orientation quaternion [x, y, z, w] of the base.
+        """
+        if self.merge_base_arm:
+            link_state = p.getLinkState(
+                self.base_id,
+                self.base_link,
+                computeForwardKinematics=True,
+                physicsClientId=self.client_id,
+            )
+            return link_state[0], link_state[1]
+        return p.getBasePositionAndOrientation(
+            self.base_id, physicsClientId=self.client_id
+        )
+
+    def sim_set_base_position_and_orientation(self, position, orientation):
+        """
+        Teleports the robot base, and the arm with it.
+
+        Args:
+            position (list): The position [x, y, z] of the base.
+            orientation (list): The orientation quaternion [x, y, z, w] of the base.
+        """
+        if self.merge_base_arm:
+            p.resetBasePositionAndOrientation(
+                self.base_id,
+                *p.multiplyTransforms(position, orientation, *self.arm_mount),
+                physicsClientId=self.client_id,
+            )
+        else:
+            p.resetBasePositionAndOrientation(
+                self.base_id, position, orientation, physicsClientId=self.client_id
+            )
+            self.sim_sync_arm_pose()
+
     def sim_get_current_base_pose(self):
         """
         Retrieves the current position and orientation of the robot base.
@@ -157,9 +297,7 @@ class Bestman_sim(ABC):
             Pose: A Pose object representing the current pose of the base.
                   The pose contains the position as a list [x, y, z] and the orientation as a list [roll, pitch, yaw].
         """
-        base_position, base_orientation = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
-        )
+        base_position, base_orientation = self.sim_get_base_position_and_orientation()
         return Pose(base_position, base_orientation)
 
     def sim_stop_base(self):
@@ -175,8 +313,62 @@ class Bestman_sim(ABC):
         )
         return True
 
+    def sim_move_base(
+        self,
+        distance=0.0,
+        rotation=0.0,
+        step_size=0.01,
+        angle_step_size=0.02,
+        control_rate=None,
+    ):
+        """
+        Rotate base on the spot, then move it in a straight line along its new heading.
+        This is the motion engine used by the forward, backward, left, right and rotate functions.
+
+        The base is moved in fixed increments, one per control step, followed by an exact final
+        pose. The pace is set by the control rate and the client's real time factor, there is no
+        other sleep.
+
+        Args:
+            distance (float, optional): The distance to move in meters, negative to move backward. Default is 0.0.
+            rotation (float, optional): The angle to rotate in radians, positive for counter-clockwise. Default is 0.0.
+            step_size (float, optional): The distance increment for each control step in meters. Default is 0.01.
+            angle_step_size (float, optional): The angle increment for each control step in radians. Default is 0.02.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
+        """
+        position, _ = self.sim_get_base_position_and_orientation()
+        yaw = self.current_base_yaw
+        final_yaw = (yaw + rotation + math.pi) % (2 * math.pi) - math.pi
+
+        # rotation increments, then the exact final orientation
+        poses = [np.empty((0, 3))]
+        if rotation != 0:
+            n_rotate = math.floor(abs(rotation) / angle_step_size + 1e-9)
+            yaws = yaw + math.copysign(angle_step_size, rotation) * np.arange(
+                1, n_rotate + 1
+            )
+            poses.append(
+                np.column_stack(
+                    [np.full((n_rotate + 1, 2), position[:2]), [*yaws, final_yaw]]
+                )
+            )
+        self.current_base_yaw = final_yaw
+
+        # translation increments, then the exact final position
+        if distance != 0:
+            heading = np.array([math.cos(final_yaw), math.sin(final_yaw)])
+            n_move = math.floor(abs(distance) / step_size + 1e-9)
+            steps = math.copysign(step_size, distance) * np.arange(1, n_move + 1)
+            points = np.asarray(position[:2]) + np.outer([*steps, distance], heading)
+            poses.append(np.column_stack([points, np.full(n_move + 1, final_yaw)]))
+
+        self.sim_execute_base_trajectory(
+            np.concatenate(poses),
+            self.base_control_rate if control_rate is None else control_rate,
+        )
+
     def sim_rotate_base_to_target_yaw(
-        self, target_yaw, gradual=True, step_size=0.02, delay_time=0.05
+        self, target_yaw, gradual=True, step_size=0.02, control_rate=None
     ):
         """
         Rotate base to a specified yaw angle. Can be done gradually or at once.
@@ -185,148 +377,48 @@ class Bestman_sim(ABC):
             target_yaw (float): The target yaw angle (in radians) for the base.
             gradual (bool): If True, the rotation is done gradually. Otherwise, it's instant.
             step_size (float, optional): Angle increment for each step in radians. Only used if gradual=True.
-            delay_time (float, optional): Delay in seconds after each step. Only used if gradual=True.
+            control_rate (float, optional): Control steps per simulated second. Only used if gradual=True.
         """
 
-        def angle_to_quaternion(yaw):
-            return [0, 0, math.sin(yaw / 2.0), math.cos(yaw / 2.0)]
-
         def shortest_angular_distance(from_angle, to_angle):
             return (to_angle - from_angle + math.pi) % (2 * math.pi) - math.pi
 
         if gradual:
-
-            angle_diff = shortest_angular_distance(self.current_base_yaw, target_yaw)
-
-            while abs(angle_diff) > step_size:
-
-                if angle_diff > 0:
-                    self.current_base_yaw += step_size
-                else:
-                    self.current_base_yaw -= step_size
-
-                self.current_base_yaw = (self.current_base_yaw + math.pi) % (
-                    2 * math.pi
-                ) - math.pi
-                angle_diff = shortest_angular_distance(
-                    self.current_base_yaw, target_yaw
-                )
-                orientation = angle_to_quaternion(self.current_base_yaw)
-                position, _ = p.getBasePositionAndOrientation(
-                    self.base_id, physicsClientId=self.client_id
-                )
-                p.resetBasePositionAndOrientation(
-                    self.base_id, position, orientation, physicsClientId=self.client_id
-                )
-                self.sim_sync_arm_pose()
-                self.client.run()
-
-            # Ensure final orientation is set accurately
-            orientation = angle_to_quaternion(target_yaw)
-            position, _ = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, position, orientation, physicsClientId=self.client_id
+            self.sim_move_base(
+                rotation=shortest_angular_distance(self.current_base_yaw, target_yaw),
+                angle_step_size=step_size,
+                control_rate=control_rate,
             )
-            self.sim_sync_arm_pose()
-            self.current_base_yaw = target_yaw
-            self.client.run()
 
         else:
-            orientation = angle_to_quaternion(target_yaw)
-            position, _ = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, position, orientation, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
+            orientation = [0, 0, math.sin(target_yaw / 2.0), math.cos(target_yaw / 2.0)]
+            position, _ = self.sim_get_base_position_and_orientation()
+            self.sim_set_base_position_and_orientation(position, orientation)
+            self.current_base_yaw = target_yaw
 
             self.client.run(5)
 
     def sim_rotate_base(
-        self, angle, direction="clockwise", step_size=0.02, delay_time=0.05
+        self, angle, direction="clockwise", step_size=0.02, control_rate=None
     ):
         """
         Rotate base by a specified angle in a given direction.
-        Can be done gradually or at once.
 
         Args:
-            angle (float): The angle (in radians) to rotate the base.
+            angle (float): The angle (in degrees) to rotate the base.
             direction (str): The direction of rotation ('clockwise' or 'counter-clockwise').
-            step_size (float, optional): Angle increment for each step in radians. Only used if gradual=True.
-            delay_time (float, optional): Delay in seconds after each step. Only used if gradual=True.
+            step_size (float, optional): Angle increment for each step in radians.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
         """
-
-        def angle_to_quaternion(yaw):
-            return [0, 0, math.sin(yaw / 2.0), math.cos(yaw / 2.0)]
-
-        angle = math.radians(angle)
-
-        # Determine the target yaw angle based on the input arguments
         if direction == "clockwise":
-
-            target_yaw = (self.current_base_yaw - angle + 2 * math.pi) % (2 * math.pi)
-            while angle >= step_size:
-                self.current_base_yaw = (
-                    self.current_base_yaw - step_size + +2 * math.pi
-                ) % (2 * math.pi)
-                orientation = angle_to_quaternion(self.current_base_yaw)
-                position, _ = p.getBasePositionAndOrientation(
-                    self.base_id, physicsClientId=self.client_id
-                )
-                p.resetBasePositionAndOrientation(
-                    self.base_id, position, orientation, physicsClientId=self.client_id
-                )
-                self.sim_sync_arm_pose()
-                self.client.run()
-                time.sleep(delay_time)
-                angle -= step_size
-
-            # Ensure final orientation is set accurately
-            orientation = angle_to_quaternion(target_yaw)
-            position, _ = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, position, orientation, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.current_base_yaw = target_yaw
-            self.client.run()
-
+            rotation = -math.radians(angle)
         elif direction == "counter-clockwise":
-            target_yaw = (self.current_base_yaw + angle + 2 * math.pi) % (2 * math.pi)
-            while angle >= step_size:
-                self.current_base_yaw = (
-                    self.current_base_yaw + step_size + +2 * math.pi
-                ) % (2 * math.pi)
-                orientation = angle_to_quaternion(self.current_base_yaw)
-                position, _ = p.getBasePositionAndOrientation(
-                    self.base_id, physicsClientId=self.client_id
-                )
-                p.resetBasePositionAndOrientation(
-                    self.base_id, position, orientation, physicsClientId=self.client_id
-                )
-                self.sim_sync_arm_pose()
-                self.client.run()
-                time.sleep(delay_time)
-                angle -= step_size
-
-            # Ensure final orientation is set accurately
-            orientation = angle_to_quaternion(target_yaw)
-            position, _ = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, position, orientation, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.current_base_yaw = target_yaw
-            self.client.run()
+            rotation = math.radians(angle)
         else:
             raise ValueError("Direction must be 'clockwise' or 'counter-clockwise'")
+        self.sim_move_base(
+            rotation=rotation, angle_step_size=step_size, control_rate=control_rate
+        )
 
     def sim_action(self, output):
         """
@@ -335,234 +427,119 @@ class Bestman_sim(ABC):
         Args:
             output (float): The output of the PID controller, which is used to calculate the new position of the robot's base.
         """
-        position, orientation = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
-        )
+        position, orientation = self.sim_get_base_position_and_orientation()
         euler_angles = p.getEulerFromQuaternion(
             orientation, physicsClientId=self.client_id
         )
-        p.resetBasePositionAndOrientation(
-            self.base_id,
+        self.sim_set_base_position_and_orientation(
             [
                 position[0] + output * math.cos(euler_angles[2]),
                 position[1] + output * math.sin(euler_angles[2]),
                 position[2],
             ],
             orientation,
-            physicsClientId=self.client_id,
         )
-        self.sim_sync_arm_pose()
+
+    def sim_execute_base_trajectory(self, trajectory, control_rate=None):
+        """
+        Execute a base trajectory, moving the base to the next pose at every control step.
+
+        Args:
+            trajectory (np.ndarray): Base poses (N, 3) as [x, y, yaw], one per control step.
+            control_rate (float, optional): Control steps per simulated second. Defaults to one
+                control step per simulation step.
+        """
+        steps_per_pose = (
+            1
+            if control_rate is None
+            else max(1, round(1.0 / (control_rate * self.client.timestep)))
+        )
+        position, _ = self.sim_get_base_position_and_orientation()
+        for x, y, yaw in trajectory:
+            self.sim_set_base_position_and_orientation(
+                [x, y, position[2]],
+                [0, 0, math.sin(yaw / 2.0), math.cos(yaw / 2.0)],
+            )
+            self.client.run(steps_per_pose)
+        if len(trajectory) > 0:
+            self.current_base_yaw = float(trajectory[-1][2])
+
+    def sim_follow_base_path(self, path, goal_yaw=None):
+        """
+        Move base along a path with a velocity- and acceleration-limited trajectory.
+        The robot turns on the spot at sharp corners and drives through gentle ones.
+
+        Args:
+            path (list): Waypoints [x, y] to pass through, in order.
+            goal_yaw (float, optional): If given, the robot finally turns to this yaw (in radians).
+        """
+        position, orientation = self.sim_get_base_position_and_orientation()
+        yaw = p.getEulerFromQuaternion(orientation)[2]
+        trajectory = self.base_trajectory_generator.generate(
+            [position[0], position[1], yaw], path, goal_yaw, self.client.timestep
+        )
+        self.sim_execute_base_trajectory(trajectory)
 
     def sim_move_base_to_waypoint(self, waypoint, threshold=0.01):
         """
         Move base to waypoint
         The robot first rotates towards the target, and then moves towards it in a straight line.
-        The movement is controlled by a controller (assumed to be a PID controller) that adjusts the velocity of the robot based on the distance to the target.
+        The motion follows a velocity- and acceleration-limited trajectory, one pose per simulation step.
 
         Args:
             waypoint (Pose): The target pose (position and orientation) for the robot. This should be an instance of a Pose class, which is assumed to have 'x' and 'y' properties.
+            threshold (float, optional): Unused, the trajectory ends exactly at the waypoint. Kept for compatibility.
         """
-        self.next_waypoint = waypoint
-        self.target_distance = 0.0
-        self.base_rotated = False
-        cnt = 1
-
-        while True:
-            pose = self.sim_get_current_base_pose()
-            target = self.next_waypoint
-            x, y = pose.x, pose.y
-
-            distance = math.sqrt((target.y - y) ** 2 + (target.x - x) ** 2)
-            if distance < threshold:
-                break
-
-            self.distance_controller.set_goal(self.target_distance)
-            output = self.distance_controller.calculate(distance)
-
-            yaw = math.atan2(target.y - y, target.x - x)
-
-            if not self.base_rotated:
-                self.sim_rotate_base_to_target_yaw(yaw)
-                self.base_rotated = True
-
-            self.sim_action(-output)
-
-            if cnt % 20 == 0:
-                self.client.run()
-
-            cnt += 1
-
+        self.sim_follow_base_path([[waypoint.x, waypoint.y]])
         self.client.run()
 
-    def sim_move_base_forward(self, distance, step_size=0.01, delay_time=0.05):
+    def sim_move_base_forward(self, distance, step_size=0.01, control_rate=None):
         """
         Move the base forward by a specified distance.
 
         Args:
             distance (float): The distance to move forward (in meters).
             step_size (float, optional): The distance increment for each step in meters. Default is 0.01.
-            delay_time (float, optional): Delay in seconds after each step. Default is 0.05.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
         """
-        init_pos, init_orn = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
-        )
-        init_distance = distance
-        while distance >= step_size:
-            cur_pos, cur_orn = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            new_pos = (
-                cur_pos[0] + step_size * math.cos(self.current_base_yaw),
-                cur_pos[1] + step_size * math.sin(self.current_base_yaw),
-                cur_pos[2],
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, new_pos, cur_orn, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.client.run()
-            time.sleep(delay_time)
-            distance -= step_size
-
-        fin_pos = (
-            init_pos[0] + init_distance * math.cos(self.current_base_yaw),
-            init_pos[1] + init_distance * math.sin(self.current_base_yaw),
-            init_pos[2],
-        )
-        p.resetBasePositionAndOrientation(
-            self.base_id, fin_pos, init_orn, physicsClientId=self.client_id
-        )
-        self.sim_sync_arm_pose()
-        self.client.run()
-        time.sleep(delay_time)
+        self.sim_move_base(distance, step_size=step_size, control_rate=control_rate)
 
-    def sim_move_base_backward(self, distance, step_size=0.01, delay_time=0.05):
+    def sim_move_base_backward(self, distance, step_size=0.01, control_rate=None):
         """
         Move the base backward by a specified distance.
 
         Args:
-            distance (float): The distance to move forward (in meters).
+            distance (float): The distance to move backward (in meters).
             step_size (float, optional): The distance increment for each step in meters. Default is 0.01.
-            delay_time (float, optional): Delay in seconds after each step. Default is 0.05.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
         """
-        init_pos, init_orn = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
-        )
-        init_distance = distance
-        while distance >= step_size:
-            cur_pos, cur_orn = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            new_pos = (
-                cur_pos[0] - step_size * math.cos(self.current_base_yaw),
-                cur_pos[1] - step_size * math.sin(self.current_base_yaw),
-                cur_pos[2],
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, new_pos, cur_orn, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.client.run()
-            time.sleep(delay_time)
-            distance -= step_size
-
-        fin_pos = (
-            init_pos[0] - init_distance * math.cos(self.current_base_yaw),
-            init_pos[1] - init_distance * math.sin(self.current_base_yaw),
-            init_pos[2],
-        )
-        p.resetBasePositionAndOrientation(
-            self.base_id, fin_pos, init_orn, physicsClientId=self.client_id
-        )
-        self.sim_sync_arm_pose()
-        self.client.run()
-        time.sleep(delay_time)
+        self.sim_move_base(-distance, step_size=step_size, control_rate=control_rate)
 
-    def sim_move_base_left(self, distance, step_size=0.01, delay_time=0.05):
+    def sim_move_base_left(self, distance, step_size=0.01, control_rate=None):
         """
-        Move the base left by a specified distance.
+        Turn the base left, then move it forward by a specified distance.
 
         Args:
             distance (float): The distance to move left (in meters).
             step_size (float, optional): The distance increment for each step in meters. Default is 0.01.
-            delay_time (float, optional): Delay in seconds after each step. Default is 0.05.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
         """
-        self.sim_rotate_base(90, "counter-clockwise")
-        init_pos, init_orn = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
+        self.sim_move_base(
+            distance, math.pi / 2, step_size=step_size, control_rate=control_rate
         )
-        init_distance = distance
-        while distance >= step_size:
-            cur_pos, cur_orn = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            new_pos = (
-                cur_pos[0] + step_size * math.cos(self.current_base_yaw),
-                cur_pos[1] + step_size * math.sin(self.current_base_yaw),
-                cur_pos[2],
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, new_pos, cur_orn, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.client.run()
-            time.sleep(delay_time)
-            distance -= step_size
 
-        fin_pos = (
-            init_pos[0] + init_distance * math.cos(self.current_base_yaw),
-            init_pos[1] + init_distance * math.sin(self.current_base_yaw),
-            init_pos[2],
-        )
-        p.resetBasePositionAndOrientation(
-            self.base_id, fin_pos, init_orn, physicsClientId=self.client_id
-        )
-        self.sim_sync_arm_pose()
-        self.client.run()
-        time.sleep(delay_time)
-
-    def sim_move_base_right(self, distance, step_size=0.01, delay_time=0.05):
+    def sim_move_base_right(self, distance, step_size=0.01, control_rate=None):
         """
-        Move the base right by a specified distance.
+        Turn the base right, then move it forward by a specified distance.
 
         Args:
             distance (float): The distance to move right (in meters).
             step_size (float, optional): The distance increment for each step in meters. Default is 0.01.
-            delay_time (float, optional): Delay in seconds after each step. Default is 0.05.
+            control_rate (float, optional): Control steps per simulated second. Defaults to the configured base control rate.
         """
-        self.sim_rotate_base(90)
-        init_pos, init_orn = p.getBasePositionAndOrientation(
-            self.base_id, physicsClientId=self.client_id
-        )
-        init_distance = distance
-        while distance >= step_size:
-            cur_pos, cur_orn = p.getBasePositionAndOrientation(
-                self.base_id, physicsClientId=self.client_id
-            )
-            new_pos = (
-                cur_pos[0] + step_size * math.cos(self.current_base_yaw),
-                cur_pos[1] + step_size * math.sin(self.current_base_yaw),
-                cur_pos[2],
-            )
-            p.resetBasePositionAndOrientation(
-                self.base_id, new_pos, cur_orn, physicsClientId=self.client_id
-            )
-            self.sim_sync_arm_pose()
-            self.client.run()
-            time.sleep(delay_time)
-            distance -= step_size
-
-        fin_pos = (
-            init_pos[0] + init_distance * math.cos(self.current_base_yaw),
-            init_pos[1] + init_distance * math.sin(self.current_base_yaw),
-            init_pos[2],
-        )
-        p.resetBasePositionAndOrientation(
-            self.base_id, fin_pos, init_orn, physicsClientId=self.client_id
+        self.sim_move_base(
+            distance, -math.pi / 2, step_size=step_size, control_rate=control_rate
         )
-        self.sim_sync_arm_pose()
-        self.client.run()
-        time.sleep(delay_time)
 
     def sim_navigate_base(
         self, goal_base_pose, path, threshold=0.05, enable_plot=False
@@ -573,27 +550,19 @@ class Bestman_sim(ABC):
         Args:
             goal_base_pose (Pose): The target pose (position and orientation) for the robot.
         """
-        # for i, waypoint in enumerate(path, start=1):
-        for i in range(len(path)):
-
-            next_point = [path[i][0], path[i][1], 0]
-            # move to each waypoint
-            self.sim_move_base_to_waypoint(
-                Pose([path[i][0], path[i][1], 0], goal_base_pose.get_orientation())
-            )
-
-            # draw the trajectory
-            if i != 0 and enable_plot:
-                front_point = [path[i - 1][0], path[i - 1][1], 0]
+        # draw the trajectory
+        if enable_plot:
+            for i in range(1, len(path)):
                 p.addUserDebugLine(
-                    front_point,
-                    next_point,
+                    [path[i - 1][0], path[i - 1][1], 0],
+                    [path[i][0], path[i][1], 0],
                     lineColorRGB=[1, 0, 0],
                     lineWidth=3,
                     physicsClientId=self.client_id,
                 )
 
-        self.sim_rotate_base_to_target_yaw(goal_base_pose.get_orientation("euler")[2])
+        # move along the whole path, then turn to the goal orientation
+        self.sim_follow_base_path(path, goal_base_pose.get_orientation("euler")[2])
         self.client.run(10)
         ik_error = self.sim_calculate_nav_error(goal_base_pose)
         if ik_error >= threshold:
@@ -654,8 +623,19 @@ class Bestman_sim(ABC):
         Returns:
             list: A list of indices for the joints in the robot arm.
         """
+        if self.merge_base_arm:
+            return list(range(self.base_link))
         return list(range(p.getNumJoints(self.arm_id, physicsClientId=self.client_id)))
 
+    def sim_get_arm_links(self):
+        """
+        Retrieves the link indices of the robot arm.
+
+        Returns:
+            list: The link indices of the arm body, or of the arm links of the merged body.
+        """
+        return [-1] + self.sim_get_arm_all_joint_idx()
+
     def sim_get_tcp_link(self):
         """
         Retrieves the TCP (Tool Center Point) link of the robot arm.
@@ -717,7 +697,7 @@ class Bestman_sim(ABC):
 
         self.arm_jointInfo = []
         self.controllable_joints = []
-        for i in range(p.getNumJoints(self.arm_id)):
+        for i in self.sim_get_arm_all_joint_idx():
             info = p.getJointInfo(self.arm_id, i)
             jointID = info[0]
             jointName = info[1].decode("utf-8")
@@ -808,15 +788,72 @@ class Bestman_sim(ABC):
         ]
         return joint_bounds
 
+    def sim_get_joint_states(self, joints=None):
+        """
+        Retrieve the positions and velocities of several arm joints with a single pybullet call.
+
+        Args:
+            joints (list, optional): Joint indices to read. Defaults to the arm controllable joints.
+
+        Returns:
+            tuple: Two np.ndarray, the joint positions and the joint velocities.
+        """
+        if joints is None:
+            joints = self.arm_controllable_joints
+        joint_states = p.getJointStates(
+            self.arm_id, joints, physicsClientId=self.client_id
+        )
+        positions = np.array([joint_state[0] for joint_state in joint_states])
+        velocities = np.array([joint_state[1] for joint_state in joint_states])
+        return positions, velocities
+
+    def sim_set_joint_states(self, joint_values, joints=None, joint_velocities=None):
+        """
+        Set several arm joints instantaneously with a single pybullet call, without stepping physics.
+
+        Args:
+            joint_values (list / np.ndarray): Desired joint positions, one per joint.
+            joints (list, optional): Joint indices to set. Defaults to the arm controllable joints.
+            joint_velocities (list / np.ndarray, optional): Desired joint velocities. Defaults to zero.
+        """
+        if joints is None:
+            joints = self.arm_controllable_joints
+        if joint_velocities is None:
+            joint_velocities = [0.0] * len(joints)
+        p.resetJointStatesMultiDof(
+            self.arm_id,
+            joints,
+            targetValues=[[joint_values[i]] for i in range(len(joints))],
+            targetVelocities=[[joint_velocities[i]] for i in range(len(joints))],
+            physicsClientId=self.client_id,
+        )
+
+    def sim_set_joint_targets(self, joint_values, joints=None):
+        """
+        Set the position control targets of several arm joints with a single pybullet call.
+
+        Args:
+            joint_values (list / np.ndarray): Target joint positions, one per joint.
+            joints (list, optional): Joint indices to control. Defaults to the arm controllable joints.
+        """
+        if joints is None:
+            joints = self.arm_controllable_joints
+        p.setJointMotorControlArray(
+            bodyIndex=self.arm_id,
+            jointIndices=joints,
+            controlMode=p.POSITION_CONTROL,
+            targetPositions=[joint_values[i] for i in range(len(joints))],
+            physicsClientId=self.client_id,
+        )
+
     def sim_get_current_joint_values(self):
         """
         Retrieve arm's joint angle
+
+        Returns:
+            np.ndarray: The current angle of each arm controllable joint.
         """
-        current_joint_values = [
-            p.getJointState(self.arm_id, i, physicsClientId=self.client_id)[0]
-            for i in self.arm_controllable_joints
-        ]
-        return current_joint_values
+        return self.sim_get_joint_states()[0]
 
     def sim_get_current_eef_pose(self):
         """
@@ -829,16 +866,17 @@ class Bestman_sim(ABC):
         )
         return Pose(eef_info[0], eef_info[1])
 
-    def sim_reset_arm_to_joint_values(self, joint_values):
+    def sim_reset_arm_to_joint_values(self, joint_values, settle_steps=10):
         """
         Set arm to move to a specific set of joint angles, witout considering physics
 
         Args:
             joint_values: A list of desired joint angles (in radians) for each joint of the arm.
+            settle_steps (int, optional): Simulation steps to run after the reset, 0 to skip stepping.
         """
-        for joint, value in zip(self.arm_controllable_joints, joint_values):
-            p.resetJointState(self.arm_id, joint, value)
-        self.client.run(10)
+        self.sim_set_joint_states(joint_values)
+        if settle_steps > 0:
+            self.client.run(settle_steps)
 
     def sim_debug_reset_arm_to_joint_values(self):
         """
@@ -852,7 +890,7 @@ class Bestman_sim(ABC):
             )
         )
 
-        for i in self.arm_joints_idx:
+        for i in range(len(self.arm_controllable_joints)):
             joint_value = input(
                 "Enter value for joint {} (current value: {}) or 'q' to keep current value: ".format(
                     i, joint_values[i]
@@ -909,12 +947,14 @@ class Bestman_sim(ABC):
             self.sim_move_arm_to_joint_values(target_joint_position)
         print("[BestMan_Sim][Arm] \033[34mInfo\033[0m: Interact over!")
 
-    def sim_move_arm_to_joint_values(self, joint_values, single=True):
+    def sim_move_arm_to_joint_values(self, joint_values, single=False, steps=10):
         """
         Move arm to move to a specific set of joint angles, with considering physics
 
         Args:
             joint_values: A list of desired joint angles (in radians) for each joint of the arm.
+            single (bool, optional): If True, send one motor command per joint instead of one for the whole arm.
+            steps (int, optional): Simulation steps to run after setting the targets.
         """
 
         if single:
@@ -928,15 +968,9 @@ class Bestman_sim(ABC):
                     # maxVelocity=self.arm_maxVelocity[i]
                 )
         else:
-            p.setJointMotorControlArray(
-                bodyIndex=self.arm_id,
-                jointIndices=self.arm_controllable_joints,
-                controlMode=p.POSITION_CONTROL,
-                targetPositions=joint_values,
-                physicsClientId=self.client_id,
-            )
+            self.sim_set_joint_targets(joint_values)
 
-        self.client.run(10)
+        self.client.run(steps)
 
         # start_time = time.time()  # avoid time anomaly
 
@@ -1016,13 +1050,8 @@ class Bestman_sim(ABC):
             angle (float): The desired rotation angle in radians.
         """
 
-        # Change this to your actual joint indices
-        joint_states = p.getJointStates(
-            self.arm_id, self.arm_joints_idx, physicsClientId=self.client_id
-        )
-
         # Create a new list of target joint angles
-        target_joint_values = [joint_state[0] for joint_state in joint_states]
+        target_joint_values = self.sim_get_current_joint_values()
 
         # Add desired rotation to the last joint's current angle
         target_joint_values[-1] += angle
@@ -1033,16 +1062,10 @@ class Bestman_sim(ABC):
         # Step the simulation until the joints reach their target angles
         while True:
             # Update the current joint states
-            joint_states = p.getJointStates(
-                self.arm_id, self.arm_joints_idx, physicsClientId=self.client_id
-            )
-            current_joint_values = [joint_state[0] for joint_state in joint_states]
+            current_joint_values = self.sim_get_current_joint_values()
 
             # Check if all joints have reached their target angles
-            if all(
-                abs(current_joint_values[i] - target_joint_values[i]) < 0.01
-                for i in range(len(self.arm_joints_idx))
-            ):
+            if np.all(np.abs(current_joint_values - target_joint_values) < 0.01):
                 break
 
             self.client.run()
@@ -1150,7 +1173,10 @@ class Bestman_sim(ABC):
         Synchronizes the pose of the robot arm with the base.
 
         This function ensures that the positions of the robot arm and base are aligned.
+        A merged base and arm is always aligned.
         """
+        if self.merge_base_arm:
+            return
         arm_pose = self.sim_get_sync_arm_pose()
         p.resetBasePositionAndOrientation(
             self.arm_id,
@@ -1201,7 +1227,8 @@ class Bestman_sim(ABC):
     # ----------------------------------------------------------------
 
     def sim_update_camera(self):
-        self.camera.sim_update()
+        # the bodies may have been teleported without stepping, do not reuse the cached frame
+        self.camera.sim_update(force=True)
 
     def sim_get_camera_pose(self):
         return self.camera.sim_get_camera_pose()
@@ -1219,6 +1246,12 @@ class Bestman_sim(ABC):
     def sim_get_camera_3d_points(self):
         return self.camera.sim_get_3d_points()
 
+    def sim_get_camera_segmentation_mask(self):
+        return self.camera.sim_get_segmentation_mask()
+
+    def sim_get_camera_object_point_cloud(self, object, link=None):
+        return self.camera.sim_get_object_point_cloud(object, link)
+
     def sim_visualize_camera_3d_points(self):
         self.camera.sim_visualize_3d_points()
 
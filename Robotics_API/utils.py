@@ -0,0 +1,150 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : utils.py
+# @Description:   : Utilities for the robot models
+"""
+
+import copy
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+
+import pybullet as p
+
+URDF_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bestman", "urdf")
+
+# prefix of the base links, joints and materials in a merged URDF, avoids name clashes with the arm
+MERGED_BASE_PREFIX = "mobile_"
+
+
+def resolve_mesh_path(filename, urdf_dir):
+    """
+    Resolves a mesh file name of a URDF to an absolute path, so the URDF can be moved.
+    Args:
+        filename: The file name as written in the URDF, relative or package:// paths are resolved.
+        urdf_dir: Directory of the URDF file.
+    Returns:
+        The absolute path of the mesh file, or the file name unchanged if it is not found.
+    """
+    if filename.startswith("package://"):
+        # like pybullet, look for the path without the package name in the parents of the URDF
+        relative_path = filename[len("package://") :].split("/", 1)[-1]
+        directory = urdf_dir
+        while True:
+            for candidate in (filename[len("package://") :], relative_path):
+                path = os.path.join(directory, candidate)
+                if os.path.exists(path):
+                    return os.path.abspath(path)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return filename
+            directory = parent
+    if "://" in filename or os.path.isabs(filename):
+        return filename
+    return os.path.abspath(os.path.join(urdf_dir, filename))
+
+
+def load_urdf_tree(urdf_path):
+    """
+    Parses a URDF file, with its mesh file names made absolute.
+    Args:
+        urdf_path: Path to the URDF file.
+    Returns:
+        The root <robot> element and the name of the root link.
+    """
+    robot = ET.parse(urdf_path).getroot()
+    urdf_dir = os.path.dirname(os.path.abspath(urdf_path))
+    for mesh in robot.iter("mesh"):
+        mesh.set("filename", resolve_mesh_path(mesh.get("filename"), urdf_dir))
+    children = {joint.find("child").get("link") for joint in robot.findall("joint")}
+    root_link = next(
+        link.get("name")
+        for link in robot.findall("link")
+        if link.get("name") not in children
+    )
+    return robot, root_link
+
+
+def get_root_inertial_frame(urdf_path):
+    """
+    Reads the inertial frame of the root link of a URDF, the frame pybullet reports base poses in.
+    Args:
+        urdf_path: Path to the URDF file.
+    Returns:
+        The position and orientation (quaternion) of the inertial frame in the root link frame.
+    """
+    robot, root_link = load_urdf_tree(urdf_path)
+    origin = robot.find(f"link[@name='{root_link}']/inertial/origin")
+    if origin is None:
+        return (0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0)
+    position = [float(v) for v in origin.get("xyz", "0 0 0").split()]
+    rpy = [float(v) for v in origin.get("rpy", "0 0 0").split()]
+    return tuple(position), p.getQuaternionFromEuler(rpy)
+
+
+def merge_base_arm_urdf(
+    base_urdf_path,
+    arm_urdf_path,
+    mount_position,
+    mount_orientation,
+    cache_dir=URDF_CACHE_DIR,
+):
+    """
+    Generates a URDF of the arm with the base attached by a fixed joint.
+
+    The arm root link stays the root of the merged model and the base links come after
+    all arm links, so the arm joint and link indices are the same as in the arm URDF.
+    The base joints are made fixed, the base is moved as a whole and adds no controllable joints.
+    Args:
+        base_urdf_path: Path to the base URDF file.
+        arm_urdf_path: Path to the arm URDF file.
+        mount_position: Position of the base root link frame in the arm root link frame.
+        mount_orientation: Orientation (quaternion) of the base root link frame in the arm root link frame.
+        cache_dir: Directory the merged URDF is written to.
+    Returns:
+        The path of the merged URDF file.
+    """
+    key = hashlib.sha1()
+    for path in (base_urdf_path, arm_urdf_path):
+        with open(path, "rb") as f:
+            key.update(os.path.abspath(path).encode("utf-8") + f.read())
+    key.update(
+        repr([round(v, 9) for v in (*mount_position, *mount_orientation)]).encode()
+    )
+    merged_path = os.path.join(cache_dir, key.hexdigest() + ".urdf")
+    if os.path.exists(merged_path):
+        return merged_path
+
+    arm, arm_root = load_urdf_tree(arm_urdf_path)
+    base, base_root = load_urdf_tree(base_urdf_path)
+
+    # rename the base elements, then append them after the arm elements
+    elements = [e for e in base if e.tag in ("link", "joint", "material")]
+    for element in elements:
+        for child in element.iter():
+            if child.tag in ("link", "joint", "material") and child.get("name"):
+                child.set("name", MERGED_BASE_PREFIX + child.get("name"))
+            if child.tag in ("parent", "child") and child.get("link"):
+                child.set("link", MERGED_BASE_PREFIX + child.get("link"))
+        if element.tag == "joint":
+            element.set("type", "fixed")
+        arm.append(copy.deepcopy(element))
+
+    mount = ET.SubElement(
+        arm, "joint", name=MERGED_BASE_PREFIX + "mount_joint", type="fixed"
+    )
+    ET.SubElement(
+        mount,
+        "origin",
+        xyz=" ".join(str(float(v)) for v in mount_position),
+        rpy=" ".join(str(v) for v in p.getEulerFromQuaternion(mount_orientation)),
+    )
+    ET.SubElement(mount, "parent", link=arm_root)
+    ET.SubElement(mount, "child", link=MERGED_BASE_PREFIX + base_root)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = merged_path + ".tmp"
+    ET.ElementTree(arm).write(tmp_path, encoding="utf-8", xml_declaration=True)
+    os.replace(tmp_path, merged_path)
+    return merged_path
@@ -1,3 +1,4 @@
+from .occupancy_grid import OccupancyGridMapper
 from .slam import simple_slam
 
-__all__ = ["simple_slam"]
+__all__ = ["simple_slam", "OccupancyGridMapper"]
@@ -0,0 +1,354 @@
+# !/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+# @FileName       : occupancy_grid.py
+# @Description:   : Occupancy grid mapping from simulated planar laser scans
+"""
+
+import math
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pybullet as p
+
+from Motion_Planning.Navigation import Costmap
+
+
+def probability_to_log_odds(probability):
+    """
+    Converts an occupancy probability to log-odds.
+
+    Args:
+        probability (float): The probability in (0, 1).
+
+    Returns:
+        float: The log-odds of the probability.
+    """
+    return math.log(probability / (1 - probability))
+
+
+class OccupancyGridMapper:
+    """
+    Builds a 2D log-odds occupancy grid from planar laser scans fired from the robot base.
+
+    Every scan casts rays in a few horizontal layers spanning the base height band, so only
+    obstacles the base can bump into are mapped: objects above the base (table tops, cabinet
+    doors) and below it (floor mats) are not. The grid grows when scans reach past its border.
+    """
+
+    def __init__(
+        self,
+        client,
+        robot,
+        resolution=0.05,
+        bounds=None,
+        num_rays=360,
+        max_range=5.0,
+        num_layers=3,
+        height_band=None,
+        floor_clearance=0.05,
+        hit_probability=0.7,
+        miss_probability=0.4,
+        occupied_probability=0.65,
+        log_odds_limit=5.0,
+    ):
+        """
+        Initializes the mapper with an unknown map.
+
+        Args:
+            client (Client): The pybullet client object.
+            robot (Bestman_sim): The robot whose base fires the scans.
+            resolution (float, optional): The size of a grid cell in meters. Defaults to 0.05.
+            bounds (list, optional): The initial map region [x_min, y_min, x_max, y_max]. Defaults to
+                max_range around the robot.
+            num_rays (int, optional): Number of rays per layer over 360 degrees. Defaults to 360.
+            max_range (float, optional): The range of the rays in meters, measured from the base center. Defaults to 5.0.
+            num_layers (int, optional): Number of scan heights in the height band. Defaults to 3.
+            height_band (list, optional): The heights [z_min, z_max] scanned. Defaults to the height of
+                the base links, without floor_clearance at the bottom.
+            floor_clearance (float, optional): Height above the bottom of the base that is not scanned,
+                so the floor and flat objects on it are not mapped. Defaults to 0.05.
+            hit_probability (float, optional): Occupancy probability of a cell where a ray stops. Defaults to 0.7.
+            miss_probability (float, optional): Occupancy probability of a cell a ray passes through. Defaults to 0.4.
+            occupied_probability (float, optional): Cells above this probability are obstacles. Defaults to 0.65.
+            log_odds_limit (float, optional): Bound on the log-odds of a cell, so that the map can still
+                change when objects move. Defaults to 5.0.
+        """
+        self.client = client
+        self.client_id = client.get_client_id()
+        self.robot = robot
+        self.resolution = resolution
+        self.max_range = max_range
+        self.log_odds_hit = probability_to_log_odds(hit_probability)
+        self.log_odds_miss = probability_to_log_odds(miss_probability)
+        self.log_odds_occupied = probability_to_log_odds(occupied_probability)
+        self.log_odds_limit = log_odds_limit
+        self.robot_ids = {robot.sim_get_base_id(), robot.sim_get_arm_id()}
+
+        # base link AABBs, for the height band and for where the rays start
+        base_aabbs = np.array(
+            [
+                np.concatenate(
+                    p.getAABB(
+                        robot.sim_get_base_id(), link, physicsClientId=self.client_id
+                    )
+                )
+                for link in robot.sim_get_base_links()
+            ]
+        )
+        if height_band is None:
+            height_band = [
+                base_aabbs[:, 2].min() + floor_clearance,
+                base_aabbs[:, 5].max(),
+            ]
+        self.heights = np.linspace(height_band[0], height_band[1], num_layers)
+
+        # unit ray directions, one per ray
+        angles = np.linspace(0.0, 2 * math.pi, num_rays, endpoint=False)
+        self.directions = np.column_stack([np.cos(angles), np.sin(angles)])
+
+        # rays start outside the robot footprint, or the first thing they hit is the robot itself
+        robot_aabbs = np.array(
+            [
+                self.client.get_bounding_box(robot_id)
+                for robot_id in sorted(self.robot_ids)
+            ]
+        )
+        x_min, y_min = robot_aabbs[:, :2].min(axis=0)
+        x_max, y_max = robot_aabbs[:, 3:5].max(axis=0)
+        corners = np.array(
+            [[x_min, y_min], [x_min, y_max], [x_max, y_min], [x_max, y_max]]
+        )
+        position, _ = robot.sim_get_base_position_and_orientation()
+        self.ray_start = np.hypot(*(corners - position[:2]).T).max() + resolution
+
+        if bounds is None:
+            bounds = [
+                position[0] - max_range,
+                position[1] - max_range,
+                position[0] + max_range,
+                position[1] + max_range,
+            ]
+        self.origin = np.asarray(bounds[:2], dtype=float)
+        shape = (
+            np.ceil((np.asarray(bounds[2:]) - self.origin) / resolution).astype(int) + 1
+        )
+        self.log_odds = np.zeros(shape, dtype=np.float32)
+
+        # the costmap is rebuilt only when the map changed since it was built
+        self.version = 0
+        self.costmap = None
+        self.costmap_version = -1
+        self.costmap_unknown_as_obstacle = False
+
+    def to_grid(self, points):
+        """
+        Converts world coordinates to grid cells, with the same convention as Costmap.
+
+        Args:
+            points (np.ndarray): Points (..., 2) in world coordinates.
+
+        Returns:
+            np.ndarray: Cells (..., 2) as integer indices, which may lie outside the grid.
+        """
+        return np.round(
+            (np.asarray(points, dtype=float) - self.origin) / self.resolution
+        ).astype(int)
+
+    def get_bounds(self):
+        """
+        Gets the region covered by the grid.
+
+        Returns:
+            list: The map region [x_min, y_min, x_max, y_max], from the first to the last cell center.
+        """
+        upper = self.origin + (np.array(self.log_odds.shape) - 1) * self.resolution
+        return [*self.origin, *upper]
+
+    def extend(self, points):
+        """
+        Grows the grid so that it contains points, with max_range of unknown border added.
+
+        Args:
+            points (np.ndarray): Points (N, 2) in world coordinates.
+        """
+        cells = self.to_grid(points)
+        border = int(math.ceil(self.max_range / self.resolution))
+        pad_lower = np.maximum(0, -cells.min(axis=0))
+        pad_upper = np.maximum(
+            0, cells.max(axis=0) - (np.array(self.log_odds.shape) - 1)
+        )
+        if not pad_lower.any() and not pad_upper.any():
+            return
+        pad_lower = np.where(pad_lower > 0, pad_lower + border, 0)
+        pad_upper = np.where(pad_upper > 0, pad_upper + border, 0)
+        self.log_odds = np.pad(self.log_odds, list(zip(pad_lower, pad_upper)))
+        self.origin = self.origin - pad_lower * self.resolution
+        self.version += 1
+
+    def scan(self):
+        """
+        Fires one planar scan from the current base pose.
+
+        All layers are cast in a single rayTestBatch call. For every direction the nearest hit
+        over the layers is kept, like a laser scan of a 3D sensor projected to the floor.
+
+        Returns:
+            tuple: The scan origin [x, y], the ray ranges (num_rays,) in meters from the origin, and a
+                boolean array (num_rays,) which is True for rays that hit an obstacle. Rays blocked by
+                the robot in every layer get a range of nan.
+        """
+        position, _ = self.robot.sim_get_base_position_and_orientation()
+        center = np.asarray(position[:2])
+        n_ray, n_layer = len(self.directions), len(self.heights)
+
+        # ray endpoints (n_layer, n_ray, 3)
+        starts = np.empty((n_layer, n_ray, 3))
+        ends = np.empty((n_layer, n_ray, 3))
+        starts[..., :2] = center + self.directions * self.ray_start
+        ends[..., :2] = center + self.directions * self.max_range
+        starts[..., 2] = ends[..., 2] = self.heights[:, None]
+
+        results = []
+        starts, ends = starts.reshape(-1, 3), ends.reshape(-1, 3)
+        for begin in range(0, len(starts), p.MAX_RAY_INTERSECTION_BATCH_SIZE):
+            end = begin + p.MAX_RAY_INTERSECTION_BATCH_SIZE
+            results.extend(
+                p.rayTestBatch(
+                    starts[begin:end].tolist(),
+                    ends[begin:end].tolist(),
+                    numThreads=0,
+                    physicsClientId=self.client_id,
+                )
+            )
+        hit_ids = np.array([result[0] for result in results]).reshape(n_layer, n_ray)
+        fractions = np.array([result[2] for result in results]).reshape(n_layer, n_ray)
+
+        # rays that hit the robot measure nothing, the others are a hit or a free ray
+        ranges = self.ray_start + fractions * (self.max_range - self.ray_start)
+        ranges[np.isin(hit_ids, list(self.robot_ids))] = np.nan
+        ranges[hit_ids == -1] = np.inf
+        with np.errstate(all="ignore"):
+            nearest = np.fmin.reduce(ranges, axis=0)
+        hits = np.isfinite(nearest)
+        nearest[np.isinf(nearest)] = self.max_range
+        return center, nearest, hits
+
+    def integrate(self, center, ranges, hits):
+        """
+        Fuses a scan into the grid: cells along the rays become more likely free, cells at the
+        hits more likely occupied. Each cell is updated at most once per scan.
+
+        Args:
+            center (np.ndarray): The scan origin [x, y].
+            ranges (np.ndarray): The ray ranges (num_rays,) in meters, nan for rays not measured.
+            hits (np.ndarray): Boolean array (num_rays,) which is True for rays that hit an obstacle.
+        """
+        valid = ~np.isnan(ranges)
+        directions, ranges, hits = self.directions[valid], ranges[valid], hits[valid]
+        hit_points = center + directions * ranges[:, None]
+        self.extend(np.vstack([center, hit_points]))
+
+        # sample every ray from the center up to the last cell before its hit
+        n_steps = np.floor(ranges / self.resolution).astype(int)
+        seg_id = np.repeat(np.arange(len(ranges)), n_steps)
+        offsets = np.concatenate([[0], np.cumsum(n_steps)[:-1]])
+        distances = (np.arange(len(seg_id)) - offsets[seg_id]) * self.resolution
+        free_points = center + directions[seg_id] * distances[:, None]
+
+        shape = self.log_odds.shape
+        free = np.unique(np.ravel_multi_index(self.to_grid(free_points).T, shape))
+        occupied = np.unique(
+            np.ravel_multi_index(self.to_grid(hit_points[hits]).T, shape)
+        )
+        free = np.setdiff1d(free, occupied, assume_unique=True)
+
+        log_odds = self.log_odds.reshape(-1)
+        log_odds[free] += self.log_odds_miss
+        log_odds[occupied] += self.log_odds_hit
+        np.clip(log_odds, -self.log_odds_limit, self.log_odds_limit, out=log_odds)
+        self.version += 1
+
+    def update(self):
+        """
+        Scans from the current base pose and fuses the scan into the grid.
+        Call it whenever the robot has moved or the scene has changed.
+
+        Returns:
+            OccupancyGridMapper: The mapper itself.
+        """
+        self.integrate(*self.scan())
+        return self
+
+    def get_occupancy(self, unknown_as_obstacle=False):
+        """
+        Gets the obstacle grid.
+
+        Args:
+            unknown_as_obstacle (bool, optional): If True, cells never observed are obstacles. Defaults to False.
+
+        Returns:
+            np.ndarray: Grid (W, H) of uint8 which is 1 at obstacle cells, in Costmap layout.
+        """
+        occupancy = self.log_odds > self.log_odds_occupied
+        if unknown_as_obstacle:
+            occupancy |= self.log_odds == 0
+        return occupancy.astype(np.uint8)
+
+    def get_costmap(self, robot_size=None, unknown_as_obstacle=False):
+        """
+        Gets the costmap of the current map, to pass to the navigation planners.
+        The costmap is only rebuilt when the map changed since the last call.
+
+        Args:
+            robot_size (float, optional): The size of the robot. Defaults to the size of the mapping robot.
+            unknown_as_obstacle (bool, optional): If True, cells never observed are obstacles. Defaults to False.
+
+        Returns:
+            Costmap: The costmap of the occupancy grid.
+        """
+        if robot_size is None:
+            robot_size = self.robot.sim_get_robot_size()
+        if (
+            self.costmap is None
+            or self.costmap_version != self.version
+            or self.costmap.robot_size != robot_size
+            or self.costmap_unknown_as_obstacle != unknown_as_obstacle
+        ):
+            self.costmap = Costmap(
+                [],
+                robot_size,
+                self.resolution,
+                self.get_bounds(),
+                occupancy=self.get_occupancy(unknown_as_obstacle),
+            )
+            self.costmap_version = self.version
+            self.costmap_unknown_as_obstacle = unknown_as_obstacle
+        return self.costmap
+
+    def visual(self):
+        """Visualization of the occupancy probability of the grid."""
+
+        # clear current figure
+        plt.clf()
+
+        x_min, y_min, x_max, y_max = self.get_bounds()
+        plt.imshow(
+            1 / (1 + np.exp(-self.log_odds.T)),
+            origin="lower",
+            cmap="gray_r",
+            vmin=0.0,
+            vmax=1.0,
+            extent=[
+                x_min - self.resolution / 2,
+                x_max + self.resolution / 2,
+                y_min - self.resolution / 2,
+                y_max + self.resolution / 2,
+            ],
+        )
+        position, _ = self.robot.sim_get_base_position_and_orientation()
+        plt.plot(position[0], position[1], "og")
+        plt.axis("equal")
+        plt.title("SLAM Visualization")
+        plt.pause(0.01)
+        plt.show()
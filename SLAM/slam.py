@@ -9,40 +9,127 @@
 """
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pybullet as p
 
 from .utils import *
 
+# link AABBs of each body, keyed by (client id, body id), with the body state they were computed at
+body_aabbs_cache = {}
 
-def simple_slam(client, robot, enable_plot=False):
+
+def get_body_state(body, client_id):
+    """
+    Gets the state of a body that its link AABBs depend on: its name, base pose and joint positions.
+
+    Args:
+        body (int): The body ID.
+        client_id (int): The pybullet client id.
+
+    Returns:
+        tuple: The body state, equal for two calls exactly when the body did not move.
+    """
+    num_joints = p.getNumJoints(body, physicsClientId=client_id)
+    joint_positions = (
+        tuple(
+            state[0]
+            for state in p.getJointStates(
+                body, range(num_joints), physicsClientId=client_id
+            )
+        )
+        if num_joints > 0
+        else ()
+    )
+    position, orientation = p.getBasePositionAndOrientation(
+        body, physicsClientId=client_id
+    )
+    return (
+        p.getBodyInfo(body, physicsClientId=client_id),
+        position,
+        orientation,
+        joint_positions,
+    )
+
+
+def get_robot_height_band(client, robot, floor_clearance=0.05):
+    """
+    Gets the heights the robot occupies, the only heights where obstacles block it.
+
+    Args:
+        client (Client): The pybullet client object.
+        robot (Bestman_sim): The robot object.
+        floor_clearance (float, optional): Height above the bottom of the robot treated as floor. Defaults to 0.05.
+
+    Returns:
+        tuple: The heights (z_min, z_max) of the band.
+    """
+    aabbs = np.array(
+        [
+            client.get_bounding_box(robot_id)
+            for robot_id in {robot.sim_get_base_id(), robot.sim_get_arm_id()}
+        ]
+    )
+    return aabbs[:, 2].min() + floor_clearance, aabbs[:, 5].max()
+
+
+def simple_slam(
+    client, robot, enable_plot=False, height_band=None, floor_clearance=0.05
+):
     """
     Perform a simple SLAM (Simultaneous Localization and Mapping) operation.
 
+    Every link AABB of every body is projected to the floor, if it overlaps the robot height band:
+    links the robot passes under or over are dropped. The rectangles are then merged into a small
+    set of disjoint rectangles.
+
+    Link AABBs are cached per body and only recomputed for the bodies whose pose or joint positions
+    changed since the last call, so mapping again after e.g. opening a door is cheap.
+
     Args:
         client (pybullet): The pybullet client object.
         robot (object): The robot object.
         enable_plot (bool, optional): Flag to enable or disable plotting of the SLAM visualization. Defaults to False.
+        height_band (list, optional): The heights [z_min, z_max] where obstacles block the robot.
+            Defaults to the height of the robot, without floor_clearance at the bottom.
+        floor_clearance (float, optional): Height above the bottom of the robot treated as floor. Defaults to 0.05.
 
     Returns:
         list: A list of obstacle bounds in the format [x_min, y_min, x_max, y_max].
     """
-    nav_obstacles_bounds = []
-    nav_obstacle_ids = list(range(p.getNumBodies()))
+    client_id = client.get_client_id()
+    if height_band is None:
+        height_band = get_robot_height_band(client, robot, floor_clearance)
+    z_min, z_max = height_band
+
+    nav_obstacle_ids = list(range(p.getNumBodies(physicsClientId=client_id)))
     nav_obstacle_ids.remove(0)  # remove plane
-    nav_obstacle_ids.remove(robot.sim_get_base_id())  # remove base
-    nav_obstacle_ids.remove(robot.sim_get_arm_id())  # remove arm
+    for robot_id in {robot.sim_get_base_id(), robot.sim_get_arm_id()}:
+        nav_obstacle_ids.remove(robot_id)  # remove base and arm, one body if merged
 
+    # forget removed bodies
+    for key in list(body_aabbs_cache):
+        if key[0] == client_id and key[1] not in nav_obstacle_ids:
+            del body_aabbs_cache[key]
+
+    link_aabbs = []
     for object_id in nav_obstacle_ids:
-        object_link_bounds = client.get_all_link_bounding_box(object_id)
-        for link_bounds in object_link_bounds:
-            nav_obstacles_bounds.append(
+        state = get_body_state(object_id, client_id)
+        cached = body_aabbs_cache.get((client_id, object_id))
+        if cached is None or cached[0] != state:
+            aabbs = np.array(
                 [
-                    link_bounds[0][0],
-                    link_bounds[0][1],
-                    link_bounds[1][0],
-                    link_bounds[1][1],
+                    [*link_bounds[0], *link_bounds[1]]
+                    for link_bounds in client.get_all_link_bounding_box(object_id)
                 ]
-            )
+            ).reshape(-1, 6)
+            cached = (state, aabbs)
+            body_aabbs_cache[(client_id, object_id)] = cached
+        link_aabbs.append(cached[1])
+    link_aabbs = np.concatenate(link_aabbs) if link_aabbs else np.empty((0, 6))
+
+    # keep the links overlapping the height band
+    in_band = (link_aabbs[:, 2] <= z_max) & (link_aabbs[:, 5] >= z_min)
+    nav_obstacles_bounds = merge_rectangles(link_aabbs[in_band][:, [0, 1, 3, 4]])
 
     if enable_plot:
         plt.clf()
@@ -48,3 +48,66 @@ def plot_rectangle(x_min, y_min, x_max, y_max):
         (x_min, y_min), width, height, edgecolor="black", facecolor="black"
     )
     plt.gca().add_patch(rect)
+
+
+def merge_rectangles(rectangles, decimals=6):
+    """
+    Merges overlapping or adjacent rectangles whose union is itself a rectangle.
+
+    Rectangles inside another one are dropped, and rectangles with the same y extent (or x extent)
+    whose x (or y) intervals overlap or touch are joined, until nothing changes. Every step removes
+    a rectangle, so the result never has more rectangles than the deduplicated input.
+
+    Args:
+        rectangles (list): Rectangles [x_min, y_min, x_max, y_max].
+        decimals (int, optional): Edges are rounded to this many decimals, so edges equal up to float
+            noise touch. Defaults to 6.
+
+    Returns:
+        list: Rectangles [x_min, y_min, x_max, y_max] whose union is the union of the input.
+    """
+    rectangles = np.round(np.asarray(rectangles, dtype=float).reshape(-1, 4), decimals)
+    rectangles = rectangles[
+        (rectangles[:, 2] > rectangles[:, 0]) & (rectangles[:, 3] > rectangles[:, 1])
+    ]
+    merged = np.unique(rectangles, axis=0).tolist()
+
+    def join(rectangles, axis):
+        # rectangles with the same extent across axis, sorted along axis
+        groups = {}
+        for rectangle in sorted(rectangles, key=lambda r: r[axis]):
+            groups.setdefault((rectangle[1 - axis], rectangle[3 - axis]), []).append(
+                rectangle
+            )
+        joined = []
+        for group in groups.values():
+            current = list(group[0])
+            for rectangle in group[1:]:
+                if rectangle[axis] <= current[axis + 2]:
+                    current[axis + 2] = max(current[axis + 2], rectangle[axis + 2])
+                else:
+                    joined.append(current)
+                    current = list(rectangle)
+            joined.append(current)
+        return joined
+
+    n_merged = None
+    while n_merged != len(merged):
+        n_merged = len(merged)
+
+        # drop the rectangles contained in another one, the largest are kept first
+        kept = []
+        for rectangle in sorted(
+            merged, key=lambda r: (r[2] - r[0]) * (r[3] - r[1]), reverse=True
+        ):
+            if not any(
+                k[0] <= rectangle[0]
+                and k[1] <= rectangle[1]
+                and rectangle[2] <= k[2]
+                and rectangle[3] <= k[3]
+                for k in kept
+            ):
+                kept.append(rectangle)
+
+        merged = join(join(kept, 0), 1)
+    return [[float(v) for v in rectangle] for rectangle in merged]
@@ -27,17 +27,22 @@ class Camera:
     This class handles the camera functionalities for a robotic system, including capturing RGB and depth images.
     """
 
-    def __init__(self, cfg, base_id, arm_place_height):
+    def __init__(self, cfg, client, base_id, arm_place_height, base_link=-1):
         """
         Initializes the Camera class with configuration, base ID, and arm height.
+        Nothing is rendered until an image is requested.
 
         Args:
             cfg (object): Configuration settings for the camera.
+            client (Client): The pybullet client object, a rendered frame is reused until it steps the simulation.
             base_id (int): The base ID of the robot.
             arm_height (float): The height of the robot arm.
+            base_link (int, optional): The base link index, when the base is a link of a merged robot body. Defaults to -1.
         """
         self.base_id = base_id
+        self.base_link = base_link
         self.arm_place_height = arm_place_height
+        self.client = client
 
         # projection setting
         self.fov = cfg.fov  # fov
@@ -49,8 +54,24 @@ class Camera:
         # for grasp pose
         self.head_tilt = cfg.head_tilt
 
-        # camera rgb and depth image
-        self.sim_update()
+        # A projection matrix based on the field of view (FOV) to simulate the camera's perspective
+        self.proj_mat = p.computeProjectionMatrixFOV(
+            fov=self.fov,  # Camera's sight angle
+            aspect=self.width / self.height,  # Aspect ratio of the image
+            nearVal=self.nearVal,  # Camera viewing distance min
+            farVal=self.farVal,  # Camera viewing distance max
+        )
+        self.sim_update_view()
+
+        # last rendered frame, with the view and simulation step it was rendered at
+        self.frame_key = None
+        self.frame_flags = None
+        self.frame = {}
+        self.buffers = {}  # preallocated image buffers, reused by every frame
+
+        # per-pixel ray directions (x / z, y / z), kept until the intrinsics change
+        self.ray_directions = None
+        self.ray_directions_key = None
 
         # camera intrinsic parameters
         self.sim_get_focal_length()
@@ -76,20 +97,23 @@ class Camera:
         """
         get camera pose
         """
+        self.sim_update_view()
         view_mat = np.array(self.trans_camera_to_world).reshape([4, 4], order="F")
         pose = Pose(view_mat[:3, -1], view_mat[:3, :3])
         return pose
 
-    def sim_update(self):
+    def sim_update_view(self):
         """
-        Updates the camera view and projection matrices, captures images, and returns the captured data.
-
-        Returns:
-            tuple: Width, height, RGB image, depth image, and segmentation mask.
+        Updates the camera view matrix from the current base pose, without rendering.
         """
 
         # get base pose
-        position, orientation = p.getBasePositionAndOrientation(self.base_id)
+        if self.base_link == -1:
+            position, orientation = p.getBasePositionAndOrientation(self.base_id)
+        else:
+            position, orientation = p.getLinkState(
+                self.base_id, self.base_link, computeForwardKinematics=True
+            )[:2]
         camera_position = np.array(
             [position[0] + 0.5, position[1], self.arm_place_height + 0.3]
         )
@@ -108,35 +132,180 @@ class Camera:
             np.array(self.view_mat).reshape([4, 4], order="F")
         )
 
-        # A projection matrix based on the field of view (FOV) to simulate the camera's perspective
-        self.proj_mat = p.computeProjectionMatrixFOV(
-            fov=self.fov,  # Camera's sight angle
-            aspect=self.width / self.height,  # Aspect ratio of the image
-            nearVal=self.nearVal,  # Camera viewing distance min
-            farVal=self.farVal,  # Camera viewing distance max
-        )
+    def sim_update(self, flags=p.ER_NO_SEGMENTATION_MASK, force=False):
+        """
+        Renders a frame from the current camera pose, unless the last frame is still valid:
+        rendered at the same view and simulation step, with the requested buffers.
+
+        The buffers are converted to images only when they are read, so e.g. depth-only
+        callers do not pay for the RGB image.
+
+        Args:
+            flags (int, optional): pybullet getCameraImage flags. The default skips the segmentation
+                mask, pass 0 or p.ER_SEGMENTATION_MASK_OBJECT_AND_LINKINDEX to render it.
+                Defaults to p.ER_NO_SEGMENTATION_MASK.
+            force (bool, optional): Render even if the last frame is still valid, e.g. after
+                objects were moved without stepping the simulation. Defaults to False.
+
+        Returns:
+            bool: True if a new frame was rendered.
+        """
+        self.sim_update_view()
+        frame_key = (tuple(self.view_mat), self.client.step_count)
+        needs_segmentation = not flags & p.ER_NO_SEGMENTATION_MASK
+        if (
+            not force
+            and frame_key == self.frame_key
+            and (not needs_segmentation or flags == self.frame_flags)
+        ):
+            return False
 
         # width, height, rgb, image, seg
-        w, h, rgb, depth, _ = p.getCameraImage(
+        w, h, rgb, depth, seg = p.getCameraImage(
             width=self.width,
             height=self.height,
             viewMatrix=self.view_mat,
             projectionMatrix=self.proj_mat,
+            flags=flags,
         )
+        self.frame_key = frame_key
+        self.frame_flags = flags
+
+        # views of pybullet's buffers when it returns NumPy arrays, a single conversion otherwise
+        self.frame = {
+            "rgb": np.asarray(rgb, dtype=np.uint8).reshape(h, w, 4),
+            "depth": np.asarray(depth, dtype=np.float32).reshape(h, w),
+            "segmentation": seg if needs_segmentation else None,
+        }
+        return True
+
+    def get_buffer(self, name, shape, dtype):
+        """
+        Gets a preallocated image buffer, reused by every frame of the same size.
 
-        # make sure the array has the correct shape
-        rgb = np.array(rgb, dtype=np.uint8).reshape(h, w, 4)[:, :, :3]
-        depth = np.array(depth).reshape(h, w)
+        Args:
+            name (str): The buffer name.
+            shape (tuple): The buffer shape.
+            dtype (type): The buffer data type.
 
-        self.image = Image.fromarray(rgb)
-        self.colors = np.array(rgb)  # BGR to RGB
+        Returns:
+            np.ndarray: The buffer, with undefined content.
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer
+
+    @property
+    def colors(self):
+        """
+        np.ndarray: The RGB image (H, W, 3) of the current frame, rendered if needed.
+        The array is overwritten by the next frame, copy it to keep it.
+        Frames are cached per simulation step, after teleporting bodies with reset* calls
+        without stepping, call sim_update(force=True) first or the frame is stale.
+        """
+        self.sim_update()
+        if "colors" not in self.frame:
+            rgb = self.frame["rgb"]
+            colors = self.get_buffer("colors", rgb.shape[:2] + (3,), np.uint8)
+            np.copyto(colors, rgb[:, :, :3])
+            self.frame["colors"] = colors
+        return self.frame["colors"]
+
+    @property
+    def image(self):
+        """PIL.Image: The RGB image of the current frame, rendered if needed."""
+        colors = self.colors
+        if "image" not in self.frame:
+            self.frame["image"] = Image.fromarray(colors)
+        return self.frame["image"]
+
+    @property
+    def depths(self):
+        """
+        np.ndarray: The float32 depth image (H, W) in meters of the current frame, rendered if needed.
+        The array is overwritten by the next frame, copy it to keep it.
+        Frames are cached per simulation step, after teleporting bodies with reset* calls
+        without stepping, call sim_update(force=True) first or the frame is stale.
+        """
+        self.sim_update()
+        if "depths" not in self.frame:
+            depth = self.frame["depth"]
+            depths = self.get_buffer("depths", depth.shape, np.float32)
+
+            # pybullet return normalized depth values, convert ​​to actual depth values, unit：m
+            # far * near / (far - (far - near) * depth), computed in place
+            np.multiply(depth, self.farVal - self.nearVal, out=depths)
+            np.subtract(self.farVal, depths, out=depths)
+            np.divide(self.farVal * self.nearVal, depths, out=depths)
+            self.frame["depths"] = depths
+        return self.frame["depths"]
+
+    def sim_get_segmentation_mask(self):
+        """
+        Gets the ground-truth segmentation of the current frame, rendered with the mask if needed.
 
-        # pybullet return normalized depth values, convert ​​to actual depth values, unit：m
-        self.depths = (
-            self.farVal
-            * self.nearVal
-            / (self.farVal - (self.farVal - self.nearVal) * depth)
-        )
+        Returns:
+            tuple: The body IDs (H, W) and the link indices (H, W) seen at every pixel, as int32
+                arrays. Background pixels have body ID -1, base links have link index -1.
+        """
+        self.sim_update(flags=p.ER_SEGMENTATION_MASK_OBJECT_AND_LINKINDEX)
+        if "body_ids" not in self.frame:
+            # pybullet encodes a pixel as body + ((link + 1) << 24), and -1 for the background
+            segmentation = np.asarray(
+                self.frame["segmentation"], dtype=np.int32
+            ).reshape(self.height, self.width)
+            background = segmentation < 0
+            body_ids = segmentation & ((1 << 24) - 1)
+            link_ids = (segmentation >> 24) - 1
+            body_ids[background] = -1
+            link_ids[background] = -1
+            self.frame["body_ids"] = body_ids
+            self.frame["link_ids"] = link_ids
+        return self.frame["body_ids"], self.frame["link_ids"]
+
+    def sim_get_object_point_cloud(self, object, link=None):
+        """
+        Gets the world-frame points of an object seen by the camera, from the ground-truth segmentation.
+
+        Args:
+            object (int / str): The ID or name of the object.
+            link (int, optional): If given, only the points of this link of the object. Defaults to None.
+
+        Returns:
+            tuple: The points (N, 3) in the world frame and their colors (N, 3) in [0, 1], as float32,
+                and the bounding box [min_x, min_y, min_z, max_x, max_y, max_z] of the points, None if
+                the object is not visible.
+        """
+        object_id = self.client.resolve_object_id(object)
+        body_ids, link_ids = self.sim_get_segmentation_mask()
+        mask = body_ids == object_id
+        if link is not None:
+            mask &= link_ids == link
+        depths, colors = self.depths, self.colors
+        mask &= depths < self.farVal
+        if not mask.any():
+            return (
+                np.empty((0, 3), dtype=np.float32),
+                np.empty((0, 3), dtype=np.float32),
+                None,
+            )
+
+        # OpenGL camera frame: x right, y up, the camera looks along -z
+        points_z = depths[mask]
+        ray_directions = self.sim_get_ray_directions(depths.shape)[mask]
+        points = np.empty((len(points_z), 3), dtype=np.float32)
+        np.multiply(ray_directions, points_z[:, None], out=points[:, :2])
+        points[:, 1] *= -1
+        points[:, 2] = -points_z
+
+        # to the world frame
+        rotation = self.trans_camera_to_world[:3, :3].astype(np.float32)
+        translation = self.trans_camera_to_world[:3, 3].astype(np.float32)
+        points = points @ rotation.T + translation
+        bounding_box = [*points.min(axis=0), *points.max(axis=0)]
+        return points, colors[mask].astype(np.float32) / 255.0, bounding_box
 
     def sim_get_rgb_image(self, enable_show=False, enable_save=False, filename=None):
         """
@@ -264,17 +433,37 @@ class Camera:
         Returns:
             np.ndarray: 3D point cloud.
         """
-        xmap, ymap = np.arange(self.depths.shape[1]), np.arange(self.depths.shape[0])
-        xmap, ymap = np.meshgrid(xmap, ymap)
-        points_z = self.depths
-        points_x = (xmap - self.cx) / self.fx * points_z
-        points_y = (ymap - self.cy) / self.fy * points_z
-        mask = (points_z > self.min_depth) & (points_z < self.max_depth)
-        points = np.stack([points_x, -points_y, points_z], axis=-1)
-        points = points[mask].astype(np.float32)
-        colors = (self.colors / 255.0)[mask].astype(np.float32)
+        depths, colors = self.depths, self.colors
+        ray_directions = self.sim_get_ray_directions(depths.shape)
+        mask = (depths > self.min_depth) & (depths < self.max_depth)
+        points_z = depths[mask]
+        points = np.empty((len(points_z), 3), dtype=np.float32)
+        np.multiply(ray_directions[mask], points_z[:, None], out=points[:, :2])
+        points[:, 1] *= -1
+        points[:, 2] = points_z
+        colors = colors[mask].astype(np.float32) / 255.0
         return points, colors
 
+    def sim_get_ray_directions(self, shape):
+        """
+        Gets the direction (x / z, y / z) of the ray through every pixel, cached until the intrinsics change.
+
+        Args:
+            shape (tuple): The image shape (H, W).
+
+        Returns:
+            np.ndarray: float32 ray directions (H, W, 2).
+        """
+        key = (shape, self.fx, self.fy, self.cx, self.cy)
+        if self.ray_directions_key != key:
+            xmap = (np.arange(shape[1], dtype=np.float32) - self.cx) / self.fx
+            ymap = (np.arange(shape[0], dtype=np.float32) - self.cy) / self.fy
+            self.ray_directions = np.empty(shape + (2,), dtype=np.float32)
+            self.ray_directions[..., 0] = xmap[None, :]
+            self.ray_directions[..., 1] = ymap[:, None]
+            self.ray_directions_key = key
+        return self.ray_directions
+
     def sim_trans_to_world(self, pose):
         """
         Convert grasp pose from camera to world coord system
@@ -8,20 +8,72 @@
 # @Description:   : A recorder in pybullet sim and the result can be import into blender scene
 """
 
+import json
 import os
+import queue
+import threading
 
 # import PySimpleGUI as sg
-import pickle
 from os.path import abspath, basename, dirname, splitext
 
 import numpy as np
-import pandas as pd
 import pybullet as p
 from transforms3d.affines import decompose
 from transforms3d.quaternions import mat2quat
 from urdfpy import URDF
 
 
+def _to_builtin(value):
+    """
+    Converts numpy values nested in recorder metadata into JSON serializable types.
+
+    Args:
+        value: A metadata value (number, string, list or numpy array).
+
+    Returns:
+        The value with numpy arrays and scalars replaced by python lists and numbers.
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    return value
+
+
+def _quat_multiply(q1, q2):
+    """
+    Batched quaternion product q1 * q2.
+
+    Args:
+        q1 (np.ndarray): Quaternions of shape (N, 4) in pybullet order [x, y, z, w].
+        q2 (np.ndarray): Quaternions of shape (N, 4) in pybullet order [x, y, z, w].
+
+    Returns:
+        np.ndarray: The products, shape (N, 4).
+    """
+    v1, w1 = q1[:, :3], q1[:, 3:]
+    v2, w2 = q2[:, :3], q2[:, 3:]
+    xyz = w1 * v2 + w2 * v1 + np.cross(v1, v2)
+    w = w1 * w2 - np.sum(v1 * v2, axis=1, keepdims=True)
+    return np.concatenate([xyz, w], axis=1)
+
+
+def _quat_rotate(q, v):
+    """
+    Batched rotation of vectors by quaternions.
+
+    Args:
+        q (np.ndarray): Quaternions of shape (N, 4) in pybullet order [x, y, z, w].
+        v (np.ndarray): Vectors of shape (N, 3).
+
+    Returns:
+        np.ndarray: The rotated vectors, shape (N, 3).
+    """
+    q_xyz, q_w = q[:, :3], q[:, 3:]
+    t = 2.0 * np.cross(q_xyz, v)
+    return v + q_w * t + np.cross(q_xyz, t)
+
+
 class PyBulletRecorder:
     """A class for recording PyBullet simulations."""
 
@@ -105,11 +157,31 @@ class PyBulletRecorder:
 
             return {"position": list(position), "orientation": list(orientation)}
 
-    def __init__(self):
-        """Initializes the PyBulletRecorder class."""
+    def __init__(self, keyframe_interval=1):
+        """
+        Initializes the PyBulletRecorder class.
+
+        Args:
+            keyframe_interval (int): Record a keyframe every k-th simulation step.
+        """
         self.frame_cnt = 0
-        self.states = []
+        self.step_cnt = 0
+        self.keyframe_interval = max(1, int(keyframe_interval))
         self.links = []
+        self.link_start_frames = []  # first recorded frame of each link
+        self.capture_plan = None  # rebuilt lazily after registering objects
+
+        # frames x links x 7 (position xyz + orientation xyzw), grown on demand,
+        # frames recorded before a link was registered are NaN
+        self.states = np.full((0, 0, 7), np.nan, dtype=np.float32)
+        self.buffer_start = 0  # frame index of the first row of self.states
+
+        # streaming to disk, see start_stream
+        self.stream_path = None
+        self.chunk_size = None
+        self.chunk_cnt = 0
+        self.write_queue = None
+        self.writer = None
 
     def register_object(self, body_id, urdf_path, global_scaling):
         """
@@ -132,6 +204,9 @@ class PyBulletRecorder:
                 )
             ] = link_id
 
+        self.capture_plan = None
+        num_links = len(self.links)
+
         dir_path = dirname(abspath(urdf_path))
         file_name = splitext(basename(urdf_path))[0]
         robot = URDF.load(urdf_path)
@@ -258,15 +333,238 @@ class PyBulletRecorder:
                             )
                         )
 
+        self.link_start_frames += [self.frame_cnt] * (len(self.links) - num_links)
+        if self.stream_path is not None:
+            self.write_links()
+
+    def reserve(self, num_frames, num_links):
+        """
+        Grows the state buffer so that it holds at least the given number of frames and links.
+
+        Args:
+            num_frames (int): The number of frames to hold.
+            num_links (int): The number of links to hold.
+        """
+        capacity, width, _ = self.states.shape
+        if num_frames <= capacity and num_links <= width:
+            return
+        if num_frames > capacity:
+            capacity = max(num_frames, 2 * capacity, 256)  # amortized O(1) append
+            if self.chunk_size is not None:
+                capacity = min(capacity, self.chunk_size)
+        states = np.full((capacity, max(num_links, width), 7), np.nan, dtype=np.float32)
+        num_rows = self.frame_cnt - self.buffer_start
+        states[:num_rows, :width] = self.states[:num_rows]
+        self.states = states
+
+    def get_states(self):
+        """
+        Gets the recorded simulation states.
+
+        Returns:
+            np.ndarray: A view of shape (frames, links, 7) holding the position and
+                orientation (xyzw) of each tracked link at each keyframe.
+        """
+        return self.states[: self.frame_cnt - self.buffer_start, : len(self.links)]
+
+    def build_capture_plan(self):
+        """
+        Group the tracked links by body so that a keyframe reads every body with one call.
+
+        Returns:
+            dict: The bodies to read, the row of each tracked link in the read result
+                and the local (visual origin) pose of each tracked link.
+        """
+        tracked_link_ids = {}  # body_id -> tracked link ids, in registration order
+        for link in self.links:
+            tracked_link_ids.setdefault(link.body_id, set()).add(link.link_id)
+
+        # Row layout per body: [base (if tracked)] + [tracked links in ascending order]
+        rows = {}
+        body_plans = []
+        for body_id, link_ids in tracked_link_ids.items():
+            has_base = -1 in link_ids
+            link_ids = sorted(link_id for link_id in link_ids if link_id != -1)
+            for link_id in ([-1] if has_base else []) + link_ids:
+                rows[(body_id, link_id)] = len(rows)
+            body_plans.append((body_id, has_base, link_ids))
+
+        self.capture_plan = {
+            "bodies": body_plans,
+            "num_rows": len(rows),
+            "link_rows": np.array(
+                [rows[(link.body_id, link.link_id)] for link in self.links], dtype=int
+            ),
+            "local_pos": np.array(
+                [link.link_pose[0] for link in self.links], dtype=float
+            ).reshape(-1, 3),
+            "local_orn": np.array(
+                [link.link_pose[1] for link in self.links], dtype=float
+            ).reshape(-1, 4),
+        }
+        return self.capture_plan
+
+    def capture_link_poses(self):
+        """
+        Reads the global pose of every tracked link, with one pybullet query per body.
+
+        Returns:
+            tuple: Positions (N, 3) and orientations (N, 4) of the tracked links.
+        """
+        plan = self.capture_plan
+        if plan is None:
+            plan = self.build_capture_plan()
+
+        positions = np.empty((plan["num_rows"], 3))
+        orientations = np.empty((plan["num_rows"], 4))
+        row = 0
+        for body_id, has_base, link_ids in plan["bodies"]:
+            if has_base:
+                position, orientation = p.getBasePositionAndOrientation(body_id)
+                positions[row] = position
+                orientations[row] = orientation
+                row += 1
+            if link_ids:
+                link_states = p.getLinkStates(
+                    body_id, link_ids, computeForwardKinematics=True
+                )
+                for link_state in link_states:
+                    positions[row] = link_state[4]
+                    orientations[row] = link_state[5]
+                    row += 1
+
+        positions = positions[plan["link_rows"]]
+        orientations = orientations[plan["link_rows"]]
+        return (
+            positions + _quat_rotate(orientations, plan["local_pos"]),
+            _quat_multiply(orientations, plan["local_orn"]),
+        )
+
+    def step(self):
+        """Counts a simulation step and adds a keyframe on every k-th step."""
+        if self.step_cnt % self.keyframe_interval == 0:
+            self.add_keyframe()
+        self.step_cnt += 1
+
     def add_keyframe(self):
         """Adds a keyframe of the current simulation state."""
-        # Ideally, call every p.stepSimulation()
-        current_state = {
-            link.name: {**link.get_keyframe(), "frame": self.frame_cnt}
-            for link in self.links
-        }
-        self.states.append(current_state)
+        if len(self.links) == 0:
+            return
+        positions, orientations = self.capture_link_poses()
+        num_links = len(self.links)
+        row = self.frame_cnt - self.buffer_start
+        self.reserve(row + 1, num_links)
+        self.states[row, :num_links, :3] = positions
+        self.states[row, :num_links, 3:] = orientations
         self.frame_cnt += 1
+        if self.chunk_size is not None and row + 1 >= self.chunk_size:
+            self.flush_chunk()
+
+    # ----------------------------------------------------------------
+    # Streaming to disk
+    # ----------------------------------------------------------------
+
+    def start_stream(self, path, chunk_size=1000):
+        """
+        Streams keyframes to disk while the simulation runs, so memory stays bounded.
+
+        Every chunk_size keyframes are handed to a background thread that writes them
+        to path/chunk_XXXXXX.npz, and path/links.json holds the link metadata. Each file
+        is written atomically, so an interrupted recording can still be imported.
+
+        Args:
+            path (str): The directory to stream the recording into.
+            chunk_size (int): The number of keyframes per chunk file.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.stream_path = path
+        self.chunk_size = max(1, int(chunk_size))
+        self.chunk_cnt = 0
+        self.write_queue = queue.Queue(maxsize=2)  # backpressure bounds memory use
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+        if self.frame_cnt > self.buffer_start:
+            self.flush_chunk()
+        self.write_links()
+
+    def flush_chunk(self):
+        """Hands the buffered keyframes to the writer thread and empties the buffer."""
+        num_rows = self.frame_cnt - self.buffer_start
+        if num_rows == 0:
+            return
+        self.write_queue.put(
+            (self.chunk_cnt, self.buffer_start, self.get_states().copy())
+        )
+        self.chunk_cnt += 1
+        self.buffer_start = self.frame_cnt
+        self.states[:num_rows] = np.nan
+
+    def write_chunks(self):
+        """
+        Writer thread: saves queued chunks until it receives None.
+        A chunk that fails to save is reported and skipped.
+        """
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            chunk_id, start_frame, frames = item
+            try:
+                self.write_atomic(
+                    os.path.join(self.stream_path, f"chunk_{chunk_id:06d}.npz"),
+                    lambda f: np.savez(f, frames=frames, start_frame=start_frame),
+                )
+            except Exception as e:
+                # keep draining the queue, or flush_chunk blocks on it forever
+                print(
+                    "[Blender Render][Recorder] \033[31merror\033[0m: Failed to write chunk {}: {}".format(
+                        chunk_id, e
+                    )
+                )
+
+    def write_links(self, mtl_recorder=None):
+        """
+        Writes the metadata of the tracked links to the stream directory.
+
+        Args:
+            mtl_recorder (dict): Manually added materials, keyed by "{body_id}{link_id}" or "{body_id}".
+        """
+        links = json.dumps(self.get_links_info(mtl_recorder or {}))
+        self.write_atomic(
+            os.path.join(self.stream_path, "links.json"),
+            lambda f: f.write(links.encode("utf-8")),
+        )
+
+    @staticmethod
+    def write_atomic(path, write):
+        """
+        Writes a file through a temporary file and a rename, so readers never see a partial file.
+
+        Args:
+            path (str): The destination path.
+            write (callable): Writes the content into the given binary file object.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def stop_stream(self, mtl_recorder):
+        """
+        Flushes the remaining keyframes, waits for the writer thread and finalizes the link metadata.
+
+        Args:
+            mtl_recorder (dict): Manually added materials, keyed by "{body_id}{link_id}" or "{body_id}".
+        """
+        print(
+            "[Blender Render][Recorder] \033[34mInfo\033[0m: Saving state to {} (frames num {})".format(
+                self.stream_path, self.frame_cnt
+            )
+        )
+        self.flush_chunk()
+        self.write_queue.put(None)
+        self.writer.join()
+        self.write_links(mtl_recorder)
 
     # def prompt_save(self):
     #     """Prompts the user to save the recorded simulation states."""
@@ -294,22 +592,21 @@ class PyBulletRecorder:
 
     def reset(self):
         """Resets the recorded simulation states."""
-        self.states = []
+        self.frame_cnt = 0
+        self.buffer_start = 0
+        self.link_start_frames = [0] * len(self.links)
+        self.states = np.full((0, 0, 7), np.nan, dtype=np.float32)
 
-    def get_formatted_output(self, mtl_recorder):
+    def get_links_info(self, mtl_recorder):
         """
-        Gets the formatted output of the recorded simulation states.
+        Gets the metadata of every tracked link.
+
+        Args:
+            mtl_recorder (dict): Manually added materials, keyed by "{body_id}{link_id}" or "{body_id}".
 
         Returns:
-            dict: Formatted output of the recorded simulation states.
+            list: One dict per tracked link, in the link order of the recorded states.
         """
-        print("[Recorder] \033[34mInfo\033[0m: Frames num {}".format(len(self.states)))
-        df = pd.DataFrame(self.states)
-        df_cleaned = df.applymap(lambda x: x if pd.notna(x) else None)
-        self.states = {
-            col: df_cleaned[col].dropna().tolist() for col in df_cleaned.columns
-        }
-
         for link in self.links:
             key = f"{link.body_id}{link.link_id}"
             body_key = f"{link.body_id}"
@@ -317,25 +614,43 @@ class PyBulletRecorder:
                 link.mtl_type = "color"
                 link.mtl = mtl_recorder.get(key, mtl_recorder.get(body_key))
 
-        retval = {
-            link.name: {
+        return [
+            {
+                "name": link.name,
                 "type": link.type,
                 "mesh_path": link.mesh_path,
                 "mtl_type": link.mtl_type,
-                "mtl": link.mtl,
-                "mesh_scale": link.mesh_scale,
-                "frames": self.states.get(link.name, []),
+                "mtl": _to_builtin(link.mtl),
+                "mesh_scale": _to_builtin(link.mesh_scale),
+                "start_frame": start_frame,
             }
-            for link in self.links
-        }
-        return retval
+            for link, start_frame in zip(self.links, self.link_start_frames)
+        ]
+
+    def get_formatted_output(self, mtl_recorder):
+        """
+        Gets the formatted output of the recorded simulation states.
+
+        Args:
+            mtl_recorder (dict): Manually added materials, keyed by "{body_id}{link_id}" or "{body_id}".
+
+        Returns:
+            dict: "links" holds the metadata of every tracked link and "frames" the
+                (frames, links, 7) pose array, in the same link order.
+        """
+        print("[Recorder] \033[34mInfo\033[0m: Frames num {}".format(self.frame_cnt))
+        return {"links": self.get_links_info(mtl_recorder), "frames": self.get_states()}
 
     def save(self, path, mtl_recorder):
         """
-        Saves the recorded simulation states to a file.
+        Saves the recorded simulation states to a npz file.
+
+        The file holds a "frames" float32 array of shape (frames, links, 7) and a "links"
+        JSON string with the metadata of each link, so it can be read without pickle.
 
         Args:
             path (str): The path to save the recorded simulation states.
+            mtl_recorder (dict): Manually added materials, keyed by "{body_id}{link_id}" or "{body_id}".
         """
         if path is None:
             print(
@@ -347,4 +662,9 @@ class PyBulletRecorder:
                     path
                 )
             )
-            pickle.dump(self.get_formatted_output(mtl_recorder), open(path, "wb"))
+            output = self.get_formatted_output(mtl_recorder)
+            np.savez(
+                path,
+                frames=output["frames"],
+                links=np.array(json.dumps(output["links"])),
+            )